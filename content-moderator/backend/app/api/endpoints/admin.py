@@ -0,0 +1,163 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Path
+from fastapi.security import OAuth2PasswordBearer
+from fastapi.responses import PlainTextResponse
+from typing import Dict, Any, List, Optional
+
+from app.core.tracing import trace_buffer
+from app.core.profiling import profiler, format_collapsed
+from app.core.reload import settings_reloader
+from app.services.write_behind import write_behind
+from app.services.blob_store import blob_store
+from app.services.analytics import moderation_analytics
+
+# This would be replaced with actual auth in a real app
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+
+router = APIRouter()
+
+
+@router.get("/traces", response_model=List[Dict[str, Any]])
+async def get_slowest_traces(
+    limit: int = Query(20, ge=1, le=200),
+    name: Optional[str] = Query(None, description="Only traces for this route, e.g. 'POST /api/v1/moderation/moderate'"),
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Get the slowest recent request traces with their per-stage spans.
+    """
+    return [trace.to_dict() for trace in trace_buffer.slowest(limit, name)]
+
+
+@router.get("/traces/{trace_id}", response_model=Dict[str, Any])
+async def get_trace(
+    trace_id: str = Path(..., description="Request ID (X-Request-ID header)"),
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Get a single recent trace by request ID.
+    """
+    trace = trace_buffer.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    
+    return trace.to_dict()
+
+
+@router.get("/profiles", response_model=List[Dict[str, Any]])
+async def list_profiles(
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    List stored request profiles, slowest first.
+    """
+    if not profiler.enabled:
+        raise HTTPException(status_code=404, detail="Profiler is not enabled")
+    
+    return profiler.list_profiles()
+
+
+@router.get("/profiles/collapsed", response_class=PlainTextResponse)
+async def get_aggregate_profile(
+    name: Optional[str] = Query(None, description="Only profiles for this route, e.g. 'POST /api/v1/moderation/moderate'"),
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Get the merged stacks of all stored profiles in collapsed-stack format (for flamegraph.pl or speedscope).
+    """
+    if not profiler.enabled:
+        raise HTTPException(status_code=404, detail="Profiler is not enabled")
+    
+    return format_collapsed(profiler.aggregate(name))
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(
+    profile_id: str = Path(..., description="Profile ID (X-Profile-ID header) or request ID"),
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Get a single request profile in collapsed-stack format.
+    """
+    profile = profiler.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    return profile.collapsed()
+
+
+@router.get("/write-behind", response_model=Dict[str, Any])
+async def get_write_behind_stats(
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Get buffer depth, backpressure and bulk write statistics for record persistence.
+    """
+    return write_behind.get_stats()
+
+
+@router.get("/blobs", response_model=Dict[str, Any])
+async def get_blob_stats(
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Get deduplication and compression statistics for stored content.
+    """
+    return blob_store.get_stats()
+
+
+@router.get("/analytics", response_model=Dict[str, Any])
+async def get_analytics(
+    top: int = Query(20, ge=1, le=1000, description="Number of top phrases and users to include"),
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Get score distributions per category, top flagged phrases, unique users and the
+    heaviest requesters, from fixed-size streaming sketches.
+    """
+    return moderation_analytics.get_stats(top)
+
+
+@router.post("/analytics/reset", response_model=Dict[str, Any])
+async def reset_analytics(
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Discard the streaming analytics collected so far.
+    """
+    moderation_analytics.reset()
+    return {"status": "reset", "since": moderation_analytics.started_at}
+
+
+@router.get("/settings", response_model=Dict[str, Any])
+async def get_settings_snapshot(
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Get the current settings snapshot version, the reloadable fields and recent reloads.
+    """
+    snapshot = settings_reloader.current
+    return {
+        "version": snapshot.version,
+        "created_at": snapshot.created_at,
+        "reloadable_fields": settings_reloader.reloadable_fields,
+        "artifacts": sorted(snapshot.artifacts),
+        "history": list(settings_reloader.history)
+    }
+
+
+@router.post("/settings/reload", response_model=Dict[str, Any])
+async def reload_settings(
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Re-read settings from the environment and .env and swap in a new snapshot.
+    
+    Only derived artifacts and caches that depend on changed fields are rebuilt or
+    invalidated; in-flight requests finish on the previous snapshot.
+    """
+    try:
+        return await settings_reloader.reload()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Settings reload error: {str(e)}")
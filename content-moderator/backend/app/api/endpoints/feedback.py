@@ -41,6 +41,7 @@ async def submit_feedback(
 
 @router.get("/stats", response_model=Dict[str, Any])
 async def get_feedback_stats(
+    scope: str = Query("user", regex="^(user|global)$", description="Statistics for the current user or all users"),
     token: str = Depends(oauth2_scheme)
 ):
     """
@@ -50,26 +51,8 @@ async def get_feedback_stats(
         # Extract user ID from token (simplified)
         user_id = "user-123"  # This would come from token validation
         
-        # In a real app, we would query the database for stats
-        # For now, return mock data
-        return {
-            "total_feedback_count": 42,
-            "agreement_rate": 0.85,
-            "disagreement_categories": {
-                "hate": 0.4,
-                "harassment": 0.3,
-                "misinformation": 0.2,
-                "other": 0.1
-            },
-            "feedback_impact": {
-                "threshold_changes": {
-                    "hate": -0.05,
-                    "harassment": +0.02,
-                    "sexual": -0.01
-                },
-                "accuracy_improvement": 0.12
-            }
-        }
+        # Aggregates are maintained as feedback arrives, so this is a constant-time read
+        return feedback_processor.get_stats(user_id if scope == "user" else None)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving feedback stats: {str(e)}")
\ No newline at end of file
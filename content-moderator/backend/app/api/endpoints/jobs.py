@@ -0,0 +1,80 @@
+from fastapi import APIRouter, Depends, HTTPException, Body, Path
+from fastapi.security import OAuth2PasswordBearer
+from typing import List
+
+from app.services.bulk_moderation import bulk_job_manager, InvalidJobPath
+from app.models.pydantic_models import BulkModerationJobRequest, BulkModerationJobResponse
+
+# This would be replaced with actual auth in a real app
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+
+router = APIRouter()
+
+
+@router.post("", response_model=BulkModerationJobResponse, status_code=202)
+async def start_bulk_job(
+    request: BulkModerationJobRequest = Body(...),
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Start a bulk moderation job over a JSONL file.
+    
+    Input and output files are named relative to the server's jobs directory.
+    """
+    try:
+        job = bulk_job_manager.start_job(
+            request.input_path,
+            request.output_path,
+            concurrency=request.concurrency,
+            resume=request.resume
+        )
+        return BulkModerationJobResponse(**job.progress())
+        
+    except InvalidJobPath as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error starting job: {str(e)}")
+
+
+@router.get("", response_model=List[BulkModerationJobResponse])
+async def list_bulk_jobs(
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    List bulk moderation jobs.
+    """
+    return [BulkModerationJobResponse(**job.progress()) for job in bulk_job_manager.list_jobs()]
+
+
+@router.get("/{job_id}", response_model=BulkModerationJobResponse)
+async def get_bulk_job(
+    job_id: str = Path(..., description="Job ID"),
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Get progress, throughput and ETA for a bulk moderation job.
+    """
+    job = bulk_job_manager.get_job(job_id)
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return BulkModerationJobResponse(**job.progress())
+
+
+@router.post("/{job_id}/cancel", response_model=BulkModerationJobResponse)
+async def cancel_bulk_job(
+    job_id: str = Path(..., description="Job ID"),
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Cancel a bulk moderation job. It can be resumed later by starting it again.
+    """
+    job = await bulk_job_manager.cancel_job(job_id)
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return BulkModerationJobResponse(**job.progress())
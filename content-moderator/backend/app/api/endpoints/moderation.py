@@ -1,17 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, Body, Query, Path
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, Path, Request, WebSocket, status
 from fastapi.security import OAuth2PasswordBearer
-from typing import Dict, Any, Optional, List
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from typing import Dict, Any, Optional, List, AsyncIterator, Set
+import asyncio
+import functools
+import json
+import time
 import uuid
 
+from app.api.projection import Projection, projection_params
+from app.core.config import get_settings
+from app.core.reload import settings_reloader
+from app.core.tracing import tracer
+from app.models.compact_models import ModerationVerdict, get_category_index
 from app.services.moderation_engine import moderation_engine
 from app.services.explanation_generator import explanation_generator
+from app.services.incremental_moderation import incremental_moderator, preferences_fingerprint
+from app.services.shadow_evaluator import shadow_evaluator
+from app.services.image_moderation import image_moderator, ImageDecodeError, ImageTooLarge
 from app.models.pydantic_models import (
     ContentModerationRequest,
     ContentModerationResponse,
+    ContentEditResponse,
+    ImageModerationResponse,
+    BatchModerationRequest,
+    StreamedModerationResult,
+    WebSocketModerationRequest,
+    WebSocketModerationResult,
     FeedbackRequest,
-    FeedbackResponse
+    FeedbackResponse,
+    BulkFeedbackRequest,
+    BulkFeedbackResponse
 )
 from app.services.feedback_processor import feedback_processor
+from app.services.preference_learning import preference_learning_system
+from app.services.write_behind import write_behind
+from app.services.blob_store import blob_store
+
+settings = get_settings()
 
 # This would be replaced with actual auth in a real app
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -21,54 +48,507 @@ router = APIRouter()
 # In-memory store for demo (would be replaced with database)
 moderation_history = {}
 
+# fields=/exclude= projections; the model's reasoning and feedback examples are opt-in
+moderation_fields = projection_params(ContentModerationResponse, "details", always=("content_id",))
+image_fields = projection_params(ImageModerationResponse, "details", always=("content_id",))
+edit_fields = projection_params(ContentEditResponse, "details", always=("content_id",))
+feedback_fields = projection_params(FeedbackResponse, "updated_preferences.examples", always=("content_id",))
+bulk_feedback_fields = projection_params(BulkFeedbackResponse, "updated_preferences.examples", always=("status",))
+
+# Counters for the WebSocket moderation channel
+websocket_stats = {"connections": 0, "active_connections": 0, "messages": 0, "errors": 0}
+
+
+def _stored_result(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Expand a history record's compact verdict into a moderation result dict.
+    """
+    result = record["verdict"].to_dict(get_category_index())
+    result["details"] = record["details"]
+    return result
+
+
+def _record_content(record: Dict[str, Any]) -> str:
+    """
+    Content of a history record, which references it by digest.
+    """
+    return blob_store.get(record["content_digest"])
+
+
+def _store_pending_details(content_id: str, early_result: Dict[str, Any], pending_details: asyncio.Task) -> None:
+    """
+    Fill in a history record's details once a streamed completion has finished.
+    
+    If the completion failed or was cancelled, the record is persisted with empty details.
+    """
+    record = moderation_history.get(content_id)
+    if record is None:
+        return
+    
+    if pending_details.cancelled() or pending_details.exception() is not None:
+        moderation_result = early_result
+        record["details"] = {}
+    else:
+        moderation_result = pending_details.result()
+        record["details"] = moderation_result.get("details", {})
+        
+        # Long content is seeded separately by _score_record_segments
+        segments = incremental_moderator.seed_segments(_record_content(record), moderation_result)
+        if segments:
+            record["segments"] = segments
+    
+    # Persist once the details are complete
+    asyncio.ensure_future(write_behind.submit_moderation(content_id, record, moderation_result))
+
+
+async def _score_record_segments(
+    content_id: str,
+    content: str,
+    user_preferences: Optional[Dict[str, Any]]
+) -> None:
+    """
+    Fill in a history record's segment scores in the background, so its next edit only
+    rescores the segments that change.
+    """
+    segments = await incremental_moderator.score_segments(content, user_preferences)
+    record = moderation_history.get(content_id)
+    if record is not None:
+        record["segments"] = segments
+
+
+def _request_preferences(
+    request: ContentModerationRequest,
+    user_preferences: Optional[Dict[str, Any]]
+) -> Optional[Dict[str, Any]]:
+    """
+    Apply a request's category subset on top of the user's preferences.
+    """
+    if not request.categories:
+        return user_preferences
+    
+    return {**(user_preferences or {}), "categories": request.categories}
+
+
+@tracer.traced("moderation.moderate_item")
+async def _moderate_item(
+    request: ContentModerationRequest,
+    user_id: str,
+    user_preferences: Optional[Dict[str, Any]]
+) -> ContentModerationResponse:
+    """
+    Moderate a single item, record it in history and build the response.
+    """
+    if request.content_type == "image":
+        raise ValueError("Image content must be uploaded to /moderate/image")
+    
+    # Generate unique ID for this moderation request
+    content_id = str(uuid.uuid4())
+    tracer.set_attribute("content_id", content_id)
+    user_preferences = _request_preferences(request, user_preferences)
+    
+    # With streaming enabled, details may still be arriving
+    start = time.perf_counter()
+    moderation_result, pending_details = await moderation_engine.moderate_content_early(
+        request.content, user_preferences, user_id
+    )
+    
+    # Explanations for flagged content need the details, so wait for them unless they are deferred
+    if pending_details is not None and moderation_result.get("flagged") and moderation_engine.details_mode != "deferred":
+        moderation_result = await pending_details
+        pending_details = None
+    
+    # Compare a sample against the candidate model in the background
+    shadow_evaluator.maybe_shadow(
+        request.content, user_preferences, moderation_result, time.perf_counter() - start
+    )
+    
+    # Generate explanation
+    explanation = await explanation_generator.generate_explanation(
+        request.content, moderation_result, user_preferences
+    )
+    
+    # Store result in history
+    with tracer.span("moderation_history.write"):
+        moderation_history[content_id] = {
+            "user_id": user_id,
+            "content_digest": blob_store.put(request.content),
+            "verdict": ModerationVerdict.from_result(get_category_index(), moderation_result),
+            "details": moderation_result.get("details", {}),
+            "explanation": explanation,
+            "segments": incremental_moderator.seed_segments(request.content, moderation_result),
+            "preferences_fingerprint": preferences_fingerprint(user_preferences),
+            "timestamp": "now()"  # This would be a real timestamp in production
+        }
+    
+    # Long content otherwise gets its segment scores when it is first edited
+    if settings.SEGMENT_SCORE_ON_CREATE and incremental_moderator.is_segmented(request.content):
+        asyncio.ensure_future(_score_record_segments(content_id, request.content, user_preferences))
+    
+    if pending_details is not None:
+        pending_details.add_done_callback(functools.partial(_store_pending_details, content_id, moderation_result))
+    else:
+        await write_behind.submit_moderation(content_id, moderation_history[content_id], moderation_result)
+    
+    return ContentModerationResponse(
+        content_id=content_id,
+        flagged=moderation_result.get("flagged", False),
+        flagged_categories=moderation_result.get("flagged_categories", []),
+        scores=moderation_result.get("scores", {}),
+        risk_score=moderation_result.get("risk_score"),
+        explanation=explanation,
+        details=moderation_result.get("details", {})
+    )
+
 
 @router.post("/moderate", response_model=ContentModerationResponse)
 async def moderate_content(
     request: ContentModerationRequest,
+    projection: Projection = Depends(moderation_fields),
     token: str = Depends(oauth2_scheme)
 ):
     """
     Moderate content based on user preferences.
+    
+    The model's reasoning (details) is only returned when requested with fields= or exclude=.
+    """
+    try:
+        # Extract user ID from token (simplified)
+        user_id = "user-123"  # This would come from token validation
+        
+        # Get the user's compiled effective preferences
+        user_preferences = preference_learning_system.get_compiled_policy(user_id).preferences
+        
+        return projection.response(await _moderate_item(request, user_id, user_preferences))
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Moderation error: {str(e)}")
+
+
+@router.post("/moderate/image", response_model=ImageModerationResponse)
+async def moderate_image(
+    request: Request,
+    projection: Projection = Depends(image_fields),
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Moderate an image sent as the raw request body (e.g. Content-Type: image/jpeg).
+    
+    Scores for identical or visually near-identical images are reused.
+    """
+    # Extract user ID from token (simplified)
+    user_id = "user-123"  # This would come from token validation
+    
+    try:
+        data, sha256 = await image_moderator.read_upload(request.stream())
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty image upload")
+    
+    try:
+        user_preferences = preference_learning_system.get_compiled_policy(user_id).preferences
+        moderation_result = await image_moderator.moderate_image(data, sha256, user_preferences)
+    
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ImageDecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Moderation error: {str(e)}")
+    
+    content_id = str(uuid.uuid4())
+    explanation = await explanation_generator.generate_explanation(
+        f"[image sha256:{sha256}]", moderation_result, user_preferences
+    )
+    
+    moderation_history[content_id] = {
+        "user_id": user_id,
+        "content_digest": blob_store.put(f"image:{sha256}"),
+        "content_type": "image",
+        "verdict": ModerationVerdict.from_result(get_category_index(), moderation_result),
+        "details": moderation_result.get("details", {}),
+        "explanation": explanation,
+        "segments": {},
+        "preferences_fingerprint": preferences_fingerprint(user_preferences),
+        "timestamp": "now()"  # This would be a real timestamp in production
+    }
+    await write_behind.submit_moderation(content_id, moderation_history[content_id], moderation_result)
+    
+    return projection.response(ImageModerationResponse(
+        content_id=content_id,
+        flagged=moderation_result.get("flagged", False),
+        flagged_categories=moderation_result.get("flagged_categories", []),
+        scores=moderation_result.get("scores", {}),
+        risk_score=moderation_result.get("risk_score"),
+        explanation=explanation,
+        details=moderation_result.get("details", {}),
+        dedupe=moderation_result.get("dedupe"),
+        match_distance=moderation_result.get("match_distance")
+    ))
+
+
+async def _stream_results(
+    items: List[ContentModerationRequest],
+    user_id: str,
+    user_preferences: Optional[Dict[str, Any]],
+    stream_format: str,
+    projection: Projection
+) -> AsyncIterator[str]:
+    """
+    Moderate items concurrently and yield each result as soon as it completes.
+    """
+    semaphore = asyncio.Semaphore(settings.STREAM_MAX_CONCURRENCY)
+    
+    async def run(index: int, item: ContentModerationRequest) -> StreamedModerationResult:
+        async with semaphore:
+            try:
+                result = await _moderate_item(item, user_id, user_preferences)
+                return StreamedModerationResult(index=index, result=result)
+            except Exception as e:
+                return StreamedModerationResult(index=index, error=f"Moderation error: {str(e)}")
+    
+    tasks = [asyncio.create_task(run(index, item)) for index, item in enumerate(items)]
+    item_projection = projection.nested("result", siblings=("index", "error"))
+    
+    try:
+        # Emit in completion order so the first result tracks the fastest item
+        for next_result in asyncio.as_completed(tasks):
+            item_result = await next_result
+            payload = item_projection.json(item_result)
+            
+            if stream_format == "sse":
+                yield f"event: result\ndata: {payload}\n\n"
+            else:
+                yield payload + "\n"
+        
+        if stream_format == "sse":
+            yield "event: done\ndata: {}\n\n"
+    finally:
+        # Stop outstanding work if the client disconnects mid-stream
+        for task in tasks:
+            task.cancel()
+
+
+@router.post("/moderate/stream")
+async def moderate_content_stream(
+    request: BatchModerationRequest,
+    stream_format: str = Query("ndjson", alias="format", regex="^(ndjson|sse)$",
+                               description="Stream format: ndjson or sse"),
+    projection: Projection = Depends(moderation_fields),
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Moderate multiple items, streaming each result as soon as it is scored.
+    
+    Results are emitted in completion order as NDJSON lines or Server-Sent Events,
+    each tagged with the index of the item in the request.
+    """
+    # Extract user ID from token (simplified)
+    user_id = "user-123"  # This would come from token validation
+    
+    # Get the user's compiled effective preferences
+    user_preferences = preference_learning_system.get_compiled_policy(user_id).preferences
+    
+    media_type = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    
+    return StreamingResponse(
+        _stream_results(request.items, user_id, user_preferences, stream_format, projection),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+def _websocket_token(websocket: WebSocket) -> Optional[str]:
+    """
+    Bearer token of a WebSocket handshake, from the Authorization header or the token
+    query parameter (browsers cannot set headers on WebSockets).
+    """
+    scheme, _, token = websocket.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        return token
+    return websocket.query_params.get("token") or None
+
+
+def _message_id(text: str) -> Optional[str]:
+    """
+    Best-effort ID of a message that failed validation, so the error can be matched up.
+    """
+    try:
+        message = json.loads(text)
+    except ValueError:
+        return None
+    if isinstance(message, dict) and message.get("id") is not None:
+        return str(message["id"])
+    return None
+
+
+@router.websocket("/moderate/ws")
+async def moderate_content_websocket(
+    websocket: WebSocket,
+    projection: Projection = Depends(moderation_fields)
+):
+    """
+    Moderate a stream of messages (e.g. chat) over one persistent connection.
+    
+    The connection is authenticated once and the user's compiled preferences are reused
+    for the session, refreshed every WS_POLICY_REFRESH_SECONDS. Each text frame is a JSON
+    moderation request with a client "id"; verdicts are pushed back in completion order
+    tagged with that id. At most WS_MAX_CONCURRENCY messages are moderated at once; beyond
+    that the server stops reading, so backpressure reaches the client.
+    """
+    if _websocket_token(websocket) is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    # Extract user ID from token (simplified)
+    user_id = "user-123"  # This would come from token validation
+    
+    await websocket.accept()
+    websocket_stats["connections"] += 1
+    websocket_stats["active_connections"] += 1
+    
+    policy = preference_learning_system.get_compiled_policy(user_id)
+    policy_resolved_at = time.monotonic()
+    
+    semaphore = asyncio.Semaphore(settings.WS_MAX_CONCURRENCY)
+    send_lock = asyncio.Lock()
+    tasks: Set[asyncio.Task] = set()
+    item_projection = projection.nested("result", siblings=("id", "error"))
+    
+    async def send(message: WebSocketModerationResult) -> None:
+        async with send_lock:
+            await websocket.send_text(item_projection.json(message))
+    
+    async def run(request: WebSocketModerationRequest, user_preferences: Optional[Dict[str, Any]]) -> None:
+        try:
+            # Pin a settings snapshot and trace each message, as the HTTP middleware does per request
+            settings_token = settings_reloader.pin()
+            try:
+                with tracer.start_trace(f"WS {websocket.url.path}", message_id=request.id):
+                    result = await _moderate_item(request, user_id, user_preferences)
+                message = WebSocketModerationResult(id=request.id, result=result)
+            except Exception as e:
+                websocket_stats["errors"] += 1
+                message = WebSocketModerationResult(id=request.id, error=f"Moderation error: {str(e)}")
+            finally:
+                settings_reloader.unpin(settings_token)
+            
+            await send(message)
+        except Exception:
+            # The client went away; the receive loop ends the session
+            pass
+        finally:
+            semaphore.release()
+    
+    try:
+        while True:
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                break
+            
+            text = frame.get("text")
+            if text is None:
+                text = (frame.get("bytes") or b"").decode("utf-8", errors="replace")
+            websocket_stats["messages"] += 1
+            
+            try:
+                request = WebSocketModerationRequest.parse_raw(text)
+            except ValidationError as e:
+                websocket_stats["errors"] += 1
+                await send(WebSocketModerationResult(id=_message_id(text), error=f"Invalid message: {str(e)}"))
+                continue
+            
+            if time.monotonic() - policy_resolved_at > settings.WS_POLICY_REFRESH_SECONDS:
+                policy = preference_learning_system.get_compiled_policy(user_id)
+                policy_resolved_at = time.monotonic()
+            
+            await semaphore.acquire()
+            task = asyncio.create_task(run(request, policy.preferences))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    finally:
+        # Verdicts can no longer be delivered once the client has disconnected
+        for task in tasks:
+            task.cancel()
+        websocket_stats["active_connections"] -= 1
+
+
+@router.post("/moderate/{content_id}/edit", response_model=ContentEditResponse)
+async def remoderate_edited_content(
+    content_id: str = Path(..., description="ID of the previous version of the content"),
+    request: ContentModerationRequest = Body(...),
+    projection: Projection = Depends(edit_fields),
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Re-moderate an edited version of previously moderated content.
+    
+    Only the segments that changed since the previous version are scored again;
+    scores for unchanged segments are reused. Long content without segment scores yet is
+    moderated whole, and its segments are scored in the background for the next edit.
     """
     try:
         # Extract user ID from token (simplified)
         user_id = "user-123"  # This would come from token validation
         
-        # Get user preferences (simplified)
-        user_preferences = None  # This would come from database
+        # Get the user's compiled effective preferences
+        user_preferences = _request_preferences(
+            request, preference_learning_system.get_compiled_policy(user_id).preferences
+        )
         
-        # Generate unique ID for this moderation request
-        content_id = str(uuid.uuid4())
+        previous = moderation_history.get(content_id)
+        if not previous or previous["user_id"] != user_id:
+            raise HTTPException(status_code=404, detail="Content not found")
         
-        # Moderate content
-        moderation_result = await moderation_engine.moderate_content(
-            request.content, user_preferences
+        # Cached segment scores are only valid under the preferences that produced them
+        fingerprint = preferences_fingerprint(user_preferences)
+        previous_segments = {}
+        if previous.get("preferences_fingerprint") == fingerprint:
+            previous_segments = previous.get("segments", {})
+        
+        moderation_result, segments, stats = await incremental_moderator.remoderate(
+            request.content, previous_segments, user_preferences, user_id
         )
         
-        # Generate explanation
         explanation = await explanation_generator.generate_explanation(
             request.content, moderation_result, user_preferences
         )
         
-        # Store result in history
-        moderation_history[content_id] = {
+        new_content_id = str(uuid.uuid4())
+        moderation_history[new_content_id] = {
             "user_id": user_id,
-            "content": request.content,
-            "result": moderation_result,
+            "content_digest": blob_store.put(request.content),
+            "verdict": ModerationVerdict.from_result(get_category_index(), moderation_result),
+            "details": moderation_result.get("details", {}),
             "explanation": explanation,
+            "segments": segments or {},
+            "preferences_fingerprint": fingerprint,
+            "previous_content_id": content_id,
             "timestamp": "now()"  # This would be a real timestamp in production
         }
+        await write_behind.submit_moderation(new_content_id, moderation_history[new_content_id], moderation_result)
         
-        # Return response
-        return ContentModerationResponse(
-            content_id=content_id,
+        if segments is None:
+            asyncio.ensure_future(_score_record_segments(new_content_id, request.content, user_preferences))
+        
+        return projection.response(ContentEditResponse(
+            content_id=new_content_id,
             flagged=moderation_result.get("flagged", False),
             flagged_categories=moderation_result.get("flagged_categories", []),
             scores=moderation_result.get("scores", {}),
+            risk_score=moderation_result.get("risk_score"),
             explanation=explanation,
-            details=moderation_result.get("details", {})
-        )
+            details=moderation_result.get("details", {}),
+            previous_content_id=content_id,
+            segments_total=stats["segments_total"],
+            segments_rescored=stats["segments_rescored"]
+        ))
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Moderation error: {str(e)}")
 
@@ -77,38 +557,42 @@ async def moderate_content(
 async def submit_feedback(
     content_id: str = Path(..., description="ID of the moderated content"),
     feedback: FeedbackRequest = Body(...),
+    projection: Projection = Depends(feedback_fields),
     token: str = Depends(oauth2_scheme)
 ):
     """
     Submit feedback for a moderation decision.
+    
+    The updated preferences leave out the stored feedback examples unless requested
+    with fields= or exclude=.
     """
     try:
         # Extract user ID from token (simplified)
         user_id = "user-123"  # This would come from token validation
         
-        # Check if content exists
-        if content_id not in moderation_history:
+        # Check if content exists; other users' content is reported as missing
+        moderation_data = moderation_history.get(content_id)
+        if moderation_data is None or moderation_data["user_id"] != user_id:
             raise HTTPException(status_code=404, detail="Content not found")
         
         # Get original content and result
-        moderation_data = moderation_history[content_id]
-        content = moderation_data["content"]
-        original_result = moderation_data["result"]
+        content = _record_content(moderation_data)
+        original_result = _stored_result(moderation_data)
         
         # Process feedback
         result = await feedback_processor.process_feedback(
-            user_id, content_id, content, original_result, feedback.dict()
+            user_id, content_id, content, original_result, feedback.dict(exclude_none=True)
         )
         
         if result.get("status") == "error":
             raise HTTPException(status_code=400, detail=result.get("message"))
         
-        return FeedbackResponse(
+        return projection.response(FeedbackResponse(
             content_id=content_id,
             status="success",
             message="Feedback submitted successfully",
             updated_preferences=result.get("updated_preferences")
-        )
+        ))
         
     except HTTPException:
         raise
@@ -116,6 +600,62 @@ async def submit_feedback(
         raise HTTPException(status_code=500, detail=f"Feedback error: {str(e)}")
 
 
+@router.post("/feedback/bulk", response_model=BulkFeedbackResponse)
+async def submit_bulk_feedback(
+    request: BulkFeedbackRequest,
+    projection: Projection = Depends(bulk_feedback_fields),
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Submit feedback for many moderation decisions at once (e.g. clearing a review queue).
+    
+    All items are applied to the user's preferences as one update; results are reported
+    per item in request order, and items that fail do not block the others.
+    """
+    try:
+        # Extract user ID from token (simplified)
+        user_id = "user-123"  # This would come from token validation
+        
+        results: List[Optional[Dict[str, Any]]] = [None] * len(request.items)
+        found = []
+        for position, item in enumerate(request.items):
+            # Feedback only adjusts the submitter's thresholds from their own content
+            moderation_data = moderation_history.get(item.content_id)
+            if moderation_data is None or moderation_data["user_id"] != user_id:
+                results[position] = {"content_id": item.content_id, "status": "error", "message": "Content not found"}
+            else:
+                found.append((position, (
+                    item.content_id,
+                    _record_content(moderation_data),
+                    _stored_result(moderation_data),
+                    item.feedback.dict(exclude_none=True)
+                )))
+        
+        outcome = {}
+        if found:
+            outcome = await feedback_processor.process_feedback_batch(user_id, [entry for _, entry in found])
+            for (position, _), item_result in zip(found, outcome["results"]):
+                results[position] = item_result
+        
+        succeeded = sum(1 for item_result in results if item_result["status"] == "success")
+        if succeeded == len(results):
+            status = "success"
+        elif succeeded:
+            status = "partial"
+        else:
+            status = "error"
+        
+        return projection.response(BulkFeedbackResponse(
+            status=status,
+            message=f"Processed {succeeded} of {len(results)} feedback items",
+            results=results,
+            updated_preferences=outcome.get("updated_preferences")
+        ))
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Feedback error: {str(e)}")
+
+
 @router.get("/history", response_model=List[Dict[str, Any]])
 async def get_moderation_history(
     token: str = Depends(oauth2_scheme),
@@ -130,20 +670,66 @@ async def get_moderation_history(
         
         # Filter history by user (simplified)
         user_history = [
-            {
-                "content_id": content_id,
-                "content": data["content"][:100] + "..." if len(data["content"]) > 100 else data["content"],
-                "flagged": data["result"].get("flagged", False),
-                "flagged_categories": data["result"].get("flagged_categories", []),
-                "timestamp": data["timestamp"]
-            }
+            (content_id, data)
             for content_id, data in moderation_history.items()
             if data["user_id"] == user_id
         ]
         
         # Sort by timestamp (would be real sorting in production)
-        # Return limited number of items
-        return user_history[:limit]
+        # Return limited number of items, only expanding the content that is returned
+        history = []
+        for content_id, data in user_history[:limit]:
+            content = _record_content(data)
+            history.append({
+                "content_id": content_id,
+                "content": content[:100] + "..." if len(content) > 100 else content,
+                "flagged": data["verdict"].flagged,
+                "flagged_categories": data["verdict"].flagged_categories(get_category_index()),
+                "timestamp": data["timestamp"]
+            })
+        
+        return history
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error retrieving history: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error retrieving history: {str(e)}")
+
+
+@router.get("/cascade/stats", response_model=Dict[str, Any])
+async def get_cascade_stats(
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Get per-tier call counts and latencies for the model cascade.
+    """
+    return moderation_engine.get_cascade_stats()
+
+
+@router.get("/shadow/stats", response_model=Dict[str, Any])
+async def get_shadow_stats(
+    recent: int = Query(20, ge=0, le=1000, description="Number of recent comparisons to include"),
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Get score deltas, flag disagreements and latency for the shadow candidate.
+    """
+    return shadow_evaluator.get_stats(recent)
+
+
+@router.get("/image/stats", response_model=Dict[str, Any])
+async def get_image_stats(
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Get perceptual-hash dedupe hit rates for image moderation.
+    """
+    return image_moderator.get_stats()
+
+
+@router.get("/ws/stats", response_model=Dict[str, Any])
+async def get_websocket_stats(
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Get connection and message counts for the WebSocket moderation channel.
+    """
+    return dict(websocket_stats)
\ No newline at end of file
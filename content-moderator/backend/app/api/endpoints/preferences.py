@@ -1,9 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, Body, Path
 from fastapi.security import OAuth2PasswordBearer
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
-from app.services.preference_learning import preference_learning_system
-from app.models.pydantic_models import UserPreferencesModel, UserPreferencesResponse
+from app.services.preference_learning import preference_learning_system, PreferenceUpdateConflict
+from app.models.pydantic_models import (
+    UserPreferencesModel,
+    UserPreferencesResponse,
+    CommunityPreferencesResponse
+)
 
 # This would be replaced with actual auth in a real app
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -32,11 +36,13 @@ async def get_user_preferences(
         # Return response
         return UserPreferencesResponse(
             user_id=user_id,
+            community_id=preferences.get("community_id"),
             preferences=UserPreferencesModel(
                 sensitivity=preferences.get("sensitivity"),
                 category_thresholds=preferences.get("category_thresholds"),
                 category_weights=preferences.get("category_weights"),
-                custom_rules=preferences.get("custom_rules")
+                custom_rules=preferences.get("custom_rules"),
+                categories=preferences.get("categories")
             ),
             version=preferences.get("version", 1)
         )
@@ -65,15 +71,19 @@ async def update_user_preferences(
         # Return response
         return UserPreferencesResponse(
             user_id=user_id,
+            community_id=updated_preferences.get("community_id"),
             preferences=UserPreferencesModel(
                 sensitivity=updated_preferences.get("sensitivity"),
                 category_thresholds=updated_preferences.get("category_thresholds"),
                 category_weights=updated_preferences.get("category_weights"),
-                custom_rules=updated_preferences.get("custom_rules")
+                custom_rules=updated_preferences.get("custom_rules"),
+                categories=updated_preferences.get("categories")
             ),
             version=updated_preferences.get("version", 1)
         )
         
+    except PreferenceUpdateConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating preferences: {str(e)}")
 
@@ -95,14 +105,109 @@ async def reset_user_preferences(
         # Return response
         return UserPreferencesResponse(
             user_id=user_id,
+            community_id=default_preferences.get("community_id"),
             preferences=UserPreferencesModel(
                 sensitivity=default_preferences.get("sensitivity"),
                 category_thresholds=default_preferences.get("category_thresholds"),
                 category_weights=default_preferences.get("category_weights"),
-                custom_rules=default_preferences.get("custom_rules")
+                custom_rules=default_preferences.get("custom_rules"),
+                categories=default_preferences.get("categories")
             ),
             version=default_preferences.get("version", 1)
         )
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error resetting preferences: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error resetting preferences: {str(e)}")
+
+
+@router.post("/preferences/community", response_model=UserPreferencesResponse)
+async def join_community(
+    community_id: Optional[str] = Body(None, embed=True, description="Community to inherit preferences from"),
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Inherit preferences from a community profile, or from the global defaults if no community is given.
+    """
+    try:
+        # Extract user ID from token (simplified)
+        user_id = "user-123"  # This would come from token validation
+        
+        if community_id and not preference_learning_system.get_community_preferences(community_id):
+            raise HTTPException(status_code=404, detail="Community not found")
+        
+        updated_preferences = await preference_learning_system.assign_community(user_id, community_id)
+        
+        # Return response
+        return UserPreferencesResponse(
+            user_id=user_id,
+            community_id=updated_preferences.get("community_id"),
+            preferences=UserPreferencesModel(
+                sensitivity=updated_preferences.get("sensitivity"),
+                category_thresholds=updated_preferences.get("category_thresholds"),
+                category_weights=updated_preferences.get("category_weights"),
+                custom_rules=updated_preferences.get("custom_rules"),
+                categories=updated_preferences.get("categories")
+            ),
+            version=updated_preferences.get("version", 1)
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error updating community: {str(e)}")
+
+
+@router.get("/communities/{community_id}/preferences", response_model=CommunityPreferencesResponse)
+async def get_community_preferences(
+    community_id: str = Path(..., description="Community ID"),
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Get the effective preferences of a community.
+    """
+    preferences = preference_learning_system.get_community_preferences(community_id)
+    
+    if not preferences:
+        raise HTTPException(status_code=404, detail="Community not found")
+    
+    return CommunityPreferencesResponse(
+        community_id=community_id,
+        preferences=UserPreferencesModel(
+            sensitivity=preferences.get("sensitivity"),
+            category_thresholds=preferences.get("category_thresholds"),
+            category_weights=preferences.get("category_weights"),
+            custom_rules=preferences.get("custom_rules"),
+            categories=preferences.get("categories")
+        ),
+        version=preferences.get("version", 1)
+    )
+
+
+@router.post("/communities/{community_id}/preferences", response_model=CommunityPreferencesResponse)
+async def update_community_preferences(
+    community_id: str = Path(..., description="Community ID"),
+    preferences: UserPreferencesModel = Body(...),
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    Create or update a community profile. All members inherit the change.
+    """
+    try:
+        updated_preferences = await preference_learning_system.set_community_preferences(
+            community_id, preferences.dict(exclude_unset=True)
+        )
+        
+        return CommunityPreferencesResponse(
+            community_id=community_id,
+            preferences=UserPreferencesModel(
+                sensitivity=updated_preferences.get("sensitivity"),
+                category_thresholds=updated_preferences.get("category_thresholds"),
+                category_weights=updated_preferences.get("category_weights"),
+                custom_rules=updated_preferences.get("custom_rules"),
+                categories=updated_preferences.get("categories")
+            ),
+            version=updated_preferences.get("version", 1)
+        )
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error updating community preferences: {str(e)}")
\ No newline at end of file
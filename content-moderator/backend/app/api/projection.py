@@ -0,0 +1,125 @@
+from fastapi import HTTPException, Query
+from fastapi.responses import Response
+from pydantic import BaseModel
+from typing import Dict, Any, Callable, Optional, Sequence, Type
+
+# Nested include/exclude mapping in pydantic's format: {"field": True, "other": {"key": True}}
+FieldTree = Dict[str, Any]
+
+
+def _field_tree(paths: str, model: Type[BaseModel]) -> FieldTree:
+    """
+    Parse comma-separated dotted paths into a nested include/exclude mapping.
+    
+    Args:
+        paths: Paths such as "scores,details.reasoning"
+        model: Response model the top-level names must belong to
+    
+    Returns:
+        Field tree; a path that covers another (e.g. "details" and "details.reasoning") wins
+    """
+    tree: FieldTree = {}
+    for path in paths.split(","):
+        path = path.strip()
+        if not path:
+            continue
+        
+        parts = path.split(".")
+        if not all(parts):
+            raise ValueError(f"Invalid field path: {path}")
+        if parts[0] not in model.__fields__:
+            raise ValueError(f"Unknown field: {parts[0]}")
+        
+        node = tree
+        for part in parts[:-1]:
+            child = node.setdefault(part, {})
+            if child is True:
+                break
+            node = child
+        else:
+            node[parts[-1]] = True
+    
+    return tree
+
+
+class Projection:
+    """
+    Sparse field selection for a response.
+    
+    Applied while serializing, so excluded subtrees (LLM reasoning, preference examples)
+    are never walked or encoded, and the response bypasses FastAPI's second validation
+    and serialization pass through response_model.
+    """
+    
+    __slots__ = ("include", "exclude")
+    
+    def __init__(self, include: Optional[FieldTree] = None, exclude: Optional[FieldTree] = None):
+        self.include = include or None
+        self.exclude = exclude or None
+    
+    def nested(self, field: str, siblings: Sequence[str] = ()) -> "Projection":
+        """
+        Apply this projection to a field of an enclosing model.
+        
+        Args:
+            field: Field holding the projected model
+            siblings: Fields of the enclosing model that are always kept
+        
+        Returns:
+            Projection for the enclosing model
+        """
+        include = {field: self.include, **{name: True for name in siblings}} if self.include else None
+        exclude = {field: self.exclude} if self.exclude else None
+        return Projection(include, exclude)
+    
+    def json(self, model: BaseModel) -> str:
+        """Serialize a model with the projection applied"""
+        return model.json(include=self.include, exclude=self.exclude)
+    
+    def response(self, model: BaseModel) -> Response:
+        """JSON response for a model with the projection applied"""
+        return Response(content=self.json(model), media_type="application/json")
+
+
+def projection_params(
+    model: Type[BaseModel],
+    default_exclude: str = "",
+    always: Sequence[str] = ()
+) -> Callable[..., Projection]:
+    """
+    Create a dependency reading fields= and exclude= query parameters.
+    
+    Args:
+        model: Response model being projected
+        default_exclude: Paths left out when neither parameter is given (the slim default)
+        always: Top-level fields kept even when not listed in fields=
+    
+    Returns:
+        FastAPI dependency returning a Projection
+    """
+    def dependency(
+        fields: Optional[str] = Query(
+            None, description="Comma-separated fields to return; dotted paths select nested keys (e.g. details.reasoning)"
+        ),
+        exclude: Optional[str] = Query(
+            None,
+            description=f"Comma-separated fields to leave out (default: {default_exclude or 'none'}); "
+                        f"pass an empty value to return everything"
+        )
+    ) -> Projection:
+        if fields is None and exclude is None:
+            exclude = default_exclude
+        
+        try:
+            include_tree = _field_tree(fields, model) if fields is not None else None
+            exclude_tree = _field_tree(exclude or "", model)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        if include_tree is not None:
+            for name in always:
+                include_tree[name] = True
+        
+        return Projection(include_tree, exclude_tree)
+    
+    return dependency
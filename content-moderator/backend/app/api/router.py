@@ -1,9 +1,11 @@
 from fastapi import APIRouter
-from app.api.endpoints import moderation, preferences, feedback
+from app.api.endpoints import moderation, preferences, feedback, jobs, admin
 
 api_router = APIRouter()
 
 # Include all endpoint routers
 api_router.include_router(moderation.router, prefix="/moderation", tags=["moderation"])
 api_router.include_router(preferences.router, prefix="/users", tags=["users"])
-api_router.include_router(feedback.router, prefix="/feedback", tags=["feedback"])
\ No newline at end of file
+api_router.include_router(feedback.router, prefix="/feedback", tags=["feedback"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
\ No newline at end of file
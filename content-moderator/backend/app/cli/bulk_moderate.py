@@ -0,0 +1,87 @@
+"""
+Moderate a JSONL file in bulk.
+
+Usage:
+    python -m app.cli.bulk_moderate input.jsonl output.jsonl --concurrency 16
+
+Re-running the same command after a crash or Ctrl-C resumes from the last checkpoint.
+"""
+import argparse
+import asyncio
+import logging
+import sys
+
+from app.core.config import get_settings
+from app.services.bulk_moderation import BulkModerationJob
+
+settings = get_settings()
+
+
+def _format_progress(progress: dict) -> str:
+    """Format a one-line progress report"""
+    total = progress["total_items"]
+    done = f"{progress['completed']}/{total}" if total is not None else str(progress["completed"])
+    eta = progress["eta_seconds"]
+    eta_text = f"{eta:.0f}s" if eta is not None else "-"
+    return (
+        f"{done} items, {progress['failed']} failed, "
+        f"{progress['items_per_second']:.1f} items/s, ETA {eta_text}"
+    )
+
+
+async def _report(job: BulkModerationJob, interval: float) -> None:
+    """Periodically print job progress to stderr"""
+    while True:
+        await asyncio.sleep(interval)
+        print(_format_progress(job.progress()), file=sys.stderr)
+
+
+async def main(args: argparse.Namespace) -> int:
+    job = BulkModerationJob(
+        args.input,
+        args.output,
+        concurrency=args.concurrency,
+        checkpoint_interval=args.checkpoint_interval
+    )
+
+    reporter = asyncio.create_task(_report(job, args.report_interval))
+    try:
+        progress = await job.run(resume=not args.restart, count_total=not args.no_count)
+    finally:
+        reporter.cancel()
+
+    print(_format_progress(progress), file=sys.stderr)
+
+    if progress["status"] != "completed":
+        print(f"Job {progress['status']}: {progress['error']}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Moderate a JSONL file in bulk")
+    parser.add_argument("input", help="JSONL input file")
+    parser.add_argument("output", help="JSONL output file")
+    parser.add_argument("--concurrency", type=int, default=settings.BULK_DEFAULT_CONCURRENCY,
+                        help="Maximum concurrent moderation calls")
+    parser.add_argument("--checkpoint-interval", type=int, default=settings.BULK_CHECKPOINT_INTERVAL,
+                        help="Completed items between checkpoints")
+    parser.add_argument("--report-interval", type=float, default=5.0,
+                        help="Seconds between progress reports")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore any existing checkpoint and start over")
+    parser.add_argument("--no-count", action="store_true",
+                        help="Skip counting input lines (no ETA)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    )
+    try:
+        sys.exit(asyncio.run(main(parse_args())))
+    except KeyboardInterrupt:
+        print("Interrupted; re-run the same command to resume.", file=sys.stderr)
+        sys.exit(130)
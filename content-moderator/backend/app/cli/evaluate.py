@@ -0,0 +1,300 @@
+"""
+Evaluate the moderation engine against a labeled JSONL dataset.
+
+Each input line is a JSON object:
+    {"content": "...", "labels": {"flagged": true, "categories": ["hate"]}, "user_preferences": {...}}
+
+"labels.flagged" defaults to whether any category is labeled, and "user_preferences" is optional.
+
+Usage:
+    python -m app.cli.evaluate dataset.jsonl --recordings recordings.jsonl --mode record
+    python -m app.cli.evaluate dataset.jsonl --recordings recordings.jsonl --mode replay \\
+        --threshold hate=0.6 --output report.json
+
+Upstream responses are stored in the recordings file, so a replay run is deterministic and
+makes no network calls. Recordings keep the latency of the original upstream call, and
+reported latencies are that recorded upstream time plus the local processing time, so replay
+and record runs are comparable. Threshold overrides are applied to the returned scores and never change
+the upstream request, so they can always be replayed; prompt or model changes produce new
+requests and need a record (or auto) run first.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from typing import Dict, List, Any, Optional
+
+from app.core.config import get_settings
+from app.core.reload import current_settings
+from app.services.llm_recorder import ResponseRecorder, RECORDER_MODES
+from app.services.moderation_engine import moderation_engine
+
+settings = get_settings()
+
+
+def _load_dataset(path: str, limit: Optional[int]) -> List[Dict[str, Any]]:
+    """Read labeled examples from a JSONL file"""
+    examples = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            example = json.loads(line)
+            labels = example.get("labels", {})
+            categories = set(labels.get("categories", []))
+            examples.append({
+                "content": example["content"],
+                "user_preferences": example.get("user_preferences"),
+                "categories": categories,
+                "flagged": labels.get("flagged", bool(categories))
+            })
+            if limit is not None and len(examples) >= limit:
+                break
+    return examples
+
+
+def _parse_thresholds(values: List[str]) -> Dict[str, float]:
+    """
+    Parse category=value threshold overrides.
+    
+    Raises:
+        ValueError: If an override names an unknown category or is not a number in [0, 1]
+    """
+    thresholds = {}
+    for value in values:
+        category, _, threshold = value.partition("=")
+        try:
+            parsed = float(threshold)
+        except ValueError:
+            parsed = None
+        if category not in current_settings().MODERATION_CATEGORIES or parsed is None or not 0.0 <= parsed <= 1.0:
+            raise ValueError(f"Invalid threshold override: {value}")
+        thresholds[category] = parsed
+    return thresholds
+
+
+def _apply_thresholds(result: Dict[str, Any],
+                      user_preferences: Optional[Dict[str, Any]],
+                      thresholds: Dict[str, float]) -> Dict[str, Any]:
+    """
+    Re-decide a result with threshold overrides.
+
+    Overrides are applied to the returned scores rather than passed in as preferences,
+    because preferences are part of the prompt and would change the upstream request.
+    """
+    if not thresholds or "error" in result:
+        return result
+
+    sensitivity, category_thresholds, category_weights = moderation_engine._resolve_thresholds(user_preferences)
+    rescored = moderation_engine._process_moderation_results(
+        result["scores"],
+        result.get("details", {}),
+        sensitivity,
+        {**category_thresholds, **thresholds},
+        category_weights
+    )
+    rescored["model_tier"] = result.get("model_tier")
+    return rescored
+
+
+def _percentile(sorted_values: List[float], percentile: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, round(percentile / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+async def _evaluate(examples: List[Dict[str, Any]],
+                    thresholds: Dict[str, float],
+                    concurrency: int,
+                    recorder: ResponseRecorder) -> List[Dict[str, Any]]:
+    """
+    Moderate every example with bounded concurrency.
+    
+    Each outcome's latency is the local processing time plus the upstream latency of its
+    completions as recorded, so replayed completions count as long as they originally took.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def evaluate_one(example: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            timings = recorder.start_timing()
+            start = time.perf_counter()
+            result = await moderation_engine.moderate_content(example["content"], example["user_preferences"])
+            result = _apply_thresholds(result, example["user_preferences"], thresholds)
+            local = time.perf_counter() - start - timings["waited"]
+            return {
+                "example": example,
+                "result": result,
+                "latency": local + timings["upstream"],
+                "upstream_latency": timings["upstream"]
+            }
+
+    return await asyncio.gather(*(evaluate_one(example) for example in examples))
+
+
+def _build_report(outcomes: List[Dict[str, Any]],
+                  recorder: ResponseRecorder,
+                  prompt_price: float,
+                  completion_price: float,
+                  wall_time: float) -> Dict[str, Any]:
+    """Aggregate quality, latency and cost metrics"""
+    counts = {category: {"tp": 0, "fp": 0, "fn": 0} for category in current_settings().MODERATION_CATEGORIES}
+    flag_agreements = 0
+    errors = []
+    latencies = []
+    upstream_latencies = []
+
+    for outcome in outcomes:
+        result = outcome["result"]
+        example = outcome["example"]
+
+        if "error" in result:
+            errors.append(result["error"])
+            continue
+
+        latencies.append(outcome["latency"])
+        upstream_latencies.append(outcome["upstream_latency"])
+        flag_agreements += result.get("flagged", False) == example["flagged"]
+
+        predicted = set(result.get("flagged_categories", []))
+        for category in counts:
+            if category in predicted and category in example["categories"]:
+                counts[category]["tp"] += 1
+            elif category in predicted:
+                counts[category]["fp"] += 1
+            elif category in example["categories"]:
+                counts[category]["fn"] += 1
+
+    categories = {}
+    for category, count in counts.items():
+        predicted = count["tp"] + count["fp"]
+        actual = count["tp"] + count["fn"]
+        categories[category] = {
+            **count,
+            "precision": count["tp"] / predicted if predicted else None,
+            "recall": count["tp"] / actual if actual else None
+        }
+
+    latencies.sort()
+    upstream_latencies.sort()
+    scored = len(latencies)
+    prompt_tokens = sum(usage["prompt_tokens"] for usage in recorder.usage.values())
+    completion_tokens = sum(usage["completion_tokens"] for usage in recorder.usage.values())
+
+    return {
+        "examples": len(outcomes),
+        "scored": scored,
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "flag_agreement": flag_agreements / scored if scored else None,
+        "categories": categories,
+        "latency": {
+            "p50": _percentile(latencies, 50),
+            "p90": _percentile(latencies, 90),
+            "p99": _percentile(latencies, 99),
+            "mean": sum(latencies) / scored if scored else None
+        },
+        "upstream_latency": {
+            "p50": _percentile(upstream_latencies, 50),
+            "p90": _percentile(upstream_latencies, 90),
+            "p99": _percentile(upstream_latencies, 99),
+            "mean": sum(upstream_latencies) / scored if scored else None
+        },
+        "wall_time": wall_time,
+        "items_per_second": len(outcomes) / wall_time if wall_time > 0 else None,
+        "upstream": {
+            "replayed": recorder.replayed,
+            "recorded": recorder.recorded,
+            "missing_latency": recorder.missing_latency,
+            "usage": recorder.usage
+        },
+        "tokens": {"prompt": prompt_tokens, "completion": completion_tokens},
+        "estimated_cost": (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+    }
+
+
+def _format_report(report: Dict[str, Any]) -> str:
+    """Human-readable summary of a report"""
+    def fmt(value: Optional[float], spec: str = ".3f") -> str:
+        return format(value, spec) if value is not None else "-"
+
+    latency = report["latency"]
+    lines = [
+        f"{report['scored']}/{report['examples']} scored, {report['errors']} errors, "
+        f"{fmt(report['items_per_second'], '.1f')} items/s",
+        f"Flag agreement: {fmt(report['flag_agreement'])}",
+        f"Latency p50/p90/p99: {fmt(latency['p50'])}s / {fmt(latency['p90'])}s / {fmt(latency['p99'])}s "
+        f"(upstream p50 {fmt(report['upstream_latency']['p50'])}s)",
+        f"Upstream: {report['upstream']['replayed']} replayed, {report['upstream']['recorded']} recorded",
+        f"Tokens: {report['tokens']['prompt']} prompt, {report['tokens']['completion']} completion "
+        f"(~${report['estimated_cost']:.4f})",
+        "",
+        f"{'category':<18} {'precision':>9} {'recall':>9} {'tp':>6} {'fp':>6} {'fn':>6}"
+    ]
+    for category, metrics in report["categories"].items():
+        lines.append(
+            f"{category:<18} {fmt(metrics['precision']):>9} {fmt(metrics['recall']):>9} "
+            f"{metrics['tp']:>6} {metrics['fp']:>6} {metrics['fn']:>6}"
+        )
+    return "\n".join(lines)
+
+
+async def main(args: argparse.Namespace) -> int:
+    examples = _load_dataset(args.dataset, args.limit)
+    thresholds = args.thresholds
+
+    recorder = ResponseRecorder(args.recordings, mode=args.mode)
+    moderation_engine.recorder = recorder
+
+    start = time.perf_counter()
+    outcomes = await _evaluate(examples, thresholds, args.concurrency, recorder)
+    report = _build_report(outcomes, recorder, args.prompt_price, args.completion_price,
+                           time.perf_counter() - start)
+    report["thresholds"] = thresholds
+    report["mode"] = args.mode
+
+    print(_format_report(report))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    return 1 if report["errors"] else 0
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Evaluate moderation quality, latency and cost on a labeled dataset")
+    parser.add_argument("dataset", help="Labeled JSONL dataset")
+    parser.add_argument("--recordings", required=True, help="JSONL file of recorded upstream responses")
+    parser.add_argument("--mode", choices=RECORDER_MODES, default="auto",
+                        help="record: always call upstream; replay: recordings only; auto: replay or record")
+    parser.add_argument("--concurrency", type=int, default=settings.BULK_DEFAULT_CONCURRENCY,
+                        help="Maximum concurrent moderation calls")
+    parser.add_argument("--threshold", action="append", default=[], metavar="CATEGORY=VALUE",
+                        help="Override a category threshold (repeatable)")
+    parser.add_argument("--limit", type=int, help="Evaluate only the first N examples")
+    parser.add_argument("--prompt-price", type=float, default=0.0,
+                        help="Price per 1K prompt tokens")
+    parser.add_argument("--completion-price", type=float, default=0.0,
+                        help="Price per 1K completion tokens")
+    parser.add_argument("--output", help="Write the full report as JSON")
+    args = parser.parse_args(argv)
+    
+    try:
+        args.thresholds = _parse_thresholds(args.threshold)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    return args
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    )
+    sys.exit(asyncio.run(main(parse_args())))
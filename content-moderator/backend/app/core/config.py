@@ -1,7 +1,6 @@
 from pydantic import BaseSettings, Field
 from typing import Optional, List, Dict, Any
 import os
-from functools import lru_cache
 
 
 class Settings(BaseSettings):
@@ -37,6 +36,107 @@ class Settings(BaseSettings):
         "misinformation"
     ]
     
+    # Streamed Analysis
+    LLM_STREAMING_ENABLED: bool = False  # Stream completions and decide once category_scores is parsed
+    
+    # Two-phase Analysis
+    TWO_PHASE_ENABLED: bool = False  # Score first; request details only for flagged content
+    DETAILS_MODE: str = "inline"  # "inline" waits for details of flagged content, "deferred" fills them in later
+    
+    # Model Cascade
+    CASCADE_ENABLED: bool = False  # Score with a fast model first, escalate close calls
+    CASCADE_FAST_MODEL: str = "gpt-3.5-turbo"
+    CASCADE_ESCALATION_BAND: float = 0.15  # Escalate when a score is this close to its threshold
+    
+    # Shadow Evaluation
+    SHADOW_ENABLED: bool = False  # Replay sampled requests against a candidate model/prompt
+    SHADOW_MODEL: Optional[str] = None  # Candidate model (defaults to OPENAI_MODEL)
+    SHADOW_PROMPT: Optional[str] = None  # Candidate moderation instructions (defaults to the standard prompt)
+    SHADOW_SAMPLE_RATE: float = 0.05  # Fraction of requests to shadow
+    SHADOW_MAX_CONCURRENCY: int = 4  # Shadow calls in flight before samples are dropped
+    SHADOW_HISTORY_SIZE: int = 1000  # Recent comparisons kept for inspection
+    
+    # Bulk Moderation Jobs
+    BULK_DEFAULT_CONCURRENCY: int = 8  # Concurrent engine calls per job
+    BULK_CHECKPOINT_INTERVAL: int = 100  # Completed items between checkpoints
+    BULK_JOBS_DIR: str = "bulk_jobs"  # Job input and output files are named relative to this directory
+    
+    # Streaming Moderation
+    STREAM_MAX_CONCURRENCY: int = 8  # Concurrent engine calls per streamed request
+    STREAM_MAX_ITEMS: int = 100  # Maximum items in one streamed request
+    
+    # WebSocket Moderation
+    WS_MAX_CONCURRENCY: int = 16  # Messages moderated at once per connection; reading pauses beyond this
+    WS_POLICY_REFRESH_SECONDS: float = 30.0  # How long a session reuses the user's compiled policy
+    
+    # Incremental Re-moderation
+    SEGMENT_MAX_CHARS: int = 500  # Target segment size when scoring edits
+    SEGMENT_MAX_CONCURRENCY: int = 4  # Segments scored at once across all edits
+    SEGMENT_SCORE_ON_CREATE: bool = False  # Score segments of new long content in the background, so its first edit is cheap
+    
+    # Feedback Statistics
+    FEEDBACK_STATS_PATH: Optional[str] = "feedback_stats.json"  # Where aggregates are persisted and restored at startup (None to disable)
+    FEEDBACK_STATS_PERSIST_INTERVAL: float = 30.0  # Seconds between persists
+    FEEDBACK_BASELINE_WINDOW: int = 50  # Feedback events that define baseline agreement
+    FEEDBACK_RECENT_ALPHA: float = 0.05  # Smoothing factor for recent agreement
+    
+    # Image Moderation
+    IMAGE_MAX_BYTES: int = 10 * 1024 * 1024  # Largest accepted upload
+    IMAGE_MAX_PIXELS: int = 50_000_000  # Reject larger images before decoding
+    IMAGE_DECODE_WORKERS: int = 4  # Threads for decoding and hashing
+    IMAGE_HASH_INDEX_SIZE: int = 100000  # Hashed images kept for dedupe
+    IMAGE_HASH_MAX_DISTANCE: int = 6  # Max Hamming distance (of 64 bits) for a near-duplicate
+    IMAGE_SCORER: str = "local"  # "local" stand-in or "openai"
+    IMAGE_MODEL: str = "gpt-4-vision-preview"  # Vision model used by the "openai" scorer
+    IMAGE_THUMBNAIL_SIZE: int = 512  # Longest side of the image sent to the scorer
+    
+    # Write-behind Persistence
+    WRITE_BEHIND_ENABLED: bool = False  # Persist history and feedback records to DATABASE_URL in background batches
+    WRITE_BEHIND_BATCH_SIZE: int = 500  # Records per bulk write
+    WRITE_BEHIND_FLUSH_INTERVAL: float = 1.0  # Max seconds a record waits before being flushed
+    WRITE_BEHIND_MAX_PENDING: int = 50000  # Buffered records before submitters wait (backpressure)
+    WRITE_BEHIND_MAX_RETRIES: int = 10  # Failed attempts before a batch is dead-lettered
+    WRITE_BEHIND_SPILL_PATH: Optional[str] = "write_behind_spill.jsonl"  # Records that could not be written at shutdown (replayed on start)
+    WRITE_BEHIND_DEAD_LETTER_PATH: Optional[str] = "write_behind_dead_letter.jsonl"  # Batches that kept failing (not replayed)
+    
+    # Preference Updates
+    PREFERENCE_LOCK_STRIPES: int = 256  # Per-user lock stripes serializing profile updates within a worker
+    PREFERENCE_UPDATE_MAX_RETRIES: int = 5  # Compare-and-swap attempts before an update is rejected
+    PREFERENCE_POLICY_CACHE_SIZE: int = 100000  # Compiled policies kept; the least recently used are recompiled on demand
+    
+    # Bulk Feedback
+    FEEDBACK_BULK_MAX_ITEMS: int = 1000  # Maximum feedback items per bulk submission
+    
+    # Content Blob Store
+    BLOB_CODEC: str = "zlib"  # Compression for stored content: zlib or zstd (needs the zstandard package)
+    BLOB_COMPRESS_MIN_BYTES: int = 256  # Smaller content is stored uncompressed
+    
+    # Streaming Analytics
+    ANALYTICS_ENABLED: bool = True  # Feed moderation results into fixed-size sketches
+    ANALYTICS_HISTOGRAM_BINS: int = 1000  # Score histogram bins per category (quantile resolution 1/bins)
+    ANALYTICS_SKETCH_WIDTH: int = 2048  # Counters per count-min row (phrases, users)
+    ANALYTICS_SKETCH_DEPTH: int = 4  # Count-min rows
+    ANALYTICS_TOP_K: int = 100  # Heavy hitters tracked for phrases and users
+    ANALYTICS_HLL_PRECISION: int = 12  # HyperLogLog index bits (2^12 registers, ~1.6% error)
+    ANALYTICS_RATE_WINDOW: float = 3600.0  # Seconds per user request-rate window
+    
+    # Explanation Cache
+    EXPLANATION_CACHE_SIZE: int = 10000  # Maximum cached detailed explanations
+    EXPLANATION_SENSITIVITY_BUCKET: float = 0.1  # Sensitivity bucket width for cache keys
+    
+    # Request Tracing
+    TRACING_ENABLED: bool = True  # Record per-request spans
+    TRACE_BUFFER_SIZE: int = 1000  # Recent traces kept for the debug endpoint
+    TRACE_SLOW_THRESHOLD: float = 5.0  # Log a span breakdown for traces slower than this (seconds)
+    
+    # Sampling Profiler
+    PROFILER_ENABLED: bool = False  # Sample the event loop thread's stack in the background
+    PROFILER_INTERVAL: float = 0.005  # Seconds between stack samples
+    PROFILER_SAMPLE_RATE: float = 0.01  # Fraction of requests to keep profiles for
+    PROFILER_SLOW_THRESHOLD: Optional[float] = 1.0  # Always keep profiles for requests slower than this (seconds)
+    PROFILER_WINDOW_SECONDS: float = 60.0  # How long raw samples are retained
+    PROFILER_MAX_PROFILES: int = 100  # Request profiles kept for the admin endpoint
+    
     # Explanation Templates
     EXPLANATION_TEMPLATES: Dict[str, str] = {
         "hate": "This content was flagged for potentially containing hateful language or promoting discrimination against {targets}.",
@@ -54,6 +154,17 @@ class Settings(BaseSettings):
         case_sensitive = True
 
 
-@lru_cache()
+_settings: Optional[Settings] = None
+
+
 def get_settings():
-    return Settings()
\ No newline at end of file
+    global _settings
+    if _settings is None:
+        _settings = Settings()
+    return _settings
+
+
+def set_settings(settings: Settings) -> None:
+    """Replace the settings returned by get_settings (used by hot reload)"""
+    global _settings
+    _settings = settings
\ No newline at end of file
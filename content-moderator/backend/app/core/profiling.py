@@ -0,0 +1,213 @@
+from collections import Counter, deque
+from typing import Any, Dict, List, Optional
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+def format_collapsed(stacks: Counter) -> str:
+    """Format stack counts in collapsed format ("frame;frame;frame count" per line), as read by flamegraph.pl"""
+    return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+
+
+class RequestProfile:
+    """Collapsed stacks sampled from the event loop thread while one request was in flight"""
+    
+    __slots__ = ("profile_id", "request_id", "name", "timestamp", "duration", "reason", "stacks")
+    
+    def __init__(self,
+                 request_id: Optional[str],
+                 name: str,
+                 duration: float,
+                 reason: str,
+                 stacks: Counter):
+        self.profile_id = uuid.uuid4().hex[:16]
+        self.request_id = request_id
+        self.name = name
+        self.timestamp = time.time()
+        self.duration = duration
+        self.reason = reason
+        self.stacks = stacks
+    
+    def collapsed(self) -> str:
+        """Stacks in collapsed-stack format"""
+        return format_collapsed(self.stacks)
+    
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "profile_id": self.profile_id,
+            "request_id": self.request_id,
+            "name": self.name,
+            "timestamp": self.timestamp,
+            "duration": self.duration,
+            "reason": self.reason,
+            "samples": sum(self.stacks.values())
+        }
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for the event loop thread.
+    
+    A daemon thread samples the loop thread's stack at a fixed interval into a rolling
+    window of timestamped samples. When a request finishes, the middleware asks for a
+    profile covering its lifetime; one is kept if the request was randomly sampled or
+    exceeded the latency threshold. Because every request shares the loop thread, a
+    profile shows whatever blocked the loop while the request was in flight, including
+    work done on behalf of concurrent requests.
+    """
+    
+    def __init__(self,
+                 enabled: bool = settings.PROFILER_ENABLED,
+                 interval: float = settings.PROFILER_INTERVAL,
+                 sample_rate: float = settings.PROFILER_SAMPLE_RATE,
+                 slow_threshold: Optional[float] = settings.PROFILER_SLOW_THRESHOLD,
+                 window_seconds: float = settings.PROFILER_WINDOW_SECONDS,
+                 max_profiles: int = settings.PROFILER_MAX_PROFILES):
+        """
+        Initialize the profiler.
+        
+        Args:
+            enabled: Whether to sample at all
+            interval: Seconds between stack samples
+            sample_rate: Fraction of requests to keep profiles for (0-1)
+            slow_threshold: Always keep profiles for requests slower than this (seconds)
+            window_seconds: How long raw samples are retained
+            max_profiles: Number of request profiles kept
+        """
+        self.enabled = enabled
+        self.interval = interval
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        
+        self.profiles: deque = deque(maxlen=max_profiles)
+        self._samples: deque = deque(maxlen=max(1, int(window_seconds / interval)))
+        self._samples_lock = threading.Lock()
+        self._labels: Dict[Any, str] = {}
+        self._target_thread: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self) -> None:
+        """Start sampling the calling thread (call from the event loop thread)"""
+        if not self.enabled or self.running:
+            return
+        
+        self._target_thread = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        logger.info(f"Sampling profiler started ({self.interval * 1000:.0f}ms interval)")
+    
+    def stop(self) -> None:
+        """Stop sampling"""
+        if self._thread is None:
+            return
+        
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+        self._thread = None
+    
+    def maybe_capture(self,
+                      name: str,
+                      start: float,
+                      end: float,
+                      request_id: Optional[str] = None) -> Optional[RequestProfile]:
+        """
+        Keep a profile for a finished request if it was sampled or slow.
+        
+        Args:
+            name: Request name (method and route)
+            start: Request start, from time.perf_counter()
+            end: Request end, from time.perf_counter()
+            request_id: Request ID, to cross-reference traces
+        
+        Returns:
+            The stored profile, or None
+        """
+        if not self.running:
+            return None
+        
+        duration = end - start
+        if self.slow_threshold is not None and duration >= self.slow_threshold:
+            reason = "slow"
+        elif random.random() < self.sample_rate:
+            reason = "sampled"
+        else:
+            return None
+        
+        profile = RequestProfile(request_id, name, duration, reason, self._collapse(start, end))
+        self.profiles.append(profile)
+        return profile
+    
+    def get_profile(self, profile_id: str) -> Optional[RequestProfile]:
+        """Find a stored profile by profile ID or request ID"""
+        for profile in reversed(self.profiles):
+            if profile_id in (profile.profile_id, profile.request_id):
+                return profile
+        return None
+    
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """Summaries of stored profiles, slowest first"""
+        return [profile.summary() for profile in sorted(self.profiles, key=lambda p: p.duration, reverse=True)]
+    
+    def aggregate(self, name: Optional[str] = None) -> Counter:
+        """Merge the stacks of all stored profiles, optionally for one request name"""
+        stacks: Counter = Counter()
+        for profile in list(self.profiles):
+            if name is None or profile.name == name:
+                stacks.update(profile.stacks)
+        return stacks
+    
+    def _collapse(self, start: float, end: float) -> Counter:
+        """Count the sampled stacks taken between start and end"""
+        stacks: Counter = Counter()
+        with self._samples_lock:
+            for timestamp, stack in reversed(self._samples):
+                if timestamp < start:
+                    break
+                if timestamp <= end:
+                    stacks[stack] += 1
+        return stacks
+    
+    def _run(self) -> None:
+        """Sampler thread loop"""
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target_thread)
+            if frame is None:
+                continue
+            
+            stack = self._format_stack(frame)
+            del frame
+            with self._samples_lock:
+                self._samples.append((time.perf_counter(), stack))
+    
+    def _format_stack(self, frame) -> str:
+        """Collapse a frame chain into "root;...;leaf" using cached per-code labels"""
+        labels = []
+        while frame is not None:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                self._labels[code] = label
+            labels.append(label)
+            frame = frame.f_back
+        labels.reverse()
+        return ";".join(labels)
+
+
+# Singleton instance
+profiler = SamplingProfiler()
@@ -0,0 +1,202 @@
+from collections import deque
+from contextvars import ContextVar, Token
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import time
+from app.core.config import Settings, get_settings, set_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# build(settings, previous artifact or None) -> artifact
+ArtifactBuilder = Callable[[Settings, Optional[Any]], Any]
+
+# callback(old snapshot, new snapshot)
+ChangeListener = Callable[["SettingsSnapshot", "SettingsSnapshot"], None]
+
+
+class SettingsSnapshot:
+    """Settings plus the artifacts compiled from them. Never modified once published."""
+    
+    __slots__ = ("version", "settings", "artifacts", "created_at")
+    
+    def __init__(self, version: int, settings: Settings, artifacts: Dict[str, Any]):
+        self.version = version
+        self.settings = settings
+        self.artifacts = artifacts
+        self.created_at = time.time()
+    
+    def get(self, name: str) -> Any:
+        """Artifact by name"""
+        return self.artifacts[name]
+
+
+class SettingsReloader:
+    """
+    Hot reload of moderation settings without a restart.
+    
+    Modules register the artifacts they derive from settings (category index, compiled
+    templates, prompt prefixes) together with the fields each one depends on, and
+    listeners for caches that must be invalidated when those fields change. A reload
+    re-reads the environment and .env, rebuilds only the affected artifacts in a worker
+    thread, and publishes the new snapshot with a single reference swap.
+    
+    Requests pin the snapshot that is current when they start (see pin), so in-flight
+    requests and the tasks they spawn finish on the old one. Only fields that some
+    artifact or listener depends on are reloadable; other changes are reported as
+    requiring a restart and are not applied.
+    """
+    
+    def __init__(self, initial: Settings = settings, history_size: int = 20):
+        """
+        Initialize the reloader.
+        
+        Args:
+            initial: Settings the process started with
+            history_size: Number of reload reports kept
+        """
+        self._current = SettingsSnapshot(1, initial, {})
+        self._builders: Dict[str, Tuple[Tuple[str, ...], ArtifactBuilder]] = {}
+        self._listeners: List[Tuple[str, Tuple[str, ...], ChangeListener]] = []
+        self._pinned: ContextVar[Optional[SettingsSnapshot]] = ContextVar("settings_snapshot", default=None)
+        self._lock = asyncio.Lock()
+        self.history: deque = deque(maxlen=history_size)
+    
+    @property
+    def current(self) -> SettingsSnapshot:
+        """Latest published snapshot"""
+        return self._current
+    
+    @property
+    def reloadable_fields(self) -> List[str]:
+        """Settings fields that can change without a restart"""
+        fields = set()
+        for dependencies, _ in self._builders.values():
+            fields.update(dependencies)
+        for _, dependencies, _ in self._listeners:
+            fields.update(dependencies)
+        return sorted(fields)
+    
+    def register_artifact(self, name: str, fields: Tuple[str, ...], build: ArtifactBuilder) -> None:
+        """
+        Register an artifact derived from settings and build it for the current snapshot.
+        
+        Args:
+            name: Artifact name
+            fields: Settings fields the artifact depends on
+            build: Builds the artifact; must not touch shared state (runs in a worker thread)
+        """
+        self._builders[name] = (tuple(fields), build)
+        self._current.artifacts[name] = build(self._current.settings, None)
+    
+    def on_change(self, name: str, fields: Tuple[str, ...], callback: ChangeListener) -> None:
+        """
+        Register a callback run after a reload that changed any of the given fields.
+        
+        Args:
+            name: Name reported when the callback runs (e.g. the cache it invalidates)
+            fields: Settings fields to watch
+            callback: Called with the old and new snapshots
+        """
+        self._listeners.append((name, tuple(fields), callback))
+    
+    def snapshot(self) -> SettingsSnapshot:
+        """Snapshot pinned by the current request, or the latest one outside requests"""
+        return self._pinned.get() or self._current
+    
+    def get(self, name: str) -> Any:
+        """Artifact from the snapshot the caller runs on"""
+        return self.snapshot().artifacts[name]
+    
+    def pin(self) -> Token:
+        """Pin the current snapshot for the calling context (and tasks it creates)"""
+        return self._pinned.set(self._current)
+    
+    def unpin(self, token: Token) -> None:
+        """Undo pin"""
+        self._pinned.reset(token)
+    
+    async def reload(self, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Re-read settings and publish a new snapshot if reloadable fields changed.
+        
+        Args:
+            overrides: Values taking precedence over the environment (as Settings keyword arguments)
+        
+        Returns:
+            Report with the changed, applied and ignored fields, rebuilt artifacts and invalidated caches
+        
+        Raises:
+            ValueError: If an artifact cannot be built from the new settings (nothing is swapped)
+        """
+        async with self._lock:
+            start = time.perf_counter()
+            old = self._current
+            
+            loaded = await asyncio.to_thread(lambda: Settings(**(overrides or {})))
+            changed = [
+                field for field in Settings.__fields__
+                if getattr(loaded, field) != getattr(old.settings, field)
+            ]
+            reloadable = set(self.reloadable_fields)
+            applied = [field for field in changed if field in reloadable]
+            
+            report = {
+                "version": old.version,
+                "changed": changed,
+                "applied": applied,
+                "restart_required": [field for field in changed if field not in reloadable],
+                "rebuilt": [],
+                "invalidated": []
+            }
+            
+            if applied:
+                new_settings = old.settings.copy(update={field: getattr(loaded, field) for field in applied})
+                rebuild = [
+                    name for name, (dependencies, _) in self._builders.items()
+                    if set(dependencies).intersection(applied)
+                ]
+                
+                # Build off to the side; a failure leaves the published snapshot untouched
+                artifacts = dict(old.artifacts)
+                artifacts.update(await asyncio.to_thread(self._build, rebuild, new_settings, old))
+                snapshot = SettingsSnapshot(old.version + 1, new_settings, artifacts)
+                
+                # Swap: requests starting from here pin the new snapshot
+                self._current = snapshot
+                set_settings(new_settings)
+                
+                for name, dependencies, callback in self._listeners:
+                    if set(dependencies).intersection(applied):
+                        try:
+                            callback(old, snapshot)
+                            report["invalidated"].append(name)
+                        except Exception as e:
+                            logger.error(f"Settings reload listener {name} failed: {str(e)}")
+                
+                report["version"] = snapshot.version
+                report["rebuilt"] = rebuild
+            
+            report["seconds"] = time.perf_counter() - start
+            self.history.append({**report, "timestamp": time.time()})
+            
+            if applied:
+                logger.info(f"Settings reloaded (version {report['version']}): {', '.join(applied)}")
+            if report["restart_required"]:
+                logger.warning(f"Settings changes need a restart to apply: {', '.join(report['restart_required'])}")
+            
+            return report
+    
+    def _build(self, names: List[str], new_settings: Settings, old: SettingsSnapshot) -> Dict[str, Any]:
+        """Build artifacts for new settings (runs in a worker thread)"""
+        return {name: self._builders[name][1](new_settings, old.artifacts.get(name)) for name in names}
+
+
+def current_settings() -> Settings:
+    """Settings of the snapshot the caller runs on"""
+    return settings_reloader.snapshot().settings
+
+
+# Singleton instance
+settings_reloader = SettingsReloader()
@@ -0,0 +1,298 @@
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+import asyncio
+import functools
+import logging
+import time
+import uuid
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """A timed stage within a trace"""
+    
+    __slots__ = ("name", "span_id", "parent_id", "start", "end", "attributes", "error")
+    
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+    
+    @property
+    def duration(self) -> Optional[float]:
+        return self.end - self.start if self.end is not None else None
+    
+    def to_dict(self, trace_start: float) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "offset": self.start - trace_start,
+            "duration": self.duration,
+            "attributes": self.attributes,
+            "error": self.error
+        }
+
+
+class Trace:
+    """All spans recorded for one request, keyed by its request ID"""
+    
+    __slots__ = ("trace_id", "name", "timestamp", "start", "end", "spans", "attributes", "deferred")
+    
+    def __init__(self, trace_id: str, name: str, attributes: Dict[str, Any]):
+        self.trace_id = trace_id
+        self.name = name
+        self.timestamp = time.time()
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.spans: List[Span] = []
+        self.attributes = attributes
+        self.deferred = False  # Ended by finish_after instead of when start_trace exits
+    
+    @property
+    def duration(self) -> Optional[float]:
+        return self.end - self.start if self.end is not None else None
+    
+    def slowest_span(self) -> Optional[Span]:
+        """Slowest finished leaf span (the stage that does the actual waiting)"""
+        parents = {span.parent_id for span in self.spans}
+        leaves = [span for span in self.spans if span.span_id not in parents and span.end is not None]
+        return max(leaves, key=lambda span: span.duration, default=None)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        slowest = self.slowest_span()
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "timestamp": self.timestamp,
+            "duration": self.duration,
+            "attributes": self.attributes,
+            "slowest_span": slowest.name if slowest else None,
+            "spans": [span.to_dict(self.start) for span in self.spans]
+        }
+
+
+class SpanExporter(ABC):
+    """Receives finished traces. Subclass and register with tracer.add_exporter()."""
+    
+    @abstractmethod
+    def export(self, trace: Trace) -> None:
+        """
+        Handle a finished trace.
+        
+        Args:
+            trace: The completed trace, including all of its spans
+        """
+
+
+class RingBufferExporter(SpanExporter):
+    """Keeps the most recent traces in memory for the debug endpoint"""
+    
+    def __init__(self, capacity: int = settings.TRACE_BUFFER_SIZE):
+        self.traces: deque = deque(maxlen=capacity)
+    
+    def export(self, trace: Trace) -> None:
+        self.traces.append(trace)
+    
+    def get(self, trace_id: str) -> Optional[Trace]:
+        """Find a buffered trace by ID"""
+        for trace in reversed(self.traces):
+            if trace.trace_id == trace_id:
+                return trace
+        return None
+    
+    def slowest(self, limit: int = 20, name: Optional[str] = None) -> List[Trace]:
+        """
+        Slowest buffered traces.
+        
+        Args:
+            limit: Maximum number of traces to return
+            name: Only include traces with this name (e.g. "POST /api/v1/moderation/moderate/{content_id}/feedback")
+        
+        Returns:
+            Traces ordered slowest first
+        """
+        traces = [trace for trace in self.traces if name is None or trace.name == name]
+        return sorted(traces, key=lambda trace: trace.duration or 0.0, reverse=True)[:limit]
+
+
+class SlowTraceLogExporter(SpanExporter):
+    """Logs a per-span breakdown of traces slower than a threshold"""
+    
+    def __init__(self, threshold: float = settings.TRACE_SLOW_THRESHOLD):
+        self.threshold = threshold
+    
+    def export(self, trace: Trace) -> None:
+        if trace.duration is None or trace.duration < self.threshold:
+            return
+        
+        breakdown = ", ".join(
+            f"{span.name}={span.duration * 1000:.0f}ms" for span in trace.spans if span.end is not None
+        )
+        logger.warning(f"Slow trace {trace.trace_id} {trace.name} took {trace.duration * 1000:.0f}ms: {breakdown}")
+
+
+# Active trace and span for the current request (propagated across awaits and tasks)
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    Span-based request tracer.
+    
+    A trace is started per request and its ID is propagated through contextvars, so every
+    span opened while handling the request (including in tasks it spawns) lands in the same
+    trace. Spans opened outside a trace are no-ops.
+    """
+    
+    def __init__(self, enabled: bool = settings.TRACING_ENABLED):
+        self.enabled = enabled
+        self.exporters: List[SpanExporter] = []
+    
+    def add_exporter(self, exporter: SpanExporter) -> None:
+        """Register an exporter for finished traces"""
+        self.exporters.append(exporter)
+    
+    @contextmanager
+    def start_trace(self, name: str, trace_id: Optional[str] = None, **attributes: Any) -> Iterator[Optional[Trace]]:
+        """
+        Start a trace for the current context and export it when the block exits.
+        
+        Args:
+            name: Trace name
+            trace_id: Request ID to use (generated if not provided)
+            attributes: Trace attributes
+        """
+        if not self.enabled:
+            yield None
+            return
+        
+        trace = Trace(trace_id or uuid.uuid4().hex, name, attributes)
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(None)
+        try:
+            yield trace
+        finally:
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            if not trace.deferred:
+                self._finish(trace)
+    
+    def finish_after(self, trace: Trace, body: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """
+        Keep a trace open until a response body has been sent.
+        
+        Streamed bodies (e.g. /moderate/stream) do their work while being iterated, after
+        the handler has returned, so their spans would otherwise land in a trace that was
+        already exported.
+        
+        Args:
+            trace: Trace started with start_trace
+            body: Response body iterator
+        
+        Returns:
+            Body iterator that ends and exports the trace once it is exhausted or closed
+        """
+        trace.deferred = True
+        
+        async def traced_body() -> AsyncIterator[bytes]:
+            try:
+                async for chunk in body:
+                    yield chunk
+            finally:
+                self._finish(trace)
+        
+        return traced_body()
+    
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+        """
+        Time a block as a child of the current span.
+        
+        Args:
+            name: Span name
+            attributes: Span attributes
+        """
+        trace = _current_trace.get()
+        if trace is None:
+            yield None
+            return
+        
+        parent = _current_span.get()
+        span = Span(name, parent.span_id if parent else None, attributes)
+        trace.spans.append(span)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.end = time.perf_counter()
+            _current_span.reset(token)
+    
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Set an attribute on the current span, if any"""
+        span = _current_span.get()
+        if span is not None:
+            span.attributes[key] = value
+    
+    def traced(self, name: str) -> Callable:
+        """Decorator that wraps a function (sync or async) in a span"""
+        def decorator(func: Callable) -> Callable:
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(name):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+            
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+    
+    def _finish(self, trace: Trace) -> None:
+        trace.end = time.perf_counter()
+        self._export(trace)
+    
+    def _export(self, trace: Trace) -> None:
+        for exporter in self.exporters:
+            try:
+                exporter.export(trace)
+            except Exception as e:
+                logger.error(f"Trace exporter error: {str(e)}")
+
+
+def current_request_id() -> Optional[str]:
+    """Request ID of the active trace, if any"""
+    trace = _current_trace.get()
+    return trace.trace_id if trace is not None else None
+
+
+class RequestIdLogFilter(logging.Filter):
+    """Adds the active request ID to log records as %(request_id)s"""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = current_request_id() or "-"
+        return True
+
+
+# Singleton instances
+tracer = Tracer()
+trace_buffer = RingBufferExporter()
+tracer.add_exporter(trace_buffer)
+tracer.add_exporter(SlowTraceLogExporter())
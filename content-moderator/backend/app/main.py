@@ -3,20 +3,29 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.responses import JSONResponse
 from fastapi.openapi.utils import get_openapi
+import asyncio
+import signal
 import time
 import logging
 from typing import Dict, Any
 
 from app.core.config import get_settings
+from app.core.tracing import tracer, current_request_id, RequestIdLogFilter
+from app.core.profiling import profiler
+from app.core.reload import settings_reloader
 from app.api.router import api_router
+from app.services.feedback_processor import feedback_processor
+from app.services.write_behind import write_behind
 
 settings = get_settings()
 
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    format='%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s',
 )
+for handler in logging.getLogger().handlers:
+    handler.addFilter(RequestIdLogFilter())
 logger = logging.getLogger(__name__)
 
 # Create FastAPI app
@@ -48,6 +57,88 @@ async def add_process_time_header(request: Request, call_next):
     return response
 
 
+# Add middleware for request profiling (opt-in via PROFILER_ENABLED)
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    if not profiler.running:
+        return await call_next(request)
+    
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    profile = profiler.maybe_capture(
+        f"{request.method} {route.path if route is not None else request.url.path}",
+        start,
+        time.perf_counter(),
+        current_request_id()
+    )
+    if profile is not None:
+        response.headers["X-Profile-ID"] = profile.profile_id
+    return response
+
+
+# Add middleware for request tracing (registered last so it wraps the timing middleware)
+@app.middleware("http")
+async def trace_request(request: Request, call_next):
+    request_id = request.headers.get("X-Request-ID")
+    with tracer.start_trace(f"{request.method} {request.url.path}", trace_id=request_id) as trace:
+        response = await call_next(request)
+        if trace is not None:
+            # Group traces by route template rather than raw path
+            route = request.scope.get("route")
+            if route is not None:
+                trace.name = f"{request.method} {route.path}"
+            trace.attributes["status_code"] = response.status_code
+            response.headers["X-Request-ID"] = trace.trace_id
+            
+            # The body is still being produced (streamed responses do their work here)
+            response.body_iterator = tracer.finish_after(trace, response.body_iterator)
+    return response
+
+
+# Pin the settings snapshot for the whole request (registered last so it wraps everything),
+# so a hot reload never changes settings under an in-flight request
+@app.middleware("http")
+async def pin_settings_snapshot(request: Request, call_next):
+    token = settings_reloader.pin()
+    try:
+        return await call_next(request)
+    finally:
+        settings_reloader.unpin(token)
+
+
+async def _reload_settings():
+    try:
+        await settings_reloader.reload()
+    except Exception as e:
+        logger.error(f"Settings reload failed, keeping current settings: {str(e)}")
+
+
+# Start background workers on startup
+@app.on_event("startup")
+async def startup_event():
+    profiler.start()
+    await write_behind.start()
+    await feedback_processor.load_stats()
+    
+    # SIGHUP re-reads the environment and .env (see also POST /admin/settings/reload)
+    try:
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGHUP, lambda: asyncio.ensure_future(_reload_settings())
+        )
+    except (AttributeError, NotImplementedError, RuntimeError):
+        # No SIGHUP on Windows, and signal handlers need the main thread (not the case under TestClient)
+        logger.info("SIGHUP settings reload unavailable; use POST /admin/settings/reload")
+
+
+# Persist state on shutdown
+@app.on_event("shutdown")
+async def shutdown_event():
+    profiler.stop()
+    await write_behind.stop()
+    await feedback_processor.persist_stats()
+
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -0,0 +1,190 @@
+from array import array
+from typing import Dict, List, Any, Iterable, Mapping, Optional
+import math
+from app.core.config import get_settings
+from app.core.reload import settings_reloader
+
+settings = get_settings()
+
+# Precision kept when float32 values are converted back to floats at the API boundary
+_BOUNDARY_DIGITS = 6
+
+
+class CategoryIndex:
+    """Fixed mapping between moderation categories and vector positions"""
+    
+    __slots__ = ("categories", "positions")
+    
+    def __init__(self, categories: Iterable[str]):
+        self.categories = tuple(categories)
+        self.positions = {category: position for position, category in enumerate(self.categories)}
+    
+    def __len__(self) -> int:
+        return len(self.categories)
+    
+    def __contains__(self, category: str) -> bool:
+        return category in self.positions
+
+
+class CategoryVector:
+    """
+    Per-category float32 values stored in a flat array indexed by category.
+    
+    Missing categories are stored as NaN so a vector built from a partial mapping
+    converts back to the same keys.
+    """
+    
+    __slots__ = ("values",)
+    
+    def __init__(self, values: array):
+        self.values = values
+    
+    @classmethod
+    def from_dict(cls,
+                  index: CategoryIndex,
+                  mapping: Optional[Mapping[str, float]],
+                  default: float = math.nan) -> "CategoryVector":
+        """
+        Build a vector from a category mapping. Unknown categories are ignored.
+        
+        Args:
+            index: Category index defining the vector layout
+            mapping: Category values
+            default: Value for categories missing from the mapping
+        
+        Returns:
+            New vector
+        """
+        mapping = mapping or {}
+        return cls(array("f", [mapping.get(category, default) for category in index.categories]))
+    
+    @classmethod
+    def filled(cls, index: CategoryIndex, value: float) -> "CategoryVector":
+        """Build a vector with the same value for every category"""
+        return cls(array("f", [value]) * len(index))
+    
+    def to_dict(self, index: CategoryIndex) -> Dict[str, float]:
+        """Convert to a category mapping, skipping missing values"""
+        return {
+            category: round(value, _BOUNDARY_DIGITS)
+            for category, value in zip(index.categories, self.values)
+            if not math.isnan(value)
+        }
+    
+    def get(self, index: CategoryIndex, category: str, default: Optional[float] = None) -> Optional[float]:
+        """Look up a single category value as it would appear at the API boundary"""
+        position = index.positions.get(category)
+        # Vectors built before categories were appended are shorter than the index
+        if position is None or position >= len(self.values) or math.isnan(self.values[position]):
+            return default
+        return round(self.values[position], _BOUNDARY_DIGITS)
+    
+    def __getitem__(self, position: int) -> float:
+        return self.values[position]
+    
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class ModerationVerdict:
+    """
+    Compact moderation decision: float32 category scores plus a bitmask of flagged categories.
+    """
+    
+    __slots__ = ("scores", "flag_mask")
+    
+    def __init__(self, scores: CategoryVector, flag_mask: int = 0):
+        self.scores = scores
+        self.flag_mask = flag_mask
+    
+    @classmethod
+    def evaluate(cls, scores: CategoryVector, thresholds: CategoryVector) -> "ModerationVerdict":
+        """
+        Flag every category whose score meets its threshold.
+        
+        Scores and thresholds are compared at the same float32 precision, so a score
+        equal to its threshold is always flagged.
+        
+        Args:
+            scores: Category scores
+            thresholds: Category thresholds
+        
+        Returns:
+            New verdict
+        """
+        flag_mask = 0
+        for position, (score, threshold) in enumerate(zip(scores.values, thresholds.values)):
+            if score >= threshold:  # NaN (missing) scores never compare true
+                flag_mask |= 1 << position
+        return cls(scores, flag_mask)
+    
+    @classmethod
+    def from_result(cls, index: CategoryIndex, result: Mapping[str, Any]) -> "ModerationVerdict":
+        """
+        Build a verdict from a moderation result dict.
+        
+        Args:
+            index: Category index defining the vector layout
+            result: Result from the moderation engine
+        
+        Returns:
+            New verdict
+        """
+        flag_mask = 0
+        for category in result.get("flagged_categories", []):
+            if category in index.positions:
+                flag_mask |= 1 << index.positions[category]
+        return cls(CategoryVector.from_dict(index, result.get("scores")), flag_mask)
+    
+    @property
+    def flagged(self) -> bool:
+        return self.flag_mask != 0
+    
+    def risk_score(self, weights: CategoryVector) -> float:
+        """
+        Aggregate risk: the highest weight-scaled category score, capped at 1.
+        
+        Args:
+            weights: Category importance weights (1.0 is neutral)
+        
+        Returns:
+            Risk score from 0.0 to 1.0 (0.0 if nothing was scored)
+        """
+        risk = 0.0
+        for score, weight in zip(self.scores.values, weights.values):
+            if score * weight > risk:  # NaN (missing) scores never compare true
+                risk = score * weight
+        return round(min(risk, 1.0), _BOUNDARY_DIGITS)
+    
+    def flagged_categories(self, index: CategoryIndex) -> List[str]:
+        """Flagged categories in index order"""
+        return [
+            category for position, category in enumerate(index.categories)
+            if self.flag_mask >> position & 1
+        ]
+    
+    def to_dict(self, index: CategoryIndex) -> Dict[str, Any]:
+        """Convert to the dict shape used by the API"""
+        return {
+            "flagged": self.flagged,
+            "flagged_categories": self.flagged_categories(index),
+            "scores": self.scores.to_dict(index)
+        }
+
+
+def _build_category_index(new_settings, previous: Optional[CategoryIndex]) -> CategoryIndex:
+    """Category index for MODERATION_CATEGORIES; existing positions must not move"""
+    categories = tuple(new_settings.MODERATION_CATEGORIES)
+    if previous is not None and categories[:len(previous)] != previous.categories:
+        # Stored vectors and bitmasks are positional, so only appending is safe at runtime
+        raise ValueError("Moderation categories can only be appended without a restart")
+    return CategoryIndex(categories)
+
+
+# Category layout shared by all compact vectors (rebuilt on settings reload)
+settings_reloader.register_artifact("category_index", ("MODERATION_CATEGORIES",), _build_category_index)
+
+
+def get_category_index() -> CategoryIndex:
+    """Category index of the settings snapshot the caller runs on"""
+    return settings_reloader.get("category_index")
@@ -1,15 +1,29 @@
 from pydantic import BaseModel, Field, validator, root_validator
 from typing import Dict, List, Any, Optional
 from app.core.config import get_settings
+from app.core.reload import current_settings
 
 settings = get_settings()
 
 
+def _validate_category_subset(v: Optional[List[str]]) -> Optional[List[str]]:
+    """Check a category subset names known categories, dropping duplicates"""
+    if v is not None:
+        for category in v:
+            if category not in current_settings().MODERATION_CATEGORIES:
+                raise ValueError(f"Invalid category: {category}")
+        v = list(dict.fromkeys(v))
+    return v
+
+
 class ContentModerationRequest(BaseModel):
     """Request model for content moderation"""
     content: str = Field(..., min_length=1, max_length=10000, description="Content to moderate")
     content_type: str = Field("text", description="Type of content (text, image, etc.)")
     context: Optional[Dict[str, Any]] = Field(None, description="Additional context for moderation")
+    categories: Optional[List[str]] = Field(
+        None, min_items=1, description="Only moderate these categories (overrides the preferences' subset)"
+    )
     
     @validator('content_type')
     def validate_content_type(cls, v):
@@ -18,6 +32,10 @@ class ContentModerationRequest(BaseModel):
             raise ValueError(f"content_type must be one of: {', '.join(allowed_types)}")
         return v
 
+    @validator('categories')
+    def validate_categories(cls, v):
+        return _validate_category_subset(v)
+
 
 class ContentModerationResponse(BaseModel):
     """Response model for content moderation"""
@@ -25,10 +43,50 @@ class ContentModerationResponse(BaseModel):
     flagged: bool = Field(..., description="Whether the content was flagged")
     flagged_categories: List[str] = Field([], description="Categories that were flagged")
     scores: Dict[str, float] = Field({}, description="Category scores")
+    risk_score: Optional[float] = Field(None, description="Highest weight-scaled category score (0-1)")
     explanation: str = Field("", description="Human-readable explanation")
     details: Dict[str, Any] = Field({}, description="Additional moderation details")
 
 
+class ContentEditResponse(ContentModerationResponse):
+    """Response model for re-moderation of edited content"""
+    previous_content_id: str = Field(..., description="Content ID of the version that was edited")
+    segments_total: int = Field(..., description="Number of segments in the edited content")
+    segments_rescored: int = Field(..., description="Number of segments that had to be scored again")
+
+
+class ImageModerationResponse(ContentModerationResponse):
+    """Response model for image moderation"""
+    dedupe: Optional[str] = Field(None, description="'exact' or 'near' if scores were reused from a duplicate image")
+    match_distance: Optional[int] = Field(None, description="Perceptual hash distance to the near-duplicate")
+
+
+class BatchModerationRequest(BaseModel):
+    """Request model for moderating multiple items in one call"""
+    items: List[ContentModerationRequest] = Field(
+        ..., min_items=1, max_items=settings.STREAM_MAX_ITEMS, description="Items to moderate"
+    )
+
+
+class StreamedModerationResult(BaseModel):
+    """A single item's result in a streamed multi-item moderation response"""
+    index: int = Field(..., description="Position of the item in the request")
+    result: Optional[ContentModerationResponse] = Field(None, description="Moderation result")
+    error: Optional[str] = Field(None, description="Error message if the item could not be moderated")
+
+
+class WebSocketModerationRequest(ContentModerationRequest):
+    """A message on the WebSocket moderation channel"""
+    id: str = Field(..., min_length=1, max_length=128, description="Client message ID, echoed with the verdict")
+
+
+class WebSocketModerationResult(BaseModel):
+    """A verdict pushed back on the WebSocket moderation channel"""
+    id: Optional[str] = Field(None, description="ID of the message (None if it could not be read)")
+    result: Optional[ContentModerationResponse] = Field(None, description="Moderation result")
+    error: Optional[str] = Field(None, description="Error message if the message could not be moderated")
+
+
 class FeedbackRequest(BaseModel):
     """Request model for moderation feedback"""
     should_flag: Optional[bool] = Field(None, description="Whether the content should be flagged")
@@ -45,7 +103,7 @@ class FeedbackRequest(BaseModel):
         categories = values.get("categories")
         if categories:
             for category in categories:
-                if category not in settings.MODERATION_CATEGORIES:
+                if category not in current_settings().MODERATION_CATEGORIES:
                     raise ValueError(f"Invalid category: {category}")
         
         return values
@@ -59,18 +117,48 @@ class FeedbackResponse(BaseModel):
     updated_preferences: Optional[Dict[str, Any]] = Field(None, description="Updated user preferences")
 
 
+class BulkFeedbackItem(BaseModel):
+    """A single item in a bulk feedback submission"""
+    content_id: str = Field(..., description="ID of the moderated content")
+    feedback: FeedbackRequest = Field(..., description="Feedback on the moderation decision")
+
+
+class BulkFeedbackRequest(BaseModel):
+    """Request model for submitting feedback on many moderation decisions at once"""
+    items: List[BulkFeedbackItem] = Field(
+        ..., min_items=1, max_items=settings.FEEDBACK_BULK_MAX_ITEMS, description="Feedback items"
+    )
+
+
+class BulkFeedbackItemResult(BaseModel):
+    """Outcome of a single item in a bulk feedback submission"""
+    content_id: str = Field(..., description="Content ID")
+    status: str = Field(..., description="success or error")
+    message: str = Field(..., description="Status message")
+    threshold_changes: Dict[str, float] = Field({}, description="Threshold change per category caused by this item")
+
+
+class BulkFeedbackResponse(BaseModel):
+    """Response model for bulk feedback"""
+    status: str = Field(..., description="success, partial (some items failed) or error (all items failed)")
+    message: str = Field(..., description="Status message")
+    results: List[BulkFeedbackItemResult] = Field(..., description="Per-item results, in request order")
+    updated_preferences: Optional[Dict[str, Any]] = Field(None, description="Updated user preferences")
+
+
 class UserPreferencesModel(BaseModel):
     """Model for user moderation preferences"""
     sensitivity: Optional[float] = Field(None, ge=0.0, le=1.0, description="Overall sensitivity level")
     category_thresholds: Optional[Dict[str, float]] = Field(None, description="Category-specific thresholds")
     category_weights: Optional[Dict[str, float]] = Field(None, description="Category importance weights")
     custom_rules: Optional[List[str]] = Field(None, description="Custom moderation rules")
+    categories: Optional[List[str]] = Field(None, min_items=1, description="Only moderate these categories")
     
     @validator('category_thresholds')
     def validate_category_thresholds(cls, v):
         if v is not None:
             for category, threshold in v.items():
-                if category not in settings.MODERATION_CATEGORIES:
+                if category not in current_settings().MODERATION_CATEGORIES:
                     raise ValueError(f"Invalid category: {category}")
                 if threshold < 0.0 or threshold > 1.0:
                     raise ValueError(f"Threshold for {category} must be between 0.0 and 1.0")
@@ -80,15 +168,50 @@ class UserPreferencesModel(BaseModel):
     def validate_category_weights(cls, v):
         if v is not None:
             for category, weight in v.items():
-                if category not in settings.MODERATION_CATEGORIES:
+                if category not in current_settings().MODERATION_CATEGORIES:
                     raise ValueError(f"Invalid category: {category}")
                 if weight < 0.0:
                     raise ValueError(f"Weight for {category} must be non-negative")
         return v
+    
+    @validator('categories')
+    def validate_categories(cls, v):
+        return _validate_category_subset(v)
 
 
 class UserPreferencesResponse(BaseModel):
     """Response model for user preferences"""
     user_id: str = Field(..., description="User ID")
+    community_id: Optional[str] = Field(None, description="Community the user inherits preferences from")
     preferences: UserPreferencesModel = Field(..., description="User preferences")
-    version: int = Field(1, description="Preferences version")
\ No newline at end of file
+    version: int = Field(1, description="Preferences version")
+
+
+class CommunityPreferencesResponse(BaseModel):
+    """Response model for community preferences"""
+    community_id: str = Field(..., description="Community ID")
+    preferences: UserPreferencesModel = Field(..., description="Effective community preferences")
+    version: int = Field(1, description="Community preferences version")
+
+
+class BulkModerationJobRequest(BaseModel):
+    """Request model for starting a bulk moderation job"""
+    input_path: str = Field(..., description="JSONL file with the content to moderate, relative to the jobs directory")
+    output_path: str = Field(..., description="JSONL file results are appended to, relative to the jobs directory")
+    concurrency: Optional[int] = Field(None, ge=1, le=256, description="Maximum concurrent moderation calls")
+    resume: bool = Field(True, description="Resume from an existing checkpoint if present")
+
+
+class BulkModerationJobResponse(BaseModel):
+    """Response model for bulk moderation job progress"""
+    job_id: str = Field(..., description="Job ID")
+    status: str = Field(..., description="Job status (pending, running, completed, cancelled, failed)")
+    input_path: str = Field(..., description="Input file path")
+    output_path: str = Field(..., description="Output file path")
+    total_items: Optional[int] = Field(None, description="Total number of items in the input")
+    completed: int = Field(0, description="Items completed, including previous runs")
+    failed: int = Field(0, description="Items that could not be moderated")
+    elapsed_seconds: float = Field(0.0, description="Time spent in the current run")
+    items_per_second: float = Field(0.0, description="Throughput of the current run")
+    eta_seconds: Optional[float] = Field(None, description="Estimated time to completion")
+    error: Optional[str] = Field(None, description="Error message if the job failed")
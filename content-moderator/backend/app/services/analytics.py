@@ -0,0 +1,382 @@
+from array import array
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+import math
+import random
+import time
+from app.core.config import get_settings
+
+settings = get_settings()
+
+MASK_64 = (1 << 64) - 1
+
+# Quantiles reported for each category
+REPORTED_QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+# Longest phrase tracked; longer phrases are truncated so heavy-hitter keys stay small
+MAX_PHRASE_CHARS = 100
+
+
+class ScoreHistogram:
+    """
+    Quantile sketch for scores in [0, 1].
+    
+    Scores are bounded, so fixed-width bins give quantiles to within one bin width
+    (1/bins) with constant memory and an O(1) update, without the merging and
+    compression a t-digest needs for unbounded values.
+    """
+    
+    __slots__ = ("bins", "counts", "count", "total")
+    
+    def __init__(self, bins: int):
+        self.bins = bins
+        self.counts = array("Q", [0]) * bins
+        self.count = 0
+        self.total = 0.0
+    
+    def add(self, score: float) -> None:
+        """Record a score"""
+        position = int(score * self.bins)
+        if position >= self.bins:
+            position = self.bins - 1
+        elif position < 0:
+            position = 0
+        
+        self.counts[position] += 1
+        self.count += 1
+        self.total += score
+    
+    def quantiles(self, qs: Iterable[float]) -> List[Optional[float]]:
+        """
+        Approximate quantiles (upper edge of the bin holding each rank).
+        
+        Args:
+            qs: Quantiles in [0, 1], in increasing order
+        
+        Returns:
+            Quantile values (None if nothing was recorded)
+        """
+        if not self.count:
+            return [None for _ in qs]
+        
+        values = []
+        targets = iter(qs)
+        target = next(targets, None)
+        seen = 0
+        for position, bin_count in enumerate(self.counts):
+            seen += bin_count
+            while target is not None and seen >= target * self.count and seen:
+                values.append((position + 1) / self.bins)
+                target = next(targets, None)
+            if target is None:
+                break
+        
+        return values
+    
+    def coarse(self, buckets: int = 10) -> List[int]:
+        """Counts merged into a few equal-width buckets, for plotting"""
+        per_bucket = max(1, self.bins // buckets)
+        return [sum(self.counts[start:start + per_bucket]) for start in range(0, self.bins, per_bucket)]
+
+
+class CountMinTopK:
+    """
+    Count-min sketch with top-k heavy-hitter tracking.
+    
+    Counts are overestimated by at most 2 * total / width with probability
+    1 - 0.5 ** depth. Each row maps the item's 64-bit hash with its own random
+    multiply-add, so rows collide independently. The k items with the highest estimates
+    are tracked by key; a new item only displaces the smallest tracked one when its
+    estimate is larger.
+    """
+    
+    def __init__(self, width: int, depth: int, k: int):
+        """
+        Initialize the sketch.
+        
+        Args:
+            width: Counters per row
+            depth: Rows (independent hashes)
+            k: Heavy hitters tracked
+        """
+        self.width = width
+        self.k = k
+        self.total = 0
+        
+        self._rows = [array("Q", [0]) * width for _ in range(depth)]
+        self._seeds = [(random.getrandbits(64) | 1, random.getrandbits(64)) for _ in range(depth)]
+        self._top: Dict[str, int] = {}
+        self._floor = 0  # Lower bound on the smallest tracked estimate
+    
+    def add(self, item: str, count: int = 1) -> int:
+        """
+        Count an item.
+        
+        Args:
+            item: Item key
+            count: Occurrences to add
+        
+        Returns:
+            Estimated count of the item
+        """
+        width = self.width
+        hashed = hash(item) & MASK_64
+        estimate = None
+        for row, (multiplier, increment) in zip(self._rows, self._seeds):
+            position = ((multiplier * hashed + increment) & MASK_64) * width >> 64
+            row[position] += count
+            value = row[position]
+            if estimate is None or value < estimate:
+                estimate = value
+        self.total += count
+        
+        top = self._top
+        if item in top or len(top) < self.k:
+            top[item] = estimate
+        elif estimate > self._floor:
+            smallest = min(top, key=top.get)
+            if estimate > top[smallest]:
+                del top[smallest]
+                top[item] = estimate
+            self._floor = min(top.values())
+        
+        return estimate
+    
+    def estimate(self, item: str) -> int:
+        """Estimated count of an item"""
+        hashed = hash(item) & MASK_64
+        return min(
+            row[((multiplier * hashed + increment) & MASK_64) * self.width >> 64]
+            for row, (multiplier, increment) in zip(self._rows, self._seeds)
+        )
+    
+    def top(self, limit: Optional[int] = None) -> List[Tuple[str, int]]:
+        """
+        Heavy hitters by estimated count.
+        
+        Args:
+            limit: Maximum items returned (all tracked items if None)
+        
+        Returns:
+            List of (item, estimated count), highest first
+        """
+        ranked = sorted(self._top.items(), key=lambda entry: entry[1], reverse=True)
+        return ranked[:limit] if limit is not None else ranked
+
+
+class HyperLogLog:
+    """
+    Distinct-count sketch using 2 ** precision one-byte registers.
+    
+    The standard error is about 1.04 / sqrt(2 ** precision) (1.6% at precision 12, in
+    4 KiB). Items are hashed with Python's 64-bit string hash, so registers are only
+    comparable within a process.
+    """
+    
+    def __init__(self, precision: int):
+        """
+        Initialize the sketch.
+        
+        Args:
+            precision: Index bits (4 to 16)
+        """
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+        self._rank_bits = 64 - precision
+        self._rank_mask = (1 << self._rank_bits) - 1
+    
+    def add(self, item: str) -> None:
+        """Record an item"""
+        hashed = hash(item) & MASK_64
+        position = hashed >> self._rank_bits
+        rank = self._rank_bits - (hashed & self._rank_mask).bit_length() + 1
+        if rank > self.registers[position]:
+            self.registers[position] = rank
+    
+    def count(self) -> int:
+        """Estimated number of distinct items"""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        
+        # Small-range correction: linear counting while registers are still empty
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            return round(m * math.log(m / zeros))
+        
+        return round(estimate)
+
+
+class ModerationAnalytics:
+    """
+    Memory-bounded analytics over moderation results.
+    
+    Every result feeds per-category score histograms and flag counts, a count-min
+    sketch of flagged phrases with the top offenders tracked, and HyperLogLog and
+    count-min sketches of the requesting users. All of it is fixed-size, so memory does
+    not grow with traffic, and recording a result costs a few microseconds.
+    
+    Per-user request rates are measured over a rolling window: the user sketch is
+    rotated every window seconds, and rates combine the current and previous window.
+    """
+    
+    def __init__(self,
+                 enabled: bool = settings.ANALYTICS_ENABLED,
+                 histogram_bins: int = settings.ANALYTICS_HISTOGRAM_BINS,
+                 sketch_width: int = settings.ANALYTICS_SKETCH_WIDTH,
+                 sketch_depth: int = settings.ANALYTICS_SKETCH_DEPTH,
+                 top_k: int = settings.ANALYTICS_TOP_K,
+                 hll_precision: int = settings.ANALYTICS_HLL_PRECISION,
+                 rate_window: float = settings.ANALYTICS_RATE_WINDOW):
+        """
+        Initialize the analytics.
+        
+        Args:
+            enabled: Whether results are recorded
+            histogram_bins: Bins per category score histogram
+            sketch_width: Counters per count-min row
+            sketch_depth: Count-min rows
+            top_k: Heavy hitters tracked for phrases and users
+            hll_precision: HyperLogLog index bits
+            rate_window: Seconds per user request-rate window
+        """
+        self.enabled = enabled
+        self.histogram_bins = histogram_bins
+        self.sketch_width = sketch_width
+        self.sketch_depth = sketch_depth
+        self.top_k = top_k
+        self.hll_precision = hll_precision
+        self.rate_window = rate_window
+        self.reset()
+    
+    def reset(self) -> None:
+        """Discard everything recorded so far"""
+        self.started_at = time.time()
+        self.results = 0
+        self.score_histograms: Dict[str, ScoreHistogram] = {}
+        self.flag_counts: Dict[str, int] = {}
+        self.phrases = CountMinTopK(self.sketch_width, self.sketch_depth, self.top_k)
+        self.unique_users = HyperLogLog(self.hll_precision)
+        self._users = CountMinTopK(self.sketch_width, self.sketch_depth, self.top_k)
+        self._previous_users: Optional[CountMinTopK] = None
+        self._window_start = time.monotonic()
+    
+    def record(self, results: Dict[str, Any], user_id: Optional[str] = None) -> None:
+        """
+        Record a moderation decision.
+        
+        Args:
+            results: Moderation results (scores, flagged_categories and, if present, details)
+            user_id: Requesting user, if known
+        """
+        if not self.enabled:
+            return
+        
+        self.results += 1
+        
+        histograms = self.score_histograms
+        for category, score in results.get("scores", {}).items():
+            histogram = histograms.get(category)
+            if histogram is None:
+                histogram = histograms[category] = ScoreHistogram(self.histogram_bins)
+            histogram.add(score)
+        
+        for category in results.get("flagged_categories", ()):
+            self.flag_counts[category] = self.flag_counts.get(category, 0) + 1
+        
+        if user_id is not None:
+            self.unique_users.add(user_id)
+            self._rotate_users()
+            self._users.add(user_id)
+        
+        self.record_details(results.get("details"))
+    
+    def record_details(self, details: Optional[Dict[str, Any]]) -> None:
+        """
+        Record details that arrive after the decision (streamed or two-phase analysis).
+        
+        Args:
+            details: Analysis details with flagged_phrases
+        """
+        if not self.enabled or not details:
+            return
+        
+        for phrase in details.get("flagged_phrases") or ():
+            if isinstance(phrase, str):
+                phrase = " ".join(phrase.lower().split())[:MAX_PHRASE_CHARS]
+                if phrase:
+                    self.phrases.add(phrase)
+    
+    def get_stats(self, top: int = 20) -> Dict[str, Any]:
+        """
+        Summarize the sketches.
+        
+        Args:
+            top: Number of top phrases and users to include
+        
+        Returns:
+            Dict with score quantiles per category, flag rates, top phrases and user statistics
+        """
+        categories = {}
+        for category, histogram in self.score_histograms.items():
+            quantiles = histogram.quantiles(REPORTED_QUANTILES)
+            categories[category] = {
+                "count": histogram.count,
+                "mean": histogram.total / histogram.count if histogram.count else None,
+                "quantiles": {f"p{round(q * 100)}": value for q, value in zip(REPORTED_QUANTILES, quantiles)},
+                "flag_rate": self.flag_counts.get(category, 0) / histogram.count if histogram.count else 0.0,
+                "histogram": histogram.coarse()
+            }
+        
+        self._rotate_users()
+        window_seconds = time.monotonic() - self._window_start
+        users = dict(self._users.top())
+        if self._previous_users is not None:
+            window_seconds += self.rate_window
+            previous = self._previous_users
+            users = {
+                user_id: self._users.estimate(user_id) + previous.estimate(user_id)
+                for user_id in set(users).union(user_id for user_id, _ in previous.top())
+            }
+        
+        top_users = sorted(users.items(), key=lambda entry: entry[1], reverse=True)[:top]
+        
+        return {
+            "enabled": self.enabled,
+            "since": self.started_at,
+            "results": self.results,
+            "categories": categories,
+            "top_phrases": [{"phrase": phrase, "count": count} for phrase, count in self.phrases.top(top)],
+            "phrases_total": self.phrases.total,
+            "unique_users": self.unique_users.count(),
+            "top_users": [
+                {"user_id": user_id, "requests": count, "requests_per_second": count / window_seconds if window_seconds else 0.0}
+                for user_id, count in top_users
+            ],
+            "rate_window_seconds": window_seconds,
+            "memory_bytes": self.memory_bytes()
+        }
+    
+    def memory_bytes(self) -> int:
+        """Approximate size of the sketch counters (fixed for a given configuration)"""
+        histograms = sum(histogram.counts.itemsize * len(histogram.counts) for histogram in self.score_histograms.values())
+        count_min = 8 * self.sketch_width * self.sketch_depth
+        user_sketches = 2 if self._previous_users is not None else 1
+        return histograms + count_min * (1 + user_sketches) + len(self.unique_users.registers)
+    
+    def _rotate_users(self) -> None:
+        """Start a new user request-rate window once the current one is over, keeping the last one"""
+        elapsed = time.monotonic() - self._window_start
+        if elapsed < self.rate_window:
+            return
+        
+        # After a quiet spell the last window is no longer adjacent, so it is dropped too
+        self._previous_users = self._users if elapsed < 2 * self.rate_window else None
+        self._users = CountMinTopK(self.sketch_width, self.sketch_depth, self.top_k)
+        self._window_start = time.monotonic()
+
+
+# Singleton instance
+moderation_analytics = ModerationAnalytics()
@@ -0,0 +1,208 @@
+from typing import Dict, Any, Optional, Tuple
+import hashlib
+import logging
+import zlib
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Codecs blobs can be stored with; "raw" blobs keep the original string
+CODECS = ("raw", "zlib", "zstd")
+
+
+def content_digest(content: str) -> str:
+    """
+    Content address of a text: hex SHA-256 of its UTF-8 encoding.
+    
+    Args:
+        content: Text
+    
+    Returns:
+        Digest usable as a storage and cache key
+    """
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class Blob:
+    """A stored text with its reference count"""
+    
+    __slots__ = ("codec", "value", "size", "references", "persisted")
+    
+    def __init__(self, codec: str, value: Any, size: int):
+        self.codec = codec
+        self.value = value        # str for "raw", compressed bytes otherwise
+        self.size = size          # Length of the UTF-8 encoded text
+        self.references = 1
+        self.persisted = False
+
+
+class BlobStore:
+    """
+    Content-addressed, reference-counted store for moderated text.
+    
+    Moderation history, preference examples and persisted records hold a digest instead
+    of the text, so each distinct text is kept once however many times it is submitted.
+    Texts of at least compress_min_bytes are compressed (zstd if the zstandard package is
+    installed and selected, otherwise zlib) when that makes them smaller. A blob is
+    dropped when its last reference is released.
+    """
+    
+    def __init__(self,
+                 codec: str = settings.BLOB_CODEC,
+                 compress_min_bytes: int = settings.BLOB_COMPRESS_MIN_BYTES):
+        """
+        Initialize the blob store.
+        
+        Args:
+            codec: Compression codec for large blobs ("zlib" or "zstd")
+            compress_min_bytes: Smallest text (in UTF-8 bytes) worth compressing
+        """
+        if codec not in CODECS[1:]:
+            raise ValueError(f"Unsupported blob codec: {codec}")
+        
+        self._zstd_compressor = None
+        self._zstd_decompressor = None
+        if codec == "zstd":
+            try:
+                import zstandard  # Optional; zlib is used without it
+                self._zstd_compressor = zstandard.ZstdCompressor()
+                self._zstd_decompressor = zstandard.ZstdDecompressor()
+            except ImportError:
+                logger.warning("zstandard is not installed; compressing blobs with zlib")
+                codec = "zlib"
+        
+        self.codec = codec
+        self.compress_min_bytes = compress_min_bytes
+        
+        self._blobs: Dict[str, Blob] = {}
+        self._raw_bytes = 0
+        self._stored_bytes = 0
+        
+        self.stats = {"puts": 0, "dedupe_hits": 0, "dropped": 0}
+    
+    def __contains__(self, digest: str) -> bool:
+        return digest in self._blobs
+    
+    def __len__(self) -> int:
+        return len(self._blobs)
+    
+    def put(self, content: str) -> str:
+        """
+        Store a text, or add a reference if it is already stored.
+        
+        Args:
+            content: Text
+        
+        Returns:
+            Digest referencing the text
+        """
+        digest = content_digest(content)
+        self.stats["puts"] += 1
+        
+        blob = self._blobs.get(digest)
+        if blob is not None:
+            blob.references += 1
+            self.stats["dedupe_hits"] += 1
+            return digest
+        
+        blob = self._encode(content)
+        self._blobs[digest] = blob
+        self._raw_bytes += blob.size
+        self._stored_bytes += blob.size if blob.codec == "raw" else len(blob.value)
+        
+        return digest
+    
+    def get(self, digest: str) -> str:
+        """
+        Text for a digest.
+        
+        Args:
+            digest: Digest returned by put
+        
+        Returns:
+            Original text
+        
+        Raises:
+            KeyError: If no reference to the digest is held
+        """
+        blob = self._blobs[digest]
+        if blob.codec == "raw":
+            return blob.value
+        if blob.codec == "zstd":
+            return self._zstd_decompressor.decompress(blob.value).decode("utf-8")
+        return zlib.decompress(blob.value).decode("utf-8")
+    
+    def release(self, digest: str) -> None:
+        """
+        Drop a reference, removing the blob when none are left.
+        
+        Args:
+            digest: Digest returned by put
+        """
+        blob = self._blobs.get(digest)
+        if blob is None:
+            return
+        
+        blob.references -= 1
+        if blob.references > 0:
+            return
+        
+        del self._blobs[digest]
+        self._raw_bytes -= blob.size
+        self._stored_bytes -= blob.size if blob.codec == "raw" else len(blob.value)
+        self.stats["dropped"] += 1
+    
+    def take_unpersisted(self, digest: str) -> Optional[Tuple[str, bytes]]:
+        """
+        Stored form of a blob the first time it is asked for, so it is persisted once.
+        
+        Args:
+            digest: Digest returned by put
+        
+        Returns:
+            Tuple of (codec, bytes) to persist, or None if already handed out
+        """
+        blob = self._blobs.get(digest)
+        if blob is None or blob.persisted:
+            return None
+        
+        blob.persisted = True
+        return blob.codec, blob.value.encode("utf-8") if blob.codec == "raw" else blob.value
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Report deduplication and compression effectiveness.
+        
+        Returns:
+            Dict with blob counts, reference counts and byte totals
+        """
+        references = sum(blob.references for blob in self._blobs.values())
+        
+        return {
+            **self.stats,
+            "codec": self.codec,
+            "blobs": len(self._blobs),
+            "references": references,
+            "raw_bytes": self._raw_bytes,
+            "stored_bytes": self._stored_bytes,
+            "compression_ratio": self._raw_bytes / self._stored_bytes if self._stored_bytes else 1.0
+        }
+    
+    def _encode(self, content: str) -> Blob:
+        """Compress a text if it is large enough and compression pays off"""
+        data = content.encode("utf-8")
+        if len(data) >= self.compress_min_bytes:
+            if self.codec == "zstd":
+                compressed = self._zstd_compressor.compress(data)
+            else:
+                compressed = zlib.compress(data)
+            
+            if len(compressed) < len(data):
+                return Blob(self.codec, compressed, len(data))
+        
+        return Blob("raw", content, len(data))
+
+
+# Singleton instance
+blob_store = BlobStore()
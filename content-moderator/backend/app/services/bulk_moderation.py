@@ -0,0 +1,460 @@
+from typing import Dict, List, Any, Optional, Tuple
+from collections import deque
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from app.core.config import get_settings
+from app.services.moderation_engine import moderation_engine
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class InvalidJobPath(ValueError):
+    """Raised when job file names are unusable: outside the jobs directory, or input and output collide"""
+
+
+class BulkModerationJob:
+    """
+    Resumable moderation job that streams a JSONL file through the moderation engine.
+
+    Each input line is either a JSON object with a "content" field (plus optional "id"
+    and "user_preferences") or a bare JSON string. Results are appended to the output
+    file as they complete, one JSON object per line tagged with the input line number.
+
+    Progress is checkpointed next to the output file. The checkpoint records the byte
+    offset of the first input line that is not yet complete, the set of later lines
+    whose results are already written, and the size of the output file at that moment.
+    On restart the output is truncated back to the checkpointed size and reading resumes
+    from the checkpointed offset, so a crash never duplicates or loses results. The
+    checkpoint also records the input's path, size and modification time, and a resumed
+    run refuses to continue if the input no longer matches.
+    """
+
+    def __init__(self,
+                 input_path: str,
+                 output_path: str,
+                 concurrency: int = settings.BULK_DEFAULT_CONCURRENCY,
+                 checkpoint_path: Optional[str] = None,
+                 checkpoint_interval: int = settings.BULK_CHECKPOINT_INTERVAL,
+                 job_id: Optional[str] = None,
+                 engine=moderation_engine):
+        """
+        Initialize a bulk moderation job.
+
+        Args:
+            input_path: JSONL file with the content to moderate
+            output_path: JSONL file that results are appended to
+            concurrency: Maximum number of concurrent engine calls
+            checkpoint_path: Where to store progress (defaults to "<output_path>.checkpoint")
+            checkpoint_interval: Number of completed items between checkpoints
+            job_id: Optional identifier for the job
+            engine: Moderation engine used to score each item
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        self.job_id = job_id or str(uuid.uuid4())
+        self.input_path = input_path
+        self.output_path = output_path
+        self.checkpoint_path = checkpoint_path or f"{output_path}.checkpoint"
+        self.concurrency = concurrency
+        self.checkpoint_interval = max(1, checkpoint_interval)
+        self.engine = engine
+
+        # Lines read ahead of the first incomplete line are bounded by this window,
+        # which keeps memory flat even if a single item stalls
+        self.window_size = concurrency * 4
+
+        self.status = "pending"
+        self.error: Optional[str] = None
+        self.total_items: Optional[int] = None
+        self.completed = 0    # Items completed, including previous runs
+        self.failed = 0       # Items that could not be moderated
+        self.processed = 0    # Items completed during this run
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._input_fingerprint: Optional[Dict[str, Any]] = None
+
+    async def run(self, resume: bool = True, count_total: bool = True) -> Dict[str, Any]:
+        """
+        Run the job to completion.
+
+        Args:
+            resume: Continue from an existing checkpoint instead of starting over
+            count_total: Pre-scan the input to count items for the ETA
+
+        Returns:
+            Final job progress
+        """
+        self.status = "running"
+        self.started_at = time.time()
+
+        try:
+            self._input_fingerprint = self._fingerprint_input()
+            checkpoint = self._load_checkpoint() if resume else None
+
+            if count_total:
+                self.total_items = await asyncio.to_thread(self._count_items)
+
+            await self._process(checkpoint or {})
+
+            self.status = "completed"
+
+        except asyncio.CancelledError:
+            self.status = "cancelled"
+            raise
+        except Exception as e:
+            logger.error(f"Bulk moderation job {self.job_id} failed: {str(e)}")
+            self.status = "failed"
+            self.error = str(e)
+        finally:
+            self.finished_at = time.time()
+
+        return self.progress()
+
+    def progress(self) -> Dict[str, Any]:
+        """
+        Report job progress, throughput and ETA.
+
+        Returns:
+            Dict with progress counters
+        """
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        items_per_second = self.processed / elapsed if elapsed > 0 else 0.0
+
+        eta_seconds = None
+        if self.status == "running" and self.total_items is not None and items_per_second > 0:
+            eta_seconds = max(0, self.total_items - self.completed) / items_per_second
+
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "input_path": self.input_path,
+            "output_path": self.output_path,
+            "total_items": self.total_items,
+            "completed": self.completed,
+            "failed": self.failed,
+            "elapsed_seconds": elapsed,
+            "items_per_second": items_per_second,
+            "eta_seconds": eta_seconds,
+            "error": self.error
+        }
+
+    async def _process(self, checkpoint: Dict[str, Any]) -> None:
+        """Stream the input through the engine, writing results and checkpoints"""
+        input_offset = checkpoint.get("input_offset", 0)
+        next_line = checkpoint.get("next_line", 0)
+        output_offset = checkpoint.get("output_offset", 0)
+        completed_ahead = set(checkpoint.get("completed_ahead", []))
+        self.completed = checkpoint.get("completed", 0)
+        self.failed = checkpoint.get("failed", 0)
+
+        # Lines read but not yet part of the contiguous completed prefix, in input order
+        window: deque = deque()
+        done = set()
+        tasks = set()
+        since_checkpoint = 0
+        line_no = next_line
+        eof = False
+
+        mode = "r+b" if os.path.exists(self.output_path) else "w+b"
+        with open(self.input_path, "rb") as infile, open(self.output_path, mode) as outfile:
+            # Drop any results written after the last checkpoint
+            outfile.truncate(output_offset)
+            outfile.seek(output_offset)
+            infile.seek(input_offset)
+
+            try:
+                while True:
+                    # Fill the pipeline without letting the window grow unbounded
+                    while not eof and len(tasks) < self.concurrency and len(window) < self.window_size:
+                        raw = infile.readline()
+                        if not raw:
+                            eof = True
+                            break
+
+                        window.append((line_no, infile.tell()))
+                        if line_no in completed_ahead or not raw.strip():
+                            done.add(line_no)
+                        else:
+                            tasks.add(asyncio.create_task(self._moderate_line(line_no, raw)))
+                        line_no += 1
+
+                    input_offset, next_line = self._advance(window, done, input_offset, next_line)
+
+                    if not tasks:
+                        if eof:
+                            break
+                        continue
+
+                    finished, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+
+                    for task in finished:
+                        finished_line, record = task.result()
+                        self._write_result(outfile, record)
+                        done.add(finished_line)
+                        since_checkpoint += 1
+
+                    input_offset, next_line = self._advance(window, done, input_offset, next_line)
+
+                    if since_checkpoint >= self.checkpoint_interval:
+                        await self._save_checkpoint(outfile, input_offset, next_line, done)
+                        since_checkpoint = 0
+            finally:
+                # Let in-flight items finish so their results are not thrown away
+                if tasks:
+                    finished, _ = await asyncio.wait(tasks)
+                    for task in finished:
+                        if task.cancelled() or task.exception():
+                            continue
+                        finished_line, record = task.result()
+                        self._write_result(outfile, record)
+                        done.add(finished_line)
+                    input_offset, next_line = self._advance(window, done, input_offset, next_line)
+
+                await self._save_checkpoint(outfile, input_offset, next_line, done)
+
+    async def _moderate_line(self, line_no: int, raw: bytes) -> Tuple[int, Dict[str, Any]]:
+        """Moderate a single input line; failures are reported on the line, not raised"""
+        try:
+            item = json.loads(raw)
+            if isinstance(item, str):
+                item = {"content": item}
+            if not isinstance(item, dict) or not isinstance(item.get("content"), str):
+                raise ValueError("Each line must be a JSON string or an object with a 'content' string")
+            if not isinstance(item.get("user_preferences") or {}, dict):
+                raise ValueError("'user_preferences' must be an object")
+        except ValueError as e:
+            return line_no, {"line": line_no, "error": f"Invalid input: {str(e)}"}
+
+        try:
+            result = await self.engine.moderate_content(item["content"], item.get("user_preferences"))
+        except Exception as e:
+            logger.error(f"Bulk moderation job {self.job_id} failed on line {line_no}: {str(e)}")
+            return line_no, {"line": line_no, "id": item.get("id"), "error": f"Moderation failed: {str(e)}"}
+
+        return line_no, {
+            "line": line_no,
+            "id": item.get("id"),
+            "result": result
+        }
+
+    def _write_result(self, outfile, record: Dict[str, Any]) -> None:
+        """Append a result to the output and count it"""
+        outfile.write(json.dumps(record).encode("utf-8") + b"\n")
+
+        self.completed += 1
+        self.processed += 1
+        if "error" in record or "error" in record.get("result", {}):
+            self.failed += 1
+
+    def _advance(self, window: deque, done: set, input_offset: int, next_line: int) -> Tuple[int, int]:
+        """Advance the contiguous completed prefix as far as possible"""
+        while window and window[0][0] in done:
+            completed_line, end_offset = window.popleft()
+            done.discard(completed_line)
+            input_offset = end_offset
+            next_line = completed_line + 1
+
+        return input_offset, next_line
+
+    async def _save_checkpoint(self, outfile, input_offset: int, next_line: int, done: set) -> None:
+        """Flush results and atomically record progress, off the event loop"""
+        checkpoint = {
+            "job_id": self.job_id,
+            "input": self._input_fingerprint,
+            "input_offset": input_offset,
+            "next_line": next_line,
+            "output_offset": outfile.tell(),
+            "completed_ahead": sorted(done),
+            "completed": self.completed,
+            "failed": self.failed,
+            "updated_at": time.time()
+        }
+
+        # Nothing else writes the output file while this runs: _process awaits it
+        await asyncio.to_thread(self._write_checkpoint, outfile, checkpoint)
+
+    def _write_checkpoint(self, outfile, checkpoint: Dict[str, Any]) -> None:
+        """Make results durable, then replace the checkpoint file"""
+        outfile.flush()
+        os.fsync(outfile.fileno())
+
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(checkpoint, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _fingerprint_input(self) -> Dict[str, Any]:
+        """Identify the input file, so a checkpoint is only resumed against the same input"""
+        stat = os.stat(self.input_path)
+        return {"path": self.input_path, "size": stat.st_size, "mtime": stat.st_mtime}
+
+    def _load_checkpoint(self) -> Optional[Dict[str, Any]]:
+        """
+        Load the last checkpoint if one exists.
+
+        Returns:
+            Checkpoint or None
+
+        Raises:
+            ValueError: If the checkpoint was written for a different or modified input
+        """
+        if not os.path.exists(self.checkpoint_path):
+            return None
+
+        with open(self.checkpoint_path) as f:
+            checkpoint = json.load(f)
+
+        if checkpoint.get("input") != self._input_fingerprint:
+            raise ValueError(
+                f"Checkpoint {self.checkpoint_path} was written for a different or modified input; "
+                "start the job without resume to moderate it from the beginning"
+            )
+
+        logger.info(
+            f"Resuming bulk moderation job {self.job_id} at line {checkpoint.get('next_line', 0)}"
+        )
+        return checkpoint
+
+    def _count_items(self) -> int:
+        """Count non-empty input lines without loading the file into memory"""
+        count = 0
+        with open(self.input_path, "rb") as f:
+            for raw in f:
+                if raw.strip():
+                    count += 1
+        return count
+
+
+class BulkJobManager:
+    """
+    Tracks bulk moderation jobs running in the background of the API process.
+
+    Job files are named relative to jobs_dir and must resolve inside it, so a client
+    cannot read or overwrite arbitrary files the process has access to.
+    """
+
+    def __init__(self, jobs_dir: str = settings.BULK_JOBS_DIR):
+        """
+        Initialize the job manager.
+
+        Args:
+            jobs_dir: Directory job input and output files are confined to
+        """
+        self.jobs_dir = jobs_dir
+        self.jobs: Dict[str, BulkModerationJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start_job(self,
+                  input_path: str,
+                  output_path: str,
+                  concurrency: Optional[int] = None,
+                  resume: bool = True) -> BulkModerationJob:
+        """
+        Start a bulk moderation job in the background.
+
+        Args:
+            input_path: JSONL file with the content to moderate, relative to the jobs directory
+            output_path: JSONL file that results are appended to, relative to the jobs directory
+            concurrency: Maximum number of concurrent engine calls
+            resume: Continue from an existing checkpoint
+
+        Returns:
+            The started job
+
+        Raises:
+            InvalidJobPath: If a path is absolute or resolves outside the jobs directory,
+                or the output would overwrite the job's own input
+            ValueError: If the job would write a file another running job reads or writes,
+                or read a file another running job writes
+        """
+        input_path = self.resolve_path(input_path)
+        output_path = self.resolve_path(output_path)
+
+        job = BulkModerationJob(
+            input_path,
+            output_path,
+            concurrency=concurrency or settings.BULK_DEFAULT_CONCURRENCY
+        )
+
+        # The output is truncated when a job starts, so it must never be anyone's input
+        written = {job.output_path, job.checkpoint_path}
+        if job.input_path in written:
+            raise InvalidJobPath("A job's input must differ from its output and checkpoint files")
+
+        for job_id, task in self._tasks.items():
+            if task.done():
+                continue
+            other = self.jobs[job_id]
+            other_written = {other.output_path, other.checkpoint_path}
+            if written & (other_written | {other.input_path}) or job.input_path in other_written:
+                raise ValueError(f"Job {job_id} is already using the files of this job")
+
+        self.jobs[job.job_id] = job
+        self._tasks[job.job_id] = asyncio.create_task(job.run(resume=resume))
+
+        return job
+
+    def resolve_path(self, name: str) -> str:
+        """
+        Resolve a job file name inside the jobs directory.
+
+        Args:
+            name: File name relative to the jobs directory
+
+        Returns:
+            Absolute path, with symlinks resolved
+
+        Raises:
+            InvalidJobPath: If the name is absolute or resolves outside the jobs directory
+        """
+        root = os.path.realpath(self.jobs_dir)
+        path = os.path.realpath(os.path.join(root, name))
+        if os.path.isabs(name) or path == root or os.path.commonpath([root, path]) != root:
+            raise InvalidJobPath(f"Job files must be named relative to the jobs directory: {name}")
+        return path
+
+    def get_job(self, job_id: str) -> Optional[BulkModerationJob]:
+        """Get a job by ID"""
+        return self.jobs.get(job_id)
+
+    def list_jobs(self) -> List[BulkModerationJob]:
+        """List all known jobs"""
+        return list(self.jobs.values())
+
+    async def cancel_job(self, job_id: str) -> Optional[BulkModerationJob]:
+        """
+        Cancel a running job. Progress is checkpointed so it can be resumed later.
+
+        Args:
+            job_id: Job identifier
+
+        Returns:
+            The cancelled job or None if not found
+        """
+        job = self.jobs.get(job_id)
+        task = self._tasks.get(job_id)
+
+        if job is None or task is None:
+            return None
+
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+        return job
+
+
+# Singleton instance
+bulk_job_manager = BulkJobManager()
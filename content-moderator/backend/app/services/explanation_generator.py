@@ -1,7 +1,14 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
+import hashlib
+import json
 import openai
 import logging
+from app.core.cache import LRUCache
 from app.core.config import get_settings
+from app.core.reload import settings_reloader, current_settings
+from app.core.tracing import tracer
+from app.services.blob_store import content_digest
+from app.services.explanation_templates import get_explanation_templates
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
@@ -19,8 +26,13 @@ class ExplanationGenerator:
             model: OpenAI model to use for generating explanations
         """
         self.model = model
-        self.templates = settings.EXPLANATION_TEMPLATES
+        
+        # Detailed explanations keyed by (flagged categories, content digest, details fingerprint,
+        # sensitivity bucket); the explanation may quote the content, so it is never served
+        # for different content
+        self.cache = LRUCache(settings.EXPLANATION_CACHE_SIZE)
     
+    @tracer.traced("explanation_generator.generate_explanation")
     async def generate_explanation(self, 
                                  content: str, 
                                  moderation_result: Dict[str, Any],
@@ -44,14 +56,24 @@ class ExplanationGenerator:
         if "explanations" in moderation_result and moderation_result["explanations"]:
             return "\n".join(moderation_result["explanations"])
         
+        # Resubmitted flagged content gets the same explanation, so serve it from memory
+        cache_key = self._cache_key(content, moderation_result, user_preferences)
+        cached = self.cache.get(cache_key)
+        tracer.set_attribute("cache_hit", cached is not None)
+        if cached is not None:
+            return cached
+        
         # For more complex cases, generate explanation with OpenAI
         try:
-            return await self._generate_detailed_explanation(content, moderation_result, user_preferences)
+            explanation = await self._generate_detailed_explanation(content, moderation_result, user_preferences)
+            self.cache.put(cache_key, explanation)
+            return explanation
         except Exception as e:
             logger.error(f"Error generating explanation: {str(e)}")
             # Fall back to simple explanation
             return self._generate_basic_explanation(moderation_result)
     
+    @tracer.traced("explanation_generator.detailed_explanation")
     async def _generate_detailed_explanation(self, 
                                            content: str, 
                                            moderation_result: Dict[str, Any],
@@ -99,19 +121,20 @@ class ExplanationGenerator:
         # Add user preferences context if available
         if user_preferences:
             context += f"""
-            User sensitivity level: {user_preferences.get('sensitivity', settings.DEFAULT_SENSITIVITY)}
+            User sensitivity level: {user_preferences.get('sensitivity', current_settings().DEFAULT_SENSITIVITY)}
             """
         
         # Generate explanation with OpenAI
-        response = await openai.ChatCompletion.acreate(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Content: {content}\n\n{context}"}
-            ],
-            temperature=0.7,
-            max_tokens=250
-        )
+        with tracer.span("openai.chat_completion", model=self.model):
+            response = await openai.ChatCompletion.acreate(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": f"Content: {content}\n\n{context}"}
+                ],
+                temperature=0.7,
+                max_tokens=250
+            )
         
         return response.choices[0].message.content.strip()
     
@@ -130,13 +153,56 @@ class ExplanationGenerator:
         if not flagged_categories:
             return "This content has been flagged by our moderation system."
         
-        explanations = []
-        for category in flagged_categories:
-            template = self.templates.get(category, "This content was flagged in the {category} category.")
-            explanation = template.format(category=category, targets="individuals", topics="various topics")
-            explanations.append(explanation)
+        templates = get_explanation_templates()
+        scores = moderation_result.get("scores", {})
+        return "\n".join(templates.basic_explanation(category, scores.get(category)) for category in flagged_categories)
+        
+    def _cache_key(self, 
+                   content: str,
+                   moderation_result: Dict[str, Any],
+                   user_preferences: Optional[Dict[str, Any]]) -> Tuple[Tuple[str, ...], str, str, int]:
+        """
+        Build the explanation cache key for a moderation result.
+        
+        Args:
+            content: Content the explanation is for
+            moderation_result: Moderation results
+            user_preferences: User preferences
+        
+        Returns:
+            Tuple of (flagged categories, content digest, details fingerprint, sensitivity bucket)
+        """
+        categories = tuple(sorted(moderation_result.get("flagged_categories", [])))
+        
+        sensitivity = current_settings().DEFAULT_SENSITIVITY
+        if user_preferences:
+            sensitivity = user_preferences.get("sensitivity", sensitivity)
+        sensitivity_bucket = int(sensitivity / current_settings().EXPLANATION_SENSITIVITY_BUCKET)
         
-        return "\n".join(explanations)
+        details_fingerprint = self._fingerprint_details(moderation_result.get("details", {}))
+        return categories, content_digest(content), details_fingerprint, sensitivity_bucket
+    
+    def _fingerprint_details(self, details: Dict[str, Any]) -> str:
+        """
+        Fingerprint analysis details, ignoring case, surrounding whitespace and list order.
+        
+        Args:
+            details: Analysis details
+        
+        Returns:
+            Hex digest of the normalized details
+        """
+        def normalize(value: Any) -> Any:
+            if isinstance(value, str):
+                return " ".join(value.lower().split())
+            if isinstance(value, dict):
+                return {str(key): normalize(item) for key, item in value.items()}
+            if isinstance(value, (list, tuple)):
+                return sorted((normalize(item) for item in value), key=lambda item: json.dumps(item, sort_keys=True))
+            return value
+        
+        canonical = json.dumps(normalize(details), sort_keys=True, default=str)
+        return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
     
     def _format_scores(self, scores: Dict[str, float]) -> str:
         """Format category scores for explanation context"""
@@ -172,4 +238,12 @@ class ExplanationGenerator:
 
 
 # Singleton instance
-explanation_generator = ExplanationGenerator()
\ No newline at end of file
+explanation_generator = ExplanationGenerator()
+
+# Explanations for users without a sensitivity are cached and prompted with the default,
+# and cache keys bucket sensitivities by EXPLANATION_SENSITIVITY_BUCKET
+settings_reloader.on_change(
+    "explanation_cache",
+    ("DEFAULT_SENSITIVITY", "EXPLANATION_SENSITIVITY_BUCKET"),
+    lambda old, new: explanation_generator.cache.clear()
+)
\ No newline at end of file
@@ -0,0 +1,163 @@
+from typing import Dict, List, Optional, Tuple
+from string import Formatter
+import logging
+import re
+from app.core.config import get_settings
+from app.core.reload import settings_reloader
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATE = "This content was flagged in the {category} category."
+
+# Values used when a template placeholder has no detail to fill it
+DEFAULT_TARGETS = "individuals"
+DEFAULT_TOPICS = "various topics"
+
+# Placeholders explanation templates may use
+PLACEHOLDERS = frozenset(("category", "score", "targets", "topics"))
+
+_FIELD_NAME = re.compile(r"[^.\[]*")
+
+
+class CompiledTemplate:
+    """
+    Explanation template parsed once into literal text and placeholder fields.
+    
+    Rendering joins the pre-split parts instead of re-parsing the template with
+    str.format on every call.
+    """
+    
+    __slots__ = ("template", "parts", "fields", "names")
+    
+    def __init__(self, template: str):
+        """
+        Compile a str.format-style template.
+        
+        Args:
+            template: Template with {field} placeholders
+        
+        Raises:
+            ValueError: If the template is malformed (e.g. unbalanced braces)
+        """
+        self.template = template
+        self.parts: List[Tuple[str, Optional[str], str]] = []
+        
+        parsed = list(Formatter().parse(template))
+        
+        # Top-level names of every placeholder, including attribute and index lookups
+        self.names = frozenset(
+            _FIELD_NAME.match(field).group() for _, field, _, _ in parsed if field is not None
+        )
+        
+        for literal, field, format_spec, conversion in parsed:
+            if field is not None and (conversion or not field.isidentifier()):
+                # Fall back to str.format for anything beyond plain named fields
+                self.parts = []
+                self.fields = None
+                return
+            self.parts.append((literal, field, format_spec or ""))
+        
+        self.fields = frozenset(field for _, field, _ in self.parts if field is not None)
+    
+    def render(self, **values: str) -> str:
+        """
+        Fill the template with values.
+        
+        Args:
+            values: Placeholder values
+        
+        Returns:
+            Rendered text
+        """
+        if self.fields is None:
+            return self.template.format(**values)
+        
+        rendered = []
+        for literal, field, format_spec in self.parts:
+            rendered.append(literal)
+            if field is not None:
+                value = values[field]
+                rendered.append(format(value, format_spec) if format_spec else str(value))
+        return "".join(rendered)
+
+
+class ExplanationTemplates:
+    """
+    Explanation templates compiled once. The context-free explanation for each category
+    is rendered on first use and kept.
+    """
+    
+    def __init__(self, templates: Dict[str, str], strict: bool = True):
+        """
+        Compile explanation templates.
+        
+        Args:
+            templates: Templates by category
+            strict: Raise on an invalid template instead of logging it and using the default
+        
+        Raises:
+            ValueError: If strict and a template is malformed or uses an unknown placeholder
+        """
+        self.default = CompiledTemplate(DEFAULT_TEMPLATE)
+        self.templates: Dict[str, CompiledTemplate] = {}
+        self._basic: Dict[str, str] = {}
+        
+        for category, template in templates.items():
+            try:
+                compiled = CompiledTemplate(template)
+                unknown = compiled.names - PLACEHOLDERS
+                if unknown:
+                    raise ValueError(f"unknown placeholder(s) {', '.join(sorted(unknown))}")
+            except ValueError as e:
+                error = f"Invalid explanation template for {category}: {str(e)}"
+                if strict:
+                    raise ValueError(error)
+                logger.error(f"{error}; using the default template")
+                continue
+            
+            self.templates[category] = compiled
+    
+    def get(self, category: str) -> CompiledTemplate:
+        """Compiled template for a category"""
+        return self.templates.get(category, self.default)
+    
+    def basic_explanation(self, category: str, score: Optional[float] = None) -> str:
+        """Explanation for a category when no details are available"""
+        explanation = self._basic.get(category)
+        if explanation is not None:
+            return explanation
+        
+        template = self.get(category)
+        explanation = template.render(
+            category=category,
+            score=f"{score:.2f}" if score is not None else "n/a",
+            targets=DEFAULT_TARGETS,
+            topics=DEFAULT_TOPICS
+        )
+        
+        # Explanations that show the score differ per call
+        if "score" not in template.names:
+            self._basic[category] = explanation
+        return explanation
+
+
+def _build_templates(new_settings, previous: Optional[ExplanationTemplates]) -> ExplanationTemplates:
+    """
+    Compile the configured templates. An invalid template fails a reload (the current
+    templates stay in place) but not startup, where it is logged and replaced by the default.
+    """
+    return ExplanationTemplates(new_settings.EXPLANATION_TEMPLATES, strict=previous is not None)
+
+
+# Templates compiled from settings (recompiled on settings reload)
+settings_reloader.register_artifact(
+    "explanation_templates",
+    ("EXPLANATION_TEMPLATES",),
+    _build_templates
+)
+
+
+def get_explanation_templates() -> ExplanationTemplates:
+    """Compiled templates of the settings snapshot the caller runs on"""
+    return settings_reloader.get("explanation_templates")
@@ -1,20 +1,160 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
+import asyncio
+import json
 import logging
+import os
+import time
 from app.core.config import get_settings
+from app.core.tracing import tracer
+from app.models.compact_models import get_category_index
 from app.services.preference_learning import preference_learning_system
+from app.services.write_behind import write_behind
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+
+class FeedbackAggregate:
+    """
+    Running feedback statistics, updated in O(1) as each feedback event arrives.
+    """
+    
+    def __init__(self):
+        """Initialize empty aggregates"""
+        self.total_count = 0
+        self.flag_feedback_count = 0  # Feedback that said whether the content should be flagged
+        self.agreement_count = 0
+        self.baseline_count = 0       # Flag feedback counted towards the baseline agreement
+        self.baseline_agreement = 0
+        self.recent_agreement: Optional[float] = None  # Exponentially weighted agreement
+        self.confusion: Dict[str, Dict[str, int]] = {}  # Per category: tp, fp, fn, tn
+        self.threshold_drift: Dict[str, float] = {}
+    
+    def record(self, 
+               original_result: Dict[str, Any],
+               feedback: Dict[str, Any],
+               threshold_drift: Dict[str, float]) -> None:
+        """
+        Fold a feedback event into the aggregates.
+        
+        Args:
+            original_result: Original moderation result
+            feedback: Validated feedback
+            threshold_drift: Threshold change per category caused by the feedback
+        """
+        self.total_count += 1
+        
+        should_flag = feedback.get("should_flag")
+        if should_flag is not None:
+            agreed = should_flag == bool(original_result.get("flagged", False))
+            self.flag_feedback_count += 1
+            self.agreement_count += agreed
+            
+            if self.baseline_count < settings.FEEDBACK_BASELINE_WINDOW:
+                self.baseline_count += 1
+                self.baseline_agreement += agreed
+            
+            alpha = settings.FEEDBACK_RECENT_ALPHA
+            if self.recent_agreement is None:
+                self.recent_agreement = float(agreed)
+            else:
+                self.recent_agreement += alpha * (agreed - self.recent_agreement)
+        
+        flagged_categories = set(original_result.get("flagged_categories", []))
+        for category, should_flag_category in feedback.get("categories", {}).items():
+            counts = self.confusion.setdefault(category, {"tp": 0, "fp": 0, "fn": 0, "tn": 0})
+            was_flagged = category in flagged_categories
+            
+            if was_flagged and should_flag_category:
+                counts["tp"] += 1
+            elif was_flagged:
+                counts["fp"] += 1
+            elif should_flag_category:
+                counts["fn"] += 1
+            else:
+                counts["tn"] += 1
+        
+        for category, drift in threshold_drift.items():
+            self.threshold_drift[category] = self.threshold_drift.get(category, 0.0) + drift
+    
+    def summary(self) -> Dict[str, Any]:
+        """
+        Summarize the aggregates for the stats endpoint.
+        
+        Returns:
+            Dict with feedback statistics
+        """
+        disagreements = {
+            category: counts["fp"] + counts["fn"]
+            for category, counts in self.confusion.items()
+            if counts["fp"] + counts["fn"]
+        }
+        total_disagreements = sum(disagreements.values())
+        
+        accuracy_improvement = 0.0
+        if self.baseline_count and self.recent_agreement is not None:
+            accuracy_improvement = self.recent_agreement - self.baseline_agreement / self.baseline_count
+        
+        return {
+            "total_feedback_count": self.total_count,
+            "agreement_rate": self.agreement_count / self.flag_feedback_count if self.flag_feedback_count else None,
+            "disagreement_categories": {
+                category: count / total_disagreements for category, count in disagreements.items()
+            },
+            "confusion": self.confusion,
+            "feedback_impact": {
+                "threshold_changes": self.threshold_drift,
+                "accuracy_improvement": accuracy_improvement
+            }
+        }
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize for persistence (copies nested dicts, so later updates don't show through)"""
+        data = dict(self.__dict__)
+        data["confusion"] = {category: dict(counts) for category, counts in self.confusion.items()}
+        data["threshold_drift"] = dict(self.threshold_drift)
+        return data
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FeedbackAggregate":
+        """Restore from persisted data"""
+        aggregate = cls()
+        for key, value in data.items():
+            if hasattr(aggregate, key):
+                setattr(aggregate, key, value)
+        return aggregate
+
+
 class FeedbackProcessor:
     """
     Processes user feedback on moderation decisions and updates user preferences.
     """
     
-    def __init__(self):
-        """Initialize the feedback processor"""
-        self.categories = settings.MODERATION_CATEGORIES
+    def __init__(self, stats_path: Optional[str] = settings.FEEDBACK_STATS_PATH):
+        """
+        Initialize the feedback processor.
+        
+        Args:
+            stats_path: File the feedback aggregates are persisted to (None to disable);
+                restored by load_stats at startup
+        """
+        # Incrementally maintained feedback statistics
+        self.stats_path = stats_path
+        self.global_stats = FeedbackAggregate()
+        self.user_stats: Dict[str, FeedbackAggregate] = {}
+        self._last_persisted = time.monotonic()
+        self._persist_task: Optional[asyncio.Task] = None
+        
+        # Copies of the per-user aggregates as of the last persist; only users with new
+        # feedback are copied again, so a persist does little work on the event loop
+        self._user_snapshots: Dict[str, Dict[str, Any]] = {}
+        self._dirty_users: set = set()
     
+    @property
+    def categories(self) -> Tuple[str, ...]:
+        return get_category_index().categories
+    
+    @tracer.traced("feedback_processor.process_feedback")
     async def process_feedback(self, 
                              user_id: str,
                              content_id: str,
@@ -34,6 +174,8 @@ class FeedbackProcessor:
         Returns:
             Updated user preferences
         """
+        tracer.set_attribute("content_id", content_id)
+        
         try:
             # Validate feedback
             validated_feedback = self._validate_feedback(feedback)
@@ -41,11 +183,15 @@ class FeedbackProcessor:
             # Log feedback for analytics
             await self._log_feedback(user_id, content_id, validated_feedback)
             
-            # Update user preferences based on feedback
-            updated_preferences = await preference_learning_system.process_feedback(
-                user_id, content, original_result, validated_feedback
+            # Update user preferences based on feedback, as a batch of one so the exact
+            # threshold change this item made is reported
+            updated_preferences, (threshold_drift,) = await preference_learning_system.process_feedback_batch(
+                user_id, [(content, original_result, validated_feedback)]
             )
             
+            # Fold the feedback and the threshold drift it caused into the aggregates
+            self._record_stats(user_id, original_result, validated_feedback, threshold_drift)
+            
             # Return updated preferences
             return {
                 "status": "success",
@@ -66,6 +212,66 @@ class FeedbackProcessor:
                 "message": "Error processing feedback"
             }
     
+    @tracer.traced("feedback_processor.process_feedback_batch")
+    async def process_feedback_batch(self,
+                                     user_id: str,
+                                     items: List[Tuple[str, str, Dict[str, Any], Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Process many feedback items from a user at once.
+        
+        Every item is validated before anything is applied; the valid ones are logged
+        together and folded into the user's preferences as a single update.
+        
+        Args:
+            user_id: User identifier
+            items: (content ID, content, original result, feedback) tuples
+        
+        Returns:
+            Dict with per-item results (in item order) and the updated preferences
+        """
+        tracer.set_attribute("feedback_items", len(items))
+        
+        results = []
+        accepted = []
+        for content_id, content, original_result, feedback in items:
+            try:
+                validated_feedback = self._validate_feedback(feedback)
+            except ValueError as e:
+                results.append({"content_id": content_id, "status": "error", "message": str(e)})
+                continue
+            
+            accepted.append((len(results), content, original_result, validated_feedback))
+            results.append({"content_id": content_id, "status": "success", "message": "Feedback processed successfully"})
+        
+        if not accepted:
+            return {"status": "error", "message": "No valid feedback items", "results": results}
+        
+        try:
+            await self._log_feedback_batch(
+                user_id, [(results[position]["content_id"], feedback) for position, _, _, feedback in accepted]
+            )
+            
+            # One vectorized threshold update and one version bump for the whole batch
+            updated_preferences, threshold_drift = await preference_learning_system.process_feedback_batch(
+                user_id, [(content, original_result, feedback) for _, content, original_result, feedback in accepted]
+            )
+        except Exception as e:
+            logger.error(f"Bulk feedback processing error: {str(e)}")
+            for position, _, _, _ in accepted:
+                results[position].update(status="error", message="Error processing feedback")
+            return {"status": "error", "message": "Error processing feedback", "results": results}
+        
+        for (position, _, original_result, feedback), drift in zip(accepted, threshold_drift):
+            self._record_stats(user_id, original_result, feedback, drift)
+            results[position]["threshold_changes"] = drift
+        
+        return {
+            "status": "success" if len(accepted) == len(items) else "partial",
+            "message": f"Processed {len(accepted)} of {len(items)} feedback items",
+            "results": results,
+            "updated_preferences": updated_preferences
+        }
+    
     def _validate_feedback(self, feedback: Dict[str, Any]) -> Dict[str, Any]:
         """
         Validate user feedback.
@@ -117,6 +323,7 @@ class FeedbackProcessor:
         
         return validated
     
+    @tracer.traced("feedback_processor.log_feedback")
     async def _log_feedback(self, user_id: str, content_id: str, feedback: Dict[str, Any]) -> None:
         """
         Log feedback for analytics.
@@ -126,15 +333,126 @@ class FeedbackProcessor:
             content_id: Content identifier
             feedback: Validated feedback
         """
-        # TODO: Implement feedback logging to database
         feedback_log = {
             "user_id": user_id,
             "content_id": content_id,
             "feedback": feedback,
-            "timestamp": "now()"  # This would be replaced with actual timestamp in DB
+            "timestamp": time.time()
         }
         
+        # Buffered and written to the database in bulk
+        await write_behind.submit(
+            "feedback_log", (user_id, content_id, json.dumps(feedback), feedback_log["timestamp"])
+        )
+        
         logger.info(f"Feedback logged: {feedback_log}")
+    
+    @tracer.traced("feedback_processor.log_feedback_batch")
+    async def _log_feedback_batch(self, user_id: str, entries: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """
+        Log many feedback items for analytics with a single log line.
+        
+        Args:
+            user_id: User identifier
+            entries: (content ID, validated feedback) pairs
+        """
+        timestamp = time.time()
+        for content_id, feedback in entries:
+            await write_behind.submit("feedback_log", (user_id, content_id, json.dumps(feedback), timestamp))
+        
+        logger.info(f"Feedback logged: {len(entries)} items from {user_id}")
+
+    def get_stats(self, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get feedback statistics without scanning the feedback log.
+        
+        Args:
+            user_id: User to get statistics for, or None for global statistics
+        
+        Returns:
+            Dict with feedback statistics
+        """
+        if user_id is None:
+            return self.global_stats.summary()
+        
+        return self.user_stats.get(user_id, FeedbackAggregate()).summary()
+    
+    async def load_stats(self) -> None:
+        """Restore persisted aggregates, if any (called at startup)"""
+        if not self.stats_path:
+            return
+        
+        snapshot = await asyncio.get_running_loop().run_in_executor(None, self._read_stats)
+        if snapshot is None:
+            return
+        
+        self.global_stats = FeedbackAggregate.from_dict(snapshot.get("global", {}))
+        self.user_stats = {
+            user_id: FeedbackAggregate.from_dict(data)
+            for user_id, data in snapshot.get("users", {}).items()
+        }
+        self._user_snapshots = {user_id: aggregate.to_dict() for user_id, aggregate in self.user_stats.items()}
+        self._dirty_users.clear()
+    
+    async def persist_stats(self) -> None:
+        """Write the aggregates to disk"""
+        if not self.stats_path:
+            return
+        
+        # Copy what changed on the event loop (the aggregates keep changing while the file
+        # is written); serializing and writing happen in a worker thread
+        for user_id in self._dirty_users:
+            self._user_snapshots[user_id] = self.user_stats[user_id].to_dict()
+        self._dirty_users.clear()
+        snapshot = {"global": self.global_stats.to_dict(), "users": dict(self._user_snapshots)}
+        self._last_persisted = time.monotonic()
+        
+        await asyncio.get_running_loop().run_in_executor(None, self._write_stats, snapshot)
+    
+    def _record_stats(self, 
+                      user_id: str,
+                      original_result: Dict[str, Any],
+                      feedback: Dict[str, Any],
+                      threshold_drift: Dict[str, float]) -> None:
+        """
+        Update the global and per-user aggregates and persist them periodically.
+        
+        Args:
+            user_id: User identifier
+            original_result: Original moderation result
+            feedback: Validated feedback
+            threshold_drift: Threshold change per category
+        """
+        self.global_stats.record(original_result, feedback, threshold_drift)
+        self.user_stats.setdefault(user_id, FeedbackAggregate()).record(original_result, feedback, threshold_drift)
+        self._dirty_users.add(user_id)
+        
+        persist_due = time.monotonic() - self._last_persisted >= settings.FEEDBACK_STATS_PERSIST_INTERVAL
+        if persist_due and (self._persist_task is None or self._persist_task.done()):
+            self._persist_task = asyncio.create_task(self.persist_stats())
+    
+    def _write_stats(self, snapshot: Dict[str, Any]) -> None:
+        """Serialize and atomically write a stats snapshot (runs in a worker thread)"""
+        tmp_path = f"{self.stats_path}.tmp"
+        try:
+            data = json.dumps(snapshot)
+            with open(tmp_path, "w") as f:
+                f.write(data)
+            os.replace(tmp_path, self.stats_path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.error(f"Error persisting feedback stats: {str(e)}")
+    
+    def _read_stats(self) -> Optional[Dict[str, Any]]:
+        """Read persisted aggregates (runs in a worker thread)"""
+        if not os.path.exists(self.stats_path):
+            return None
+        
+        try:
+            with open(self.stats_path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error loading feedback stats: {str(e)}")
+            return None
 
 
 # Singleton instance
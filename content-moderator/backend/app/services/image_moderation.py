@@ -0,0 +1,367 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, AsyncIterator, Optional, Tuple
+from io import BytesIO
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import numpy as np
+from PIL import Image
+from app.core.config import get_settings
+from app.core.reload import settings_reloader
+from app.core.tracing import tracer
+from app.models.compact_models import get_category_index
+from app.services.moderation_engine import moderation_engine
+from app.services.perceptual_hash import PerceptualHashIndex, PHASH_SIZE, DHASH_SIZE, phash, dhash
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class ImageTooLarge(ValueError):
+    """Raised when an upload exceeds the configured byte or pixel limits"""
+
+
+class ImageDecodeError(ValueError):
+    """Raised when an upload cannot be decoded as an image"""
+
+
+class PreparedImage:
+    """Decoded image reduced to what hashing and scoring need"""
+    
+    __slots__ = ("sha256", "width", "height", "phash", "dhash", "thumbnail")
+    
+    def __init__(self,
+                 sha256: str,
+                 width: int,
+                 height: int,
+                 phash_value: int,
+                 dhash_value: int,
+                 thumbnail: Optional[bytes]):
+        self.sha256 = sha256
+        self.width = width
+        self.height = height
+        self.phash = phash_value
+        self.dhash = dhash_value
+        self.thumbnail = thumbnail
+
+
+def prepare_image(data: bytes,
+                  sha256: str,
+                  thumbnail_size: Optional[int] = None,
+                  max_pixels: int = settings.IMAGE_MAX_PIXELS) -> PreparedImage:
+    """
+    Decode, downscale and hash an image. CPU-bound; run it in a worker thread.
+    
+    Args:
+        data: Encoded image bytes
+        sha256: Hex SHA-256 of the bytes
+        thumbnail_size: Longest side of a JPEG thumbnail for the scorer (None for no thumbnail)
+        max_pixels: Reject images with more pixels than this before decoding
+    
+    Returns:
+        Prepared image
+    """
+    image = Image.open(BytesIO(data))
+    width, height = image.size
+    if width * height > max_pixels:
+        raise ImageTooLarge(f"Image has {width * height} pixels (limit {max_pixels})")
+    
+    # Let JPEG decode at a reduced scale; nothing downstream needs full resolution
+    image.draft("RGB", (thumbnail_size or PHASH_SIZE, thumbnail_size or PHASH_SIZE))
+    image = image.convert("RGB")
+    
+    gray = image.convert("L")
+    phash_value = phash(np.asarray(gray.resize((PHASH_SIZE, PHASH_SIZE), Image.BILINEAR)))
+    dhash_value = dhash(np.asarray(gray.resize(DHASH_SIZE, Image.BILINEAR)))
+    
+    thumbnail = None
+    if thumbnail_size:
+        image.thumbnail((thumbnail_size, thumbnail_size))
+        buffer = BytesIO()
+        image.save(buffer, format="JPEG", quality=85)
+        thumbnail = buffer.getvalue()
+    
+    return PreparedImage(sha256, width, height, phash_value, dhash_value, thumbnail)
+
+
+class ImageScorer(ABC):
+    """
+    Produces category scores for an image. Subclass to plug in a model.
+    
+    Scores are shared between users through the hash index, so they must not depend on
+    who uploaded the image; each user's thresholds are applied afterwards.
+    """
+    
+    # Longest side of the JPEG thumbnail the scorer needs (None if it only uses hashes)
+    thumbnail_size: Optional[int] = None
+    
+    @abstractmethod
+    async def score(self, image: PreparedImage) -> Tuple[Dict[str, float], Dict[str, Any]]:
+        """
+        Score an image.
+        
+        Args:
+            image: Prepared image
+        
+        Returns:
+            Tuple of (category scores, detailed analysis)
+        """
+
+
+class LocalImageScorer(ImageScorer):
+    """
+    Offline stand-in that scores every image as safe. For development, tests and load
+    testing the pipeline without a vision model.
+    """
+    
+    async def score(self, image: PreparedImage) -> Tuple[Dict[str, float], Dict[str, Any]]:
+        return {category: 0.0 for category in get_category_index().categories}, {"scorer": "local"}
+
+
+class OpenAIImageScorer(ImageScorer):
+    """Scores images with an OpenAI vision model using the standard moderation prompt"""
+    
+    def __init__(self,
+                 model: str = settings.IMAGE_MODEL,
+                 thumbnail_size: int = settings.IMAGE_THUMBNAIL_SIZE):
+        self.model = model
+        self.thumbnail_size = thumbnail_size
+    
+    async def score(self, image: PreparedImage) -> Tuple[Dict[str, float], Dict[str, Any]]:
+        # Scores are shared between users through the hash index, so score every category
+        # with the neutral prompt rather than the uploader's rules
+        system_prompt = moderation_engine._create_moderation_prompt(None, categories=moderation_engine.categories)
+        image_url = "data:image/jpeg;base64," + base64.b64encode(image.thumbnail).decode("ascii")
+        
+        completion = await moderation_engine._chat_completion(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": [{"type": "image_url", "image_url": {"url": image_url}}]}
+            ],
+            temperature=0.1,
+            max_tokens=1000,
+            response_format={"type": "json_object"}
+        )
+        result = json.loads(completion["content"])
+        
+        return result.get("category_scores", {}), result.get("details", {})
+
+
+IMAGE_SCORERS = {
+    "local": LocalImageScorer,
+    "openai": OpenAIImageScorer
+}
+
+
+class ImageModerator:
+    """
+    Image moderation with perceptual-hash dedupe.
+    
+    Uploads are hashed as they stream in; decoding, downscaling and perceptual hashing run
+    in a thread pool off the event loop. Scores for byte-identical or visually
+    near-identical images are reused from the hash index, so only new images reach the
+    scorer. Concurrent uploads of the same bytes share one decode and score. Scores (not
+    decisions) are reused, so each user's thresholds still apply.
+    """
+    
+    def __init__(self,
+                 scorer: Optional[ImageScorer] = None,
+                 index: Optional[PerceptualHashIndex] = None,
+                 max_bytes: int = settings.IMAGE_MAX_BYTES,
+                 workers: int = settings.IMAGE_DECODE_WORKERS):
+        """
+        Initialize the image moderator.
+        
+        Args:
+            scorer: Image scorer (defaults to the one named by IMAGE_SCORER)
+            index: Perceptual hash index
+            max_bytes: Largest accepted upload
+            workers: Threads used for decoding and hashing
+        """
+        self.scorer = scorer or IMAGE_SCORERS[settings.IMAGE_SCORER]()
+        self.index = index or PerceptualHashIndex()
+        self.max_bytes = max_bytes
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-decode")
+        
+        # SHA-256 -> (scores, dedupe, match distance) of an upload being decoded and scored
+        self._pending: Dict[str, asyncio.Future] = {}
+        
+        self.stats = {"exact_hits": 0, "near_hits": 0, "scored": 0}
+    
+    async def read_upload(self, chunks: AsyncIterator[bytes]) -> Tuple[bytes, str]:
+        """
+        Read a streamed upload, enforcing the size limit as it arrives.
+        
+        The body is hashed as it streams but buffered (up to max_bytes): an exact hash hit
+        skips decoding entirely, which is only known once the last chunk has arrived.
+        
+        Args:
+            chunks: Body chunks
+        
+        Returns:
+            Tuple of (image bytes, hex SHA-256)
+        """
+        digest = hashlib.sha256()
+        buffer = bytearray()
+        
+        async for chunk in chunks:
+            if len(buffer) + len(chunk) > self.max_bytes:
+                raise ImageTooLarge(f"Upload exceeds {self.max_bytes} bytes")
+            digest.update(chunk)
+            buffer += chunk
+        
+        return bytes(buffer), digest.hexdigest()
+    
+    @tracer.traced("image_moderator.moderate_image")
+    async def moderate_image(self,
+                             data: bytes,
+                             sha256: str,
+                             user_preferences: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Moderate an image, reusing scores for duplicates.
+        
+        Args:
+            data: Encoded image bytes
+            sha256: Hex SHA-256 of the bytes
+            user_preferences: Optional custom user preferences (thresholds only; scores are neutral)
+        
+        Returns:
+            Dict containing moderation results, plus "dedupe" ("exact", "near" or None)
+        """
+        match_distance = None
+        scored = self.index.get_exact(sha256)
+        
+        if scored is not None:
+            self.stats["exact_hits"] += 1
+            dedupe = "exact"
+        else:
+            scored, dedupe, match_distance = await self._score_once(data, sha256)
+        
+        scores, details = scored
+        sensitivity, category_thresholds, category_weights = moderation_engine._resolve_thresholds(user_preferences)
+        results = moderation_engine._process_moderation_results(
+            scores, details, sensitivity, category_thresholds, category_weights
+        )
+        results["dedupe"] = dedupe
+        results["match_distance"] = match_distance
+        
+        return results
+    
+    async def _score_once(self,
+                          data: bytes,
+                          sha256: str) -> Tuple[Tuple[Dict[str, float], Dict[str, Any]], Optional[str], Optional[int]]:
+        """
+        Score an image not yet in the index, sharing the work between concurrent uploads
+        of the same bytes.
+        
+        Args:
+            data: Encoded image bytes
+            sha256: Hex SHA-256 of the bytes
+        
+        Returns:
+            Tuple of ((scores, details), dedupe, match distance)
+        """
+        while sha256 in self._pending:
+            pending = self._pending[sha256]
+            try:
+                scored, _, _ = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # The upload doing the work was cancelled; take over unless we were too
+                if not pending.cancelled():
+                    raise
+                continue
+            self.stats["exact_hits"] += 1
+            return scored, "exact", None
+        
+        future = asyncio.get_running_loop().create_future()
+        self._pending[sha256] = future
+        try:
+            outcome = await self._score_new(data, sha256)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved so a failure nobody waited on is not logged
+            raise
+        else:
+            future.set_result(outcome)
+            return outcome
+        finally:
+            del self._pending[sha256]
+    
+    async def _score_new(self,
+                         data: bytes,
+                         sha256: str) -> Tuple[Tuple[Dict[str, float], Dict[str, Any]], Optional[str], Optional[int]]:
+        """
+        Decode and hash an image, then reuse a near-duplicate's scores or score it.
+        
+        Args:
+            data: Encoded image bytes
+            sha256: Hex SHA-256 of the bytes
+        
+        Returns:
+            Tuple of ((scores, details), dedupe, match distance)
+        
+        Raises:
+            ImageTooLarge: If the image has too many pixels
+            ImageDecodeError: If the bytes are not a readable image
+        """
+        loop = asyncio.get_running_loop()
+        with tracer.span("image_moderator.prepare"):
+            try:
+                image = await loop.run_in_executor(
+                    self.executor, prepare_image, data, sha256, self.scorer.thumbnail_size
+                )
+            except ImageTooLarge:
+                raise
+            except (OSError, SyntaxError, ValueError) as e:
+                # Pillow raises these for unreadable or corrupt images
+                raise ImageDecodeError(f"Could not decode image: {str(e)}") from e
+        
+        dedupe = None
+        match_distance = None
+        match = self.index.find(image.phash, image.dhash)
+        if match is not None:
+            _, match_distance, scored = match
+            self.stats["near_hits"] += 1
+            dedupe = "near"
+        else:
+            with tracer.span("image_moderator.score"):
+                scored = await self.scorer.score(image)
+            self.stats["scored"] += 1
+        
+        # Index under this file's bytes too, so reposts of the same file skip decoding
+        self.index.add(sha256, image.phash, image.dhash, scored)
+        
+        return scored, dedupe, match_distance
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Report dedupe effectiveness.
+        
+        Returns:
+            Dict with hit counts, hit rate and index size
+        """
+        total = sum(self.stats.values())
+        hits = self.stats["exact_hits"] + self.stats["near_hits"]
+        
+        return {
+            **self.stats,
+            "hit_rate": hits / total if total else 0.0,
+            "indexed_images": len(self.index),
+            "scorer": type(self.scorer).__name__
+        }
+
+
+# Singleton instance
+image_moderator = ImageModerator()
+
+# Cached scores lack categories added since they were computed
+settings_reloader.on_change(
+    "image_hash_index", ("MODERATION_CATEGORIES",), lambda old, new: image_moderator.index.clear()
+)
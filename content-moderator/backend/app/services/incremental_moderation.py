@@ -0,0 +1,308 @@
+from typing import Dict, List, Any, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import re
+from app.core.config import get_settings
+from app.services.blob_store import content_digest
+from app.services.moderation_engine import moderation_engine
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def split_segments(content: str, max_chars: int = settings.SEGMENT_MAX_CHARS) -> List[str]:
+    """
+    Split content into segments that are scored independently.
+
+    Paragraphs are the natural unit; paragraphs longer than max_chars are split into
+    runs of whole sentences so a small edit only invalidates the text around it.
+
+    Args:
+        content: Text to split
+        max_chars: Target maximum segment length
+
+    Returns:
+        List of non-empty segments in document order
+    """
+    segments = []
+
+    for paragraph in _PARAGRAPH_BREAK.split(content):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+
+        if len(paragraph) <= max_chars:
+            segments.append(paragraph)
+            continue
+
+        current = ""
+        for sentence in _SENTENCE_END.split(paragraph):
+            if current and len(current) + len(sentence) + 1 > max_chars:
+                segments.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}" if current else sentence
+        if current:
+            segments.append(current)
+
+    return segments
+
+
+def segment_key(segment: str) -> str:
+    """Stable cache key for a segment (its content address)"""
+    return content_digest(segment)
+
+
+def preferences_fingerprint(user_preferences: Optional[Dict[str, Any]]) -> str:
+    """
+    Fingerprint the preferences that shape the moderation prompt.
+
+    Segment scores are only reusable when they were produced under the same preferences.
+    """
+    canonical = json.dumps(user_preferences or {}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class IncrementalModerator:
+    """
+    Re-moderates edited content by scoring only the segments that changed.
+
+    New content is moderated whole, so it has no per-segment scores yet. Those are
+    computed with score_segments in the background once the content is first edited
+    (or at creation, with SEGMENT_SCORE_ON_CREATE), and later edits reuse them.
+    """
+
+    def __init__(self, engine=moderation_engine, max_concurrency: int = settings.SEGMENT_MAX_CONCURRENCY):
+        """
+        Initialize the incremental moderator.
+
+        Args:
+            engine: Moderation engine used to score segments
+            max_concurrency: Maximum number of segments scored at once
+        """
+        self.engine = engine
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def seed_segments(self,
+                      content: str,
+                      moderation_result: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        Build a segment cache from a whole-content moderation result.
+
+        A whole-content result only describes a segment when the content is a single
+        segment; longer content gets its segment scores from score_segments.
+
+        Args:
+            content: Content that was moderated
+            moderation_result: Result from the moderation engine
+
+        Returns:
+            Segment cache keyed by segment hash
+        """
+        segments = split_segments(content)
+        if len(segments) != 1 or "error" in moderation_result:
+            return {}
+
+        return {
+            segment_key(segments[0]): {
+                "scores": moderation_result.get("scores", {}),
+                "details": moderation_result.get("details", {})
+            }
+        }
+
+    def is_segmented(self, content: str) -> bool:
+        """Whether content has more than one segment"""
+        return len(split_segments(content)) > 1
+
+    async def score_segments(self,
+                             content: str,
+                             user_preferences: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Score every segment of content, for the segment cache only (no decision is made).
+
+        Segments that cannot be scored are left out and are scored by the next edit.
+
+        Args:
+            content: Content to segment
+            user_preferences: Preferences the content was moderated under
+
+        Returns:
+            Segment cache keyed by segment hash
+        """
+        segments = split_segments(content) or [content]
+        segment_cache, _, _, error = await self._score_changed(segments, {}, user_preferences)
+        if error is not None:
+            logger.error(f"Segment scoring error: {str(error)}")
+
+        return segment_cache
+
+    async def remoderate(self,
+                         content: str,
+                         previous_segments: Dict[str, Dict[str, Any]],
+                         user_preferences: Optional[Dict[str, Any]] = None,
+                         user_id: Optional[str] = None
+                         ) -> Tuple[Dict[str, Any], Optional[Dict[str, Dict[str, Any]]], Dict[str, int]]:
+        """
+        Moderate edited content, reusing cached scores for unchanged segments.
+
+        Changed segments are scored through the engine (cascade, tier stats) and the
+        decision is made by the engine (thresholds, analytics). If a segment cannot be
+        scored the result is the engine's error result, and the segments that were scored
+        are still cached for the next attempt.
+
+        When no segment of a multi-segment edit has cached scores, one whole-content call
+        is cheaper than scoring every segment: the content is moderated whole and the
+        segment cache is returned as None, for the caller to fill with score_segments.
+
+        Args:
+            content: New version of the content
+            previous_segments: Segment cache of the previous version
+            user_preferences: Optional custom user preferences
+            user_id: Requesting user, for analytics
+
+        Returns:
+            Tuple of (moderation result, segment cache for the new version or None, segment stats)
+        """
+        segments = split_segments(content) or [content]
+        keys = [segment_key(segment) for segment in segments]
+
+        if len(keys) > 1 and not any(key in previous_segments for key in keys):
+            result = await self.engine.moderate_content(content, user_preferences, user_id)
+            return result, None, {"segments_total": len(keys), "segments_rescored": len(keys)}
+
+        segment_cache, rescored, tiers, error = await self._score_changed(segments, previous_segments, user_preferences)
+
+        stats = {
+            "segments_total": len(keys),
+            "segments_rescored": rescored
+        }
+
+        if error is not None:
+            logger.error(f"Moderation error: {str(error)}")
+            return self.engine.error_result(error), segment_cache, stats
+
+        scores, details = self._merge_segments([segment_cache[key] for key in keys])
+        model_tier = "expensive" if "expensive" in tiers else "fast" if "fast" in tiers else None
+
+        result = await self.engine.moderate_scored(
+            content, scores, details, user_preferences, user_id, model_tier
+        )
+
+        return result, segment_cache, stats
+
+    async def _score_changed(self,
+                             segments: List[str],
+                             previous_segments: Dict[str, Dict[str, Any]],
+                             user_preferences: Optional[Dict[str, Any]]
+                             ) -> Tuple[Dict[str, Dict[str, Any]], int, set, Optional[Exception]]:
+        """
+        Score the segments missing from a previous segment cache.
+
+        Args:
+            segments: Segments in document order
+            previous_segments: Segment cache to reuse scores from
+            user_preferences: Optional custom user preferences
+
+        Returns:
+            Tuple of (segment cache, segments scored, model tiers used, first scoring error or None)
+        """
+        keys = [segment_key(segment) for segment in segments]
+
+        # Segments not present in the previous version are the only ones that need scoring
+        changed = {}
+        for key, segment in zip(keys, segments):
+            if key not in previous_segments and key not in changed:
+                changed[key] = segment
+
+        analyses = await asyncio.gather(
+            *[self._analyze(segment, user_preferences) for segment in changed.values()],
+            return_exceptions=True
+        )
+
+        rescored = {}
+        tiers = set()
+        error = None
+        for key, analysis in zip(changed, analyses):
+            if isinstance(analysis, Exception):
+                error = error or analysis
+                continue
+            scores, details, tier = analysis
+            rescored[key] = {"scores": scores, "details": details}
+            tiers.add(tier)
+
+        segment_cache = {}
+        for key in keys:
+            if key in rescored:
+                segment_cache[key] = rescored[key]
+            elif key in previous_segments:
+                segment_cache[key] = previous_segments[key]
+
+        return segment_cache, len(rescored), tiers, error
+
+    async def _analyze(self,
+                       segment: str,
+                       user_preferences: Optional[Dict[str, Any]]) -> Tuple[Dict[str, float], Dict[str, Any], Optional[str]]:
+        """Score one segment, bounded by the concurrency limit"""
+        async with self._semaphore:
+            return await self.engine.analyze_content(segment, user_preferences)
+
+    def _merge_segments(self,
+                        segment_results: List[Dict[str, Any]]) -> Tuple[Dict[str, float], Dict[str, Any]]:
+        """
+        Merge per-segment analyses into a document-level analysis.
+
+        A document is as severe as its worst segment, so each category takes the maximum
+        segment score and the reasoning of the segment that produced it.
+
+        Args:
+            segment_results: Per-segment scores and details in document order
+
+        Returns:
+            Tuple of (category scores, detailed analysis)
+        """
+        scores: Dict[str, float] = {}
+        reasoning: Dict[str, str] = {}
+        flagged_phrases: List[str] = []
+        target_groups: List[str] = []
+        topics: List[str] = []
+
+        for segment_result in segment_results:
+            segment_details = segment_result.get("details", {})
+            segment_reasoning = segment_details.get("reasoning", {})
+
+            for category, score in segment_result.get("scores", {}).items():
+                if category not in scores or score > scores[category]:
+                    scores[category] = score
+                    if category in segment_reasoning:
+                        reasoning[category] = segment_reasoning[category]
+                    else:
+                        reasoning.pop(category, None)
+
+            for phrase in segment_details.get("flagged_phrases", []):
+                if phrase not in flagged_phrases:
+                    flagged_phrases.append(phrase)
+
+            contexts = segment_details.get("contexts", {})
+            for group in contexts.get("target_groups", []):
+                if group not in target_groups:
+                    target_groups.append(group)
+            for topic in contexts.get("topics", []):
+                if topic not in topics:
+                    topics.append(topic)
+
+        details = {
+            "flagged_phrases": flagged_phrases,
+            "contexts": {"target_groups": target_groups, "topics": topics},
+            "reasoning": reasoning
+        }
+
+        return scores, details
+
+
+# Singleton instance
+incremental_moderator = IncrementalModerator()
@@ -0,0 +1,99 @@
+from typing import Dict, Any, Iterable, Optional
+import json
+
+
+class TopLevelFieldScanner:
+    """
+    Incremental scanner for a JSON object arriving in chunks.
+
+    Each character is scanned once, tracking string/escape state and nesting depth, so a
+    top-level field can be decoded as soon as its value is closed, before the rest of the
+    document has arrived.
+    """
+
+    def __init__(self, fields: Iterable[str]):
+        """
+        Initialize the scanner.
+
+        Args:
+            fields: Top-level field names to extract
+        """
+        self.fields = set(fields)
+        self.values: Dict[str, Any] = {}
+        self.text = ""
+
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._key: Optional[str] = None
+        self._value_key: Optional[str] = None
+        self._value_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> Dict[str, Any]:
+        """
+        Scan another chunk of the document.
+
+        Args:
+            chunk: Next piece of the JSON text
+
+        Returns:
+            Fields whose values were completed by this chunk
+        """
+        self.text += chunk
+        completed = {}
+        text = self.text
+
+        for i in range(self._pos, len(text)):
+            c = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        if self._value_start is not None:
+                            self._complete(self._value_start, i + 1, completed)
+                        else:
+                            self._key = json.loads(text[self._string_start:i + 1])
+                continue
+
+            if c.isspace():
+                continue
+
+            # First character of a value we are collecting
+            if self._value_key is not None and self._value_start is None and c != ":":
+                self._value_start = i
+
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+            elif c == ":" and self._depth == 1:
+                self._value_key = self._key if self._key in self.fields else None
+                self._value_start = None
+            elif c in "{[":
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._value_start is not None:
+                    self._complete(self._value_start, i + 1, completed)
+                elif self._depth == 0 and self._value_start is not None:
+                    # Scalar value closed by the end of the object
+                    self._complete(self._value_start, i, completed)
+            elif c == "," and self._depth == 1 and self._value_start is not None:
+                self._complete(self._value_start, i, completed)
+
+        self._pos = len(text)
+        return completed
+
+    def _complete(self, start: int, end: int, completed: Dict[str, Any]) -> None:
+        """Decode a finished field value"""
+        value = json.loads(self.text[start:end])
+        self.values[self._value_key] = value
+        completed[self._value_key] = value
+        self._value_key = None
+        self._value_start = None
@@ -0,0 +1,139 @@
+from contextvars import ContextVar
+from typing import Dict, Any, Awaitable, Callable, Optional
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+RECORDER_MODES = ("record", "replay", "auto")
+
+
+class RecordingNotFound(KeyError):
+    """Raised in replay mode when a request has no recorded response"""
+
+
+class ResponseRecorder:
+    """
+    Record/replay store for upstream chat completions.
+    
+    Requests are keyed by a hash of their canonical JSON (model, messages and sampling
+    parameters), and responses are appended to a JSONL file. In replay mode every
+    request must have a recording, which makes evaluation runs deterministic and
+    offline. Auto mode replays what it can and records the rest.
+    
+    Each recording keeps the upstream latency of the original call, so a replay run can
+    still report how long requests would have taken (see start_timing).
+    """
+    
+    def __init__(self, path: str, mode: str = "auto"):
+        """
+        Initialize the recorder.
+        
+        Args:
+            path: JSONL file holding the recordings
+            mode: "record" (always call upstream and record), "replay" (never call
+                upstream) or "auto" (replay if recorded, otherwise call and record)
+        """
+        if mode not in RECORDER_MODES:
+            raise ValueError(f"mode must be one of: {', '.join(RECORDER_MODES)}")
+        
+        self.path = path
+        self.mode = mode
+        self.recordings: Dict[str, Dict[str, Any]] = {}
+        self.usage: Dict[str, Dict[str, int]] = {}
+        self.replayed = 0
+        self.recorded = 0
+        self.missing_latency = 0  # Replayed recordings made before latency was recorded
+        self._lock = asyncio.Lock()
+        self._timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("upstream_timings", default=None)
+        
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        recording = json.loads(line)
+                        self.recordings[recording["key"]] = recording
+    
+    @staticmethod
+    def request_key(request: Dict[str, Any]) -> str:
+        """Stable key for a completion request"""
+        canonical = json.dumps(request, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    
+    def start_timing(self) -> Dict[str, float]:
+        """
+        Accumulate upstream timings for the calling task (and the tasks it creates).
+        
+        Returns:
+            Dict updated in place: "upstream" is the upstream latency of every completion
+            (as recorded, for replayed ones) and "waited" the time actually spent waiting
+            on upstream during this run
+        """
+        timings = {"upstream": 0.0, "waited": 0.0}
+        self._timings.set(timings)
+        return timings
+    
+    async def complete(self,
+                       request: Dict[str, Any],
+                       call: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Serve a completion from the recordings or from upstream.
+        
+        Args:
+            request: Completion request parameters
+            call: Upstream call returning {"content": str, "usage": {...}}
+        
+        Returns:
+            Completion with "content" and "usage"
+        """
+        key = self.request_key(request)
+        recording = self.recordings.get(key) if self.mode != "record" else None
+        
+        if recording is not None:
+            self.replayed += 1
+            completion = {"content": recording["content"], "usage": recording.get("usage", {})}
+            latency = recording.get("latency")
+            waited = 0.0
+            if latency is None:
+                self.missing_latency += 1
+        elif self.mode == "replay":
+            raise RecordingNotFound(f"No recorded response for request {key[:12]}")
+        else:
+            start = time.perf_counter()
+            completion = await call(request)
+            latency = waited = time.perf_counter() - start
+            await self._append({
+                "key": key,
+                "model": request.get("model"),
+                "content": completion["content"],
+                "usage": completion.get("usage", {}),
+                "latency": latency
+            })
+            self.recorded += 1
+        
+        timings = self._timings.get()
+        if timings is not None:
+            timings["upstream"] += latency or 0.0
+            timings["waited"] += waited
+        
+        self._count_usage(request.get("model"), completion.get("usage", {}))
+        
+        return completion
+    
+    async def _append(self, recording: Dict[str, Any]) -> None:
+        """Persist a new recording"""
+        async with self._lock:
+            self.recordings[recording["key"]] = recording
+            with open(self.path, "a") as f:
+                f.write(json.dumps(recording) + "\n")
+    
+    def _count_usage(self, model: Optional[str], usage: Dict[str, Any]) -> None:
+        """Accumulate token usage per model, including replayed responses"""
+        totals = self.usage.setdefault(model or "unknown", {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+        totals["calls"] += 1
+        totals["prompt_tokens"] += usage.get("prompt_tokens", 0)
+        totals["completion_tokens"] += usage.get("completion_tokens", 0)
@@ -1,8 +1,18 @@
 import openai
+import asyncio
 import json
-from typing import Dict, List, Tuple, Any, Optional
+import time
+from typing import Dict, List, Tuple, Any, Awaitable, Optional, Sequence
 import logging
+from app.core.cache import LRUCache
 from app.core.config import get_settings
+from app.core.reload import settings_reloader, current_settings
+from app.core.tracing import tracer
+from app.models.compact_models import CategoryVector, ModerationVerdict, get_category_index
+from app.services.analytics import ModerationAnalytics, moderation_analytics
+from app.services.explanation_templates import get_explanation_templates, DEFAULT_TARGETS, DEFAULT_TOPICS
+from app.services.json_stream import TopLevelFieldScanner
+from app.services.llm_recorder import ResponseRecorder
 
 settings = get_settings()
 
@@ -12,37 +22,377 @@ openai.api_key = settings.OPENAI_API_KEY
 logger = logging.getLogger(__name__)
 
 
+# Category subsets whose prompt text is kept per settings snapshot
+PROMPT_CACHE_SIZE = 256
+
+
+def _render_prompts(categories: Tuple[str, ...]) -> Dict[str, str]:
+    """Category-dependent prompt text for the categories being scored"""
+    example_scores = json.dumps({category: 0.0 for category in categories})
+    score_lines = ",\n".join(f'                "{category}": 0.0' for category in categories)
+    
+    return {
+        "moderation": f"""
+        You are an advanced content moderation AI. Analyze the following content and provide moderation scores 
+        across these categories: {', '.join(categories)}.
+        
+        For each category, assign a score from 0.0 (completely safe) to 1.0 (clearly violates policy).
+        
+        Include detailed reasoning for any score above 0.3, including specific phrases or elements that triggered concerns.
+        
+        Return your analysis in the following JSON format:
+        {{
+            "category_scores": {{
+{score_lines}
+            }},
+            "details": {{
+                "flagged_phrases": ["phrase 1", "phrase 2"],
+                "contexts": {{"target_groups": [], "topics": []}},
+                "reasoning": {{"category": "explanation"}}
+            }}
+        }}
+        """,
+        "scoring": f"""
+        You are an advanced content moderation AI. Analyze the following content and provide moderation scores 
+        across these categories: {', '.join(categories)}.
+        
+        For each category, assign a score from 0.0 (completely safe) to 1.0 (clearly violates policy).
+        
+        Return only the scores, with no reasoning, in the following JSON format:
+        {{"category_scores": {example_scores}}}
+        """
+    }
+
+
+class PromptPrefixes:
+    """
+    Prompt text for one settings snapshot, rendered once per category subset.
+    
+    Only the categories being scored appear in the prompt and the response schema, so
+    narrower subsets cost fewer prompt and completion tokens.
+    """
+    
+    def __init__(self, categories: Sequence[str]):
+        self.categories = tuple(categories)
+        self._rendered = LRUCache(PROMPT_CACHE_SIZE)
+        self._rendered.put(self.categories, _render_prompts(self.categories))
+    
+    def get(self, kind: str, categories: Optional[Sequence[str]] = None) -> str:
+        """
+        Prompt text of a kind ("moderation" or "scoring") for a category subset.
+        
+        Args:
+            kind: Prompt kind
+            categories: Categories to score, in index order (all categories if None)
+        
+        Returns:
+            Prompt text
+        """
+        key = self.categories if categories is None else tuple(categories)
+        prompts = self._rendered.get(key)
+        if prompts is None:
+            prompts = _render_prompts(key)
+            self._rendered.put(key, prompts)
+        return prompts[kind]
+
+
+# Prompt prefixes (rebuilt on settings reload)
+settings_reloader.register_artifact(
+    "prompt_prefixes",
+    ("MODERATION_CATEGORIES",),
+    lambda new_settings, previous: PromptPrefixes(new_settings.MODERATION_CATEGORIES)
+)
+
+
 class ModerationEngine:
     """Core AI Content Moderation Engine using OpenAI"""
     
     def __init__(self, 
                  model: str = settings.OPENAI_MODEL,
-                 default_sensitivity: float = settings.DEFAULT_SENSITIVITY):
+                 default_sensitivity: Optional[float] = None,
+                 cascade_enabled: bool = settings.CASCADE_ENABLED,
+                 fast_model: str = settings.CASCADE_FAST_MODEL,
+                 escalation_band: float = settings.CASCADE_ESCALATION_BAND,
+                 streaming_enabled: bool = settings.LLM_STREAMING_ENABLED,
+                 two_phase_enabled: bool = settings.TWO_PHASE_ENABLED,
+                 details_mode: str = settings.DETAILS_MODE,
+                 analytics: Optional[ModerationAnalytics] = None):
         """
         Initialize the moderation engine.
         
         Args:
             model: The OpenAI model to use for moderation
-            default_sensitivity: Default threshold for flagging content (0-1)
+            default_sensitivity: Default threshold for flagging content (0-1); DEFAULT_SENSITIVITY if None
+            cascade_enabled: Score with the fast model first and escalate close calls
+            fast_model: The cheaper model used as the first cascade tier
+            escalation_band: Escalate when any score is within this distance of its threshold
+            streaming_enabled: Stream completions so decisions can be made before details arrive
+            two_phase_enabled: Request scores only, then details only for flagged content
+            details_mode: "inline" to wait for details of flagged content, "deferred" to respond without them
+            analytics: Streaming analytics every decision is recorded in (None to record nothing)
         """
         self.model = model
-        self.default_sensitivity = default_sensitivity
-        self.categories = settings.MODERATION_CATEGORIES
+        self._default_sensitivity = default_sensitivity
+        
+        # Model cascade
+        self.cascade_enabled = cascade_enabled
+        self.fast_model = fast_model
+        self.escalation_band = escalation_band
+        self.tier_stats = {
+            tier: {"count": 0, "errors": 0, "total_latency": 0.0, "max_latency": 0.0}
+            for tier in ("fast", "expensive")
+        }
+        self.escalations = 0
+        
+        # Streamed and two-phase analysis
+        self.streaming_enabled = streaming_enabled
+        self.two_phase_enabled = two_phase_enabled
+        self.details_mode = details_mode
+        
+        # Optional record/replay store for upstream responses (used by offline evaluation)
+        self.recorder: Optional[ResponseRecorder] = None
+    
+        self.analytics = analytics
+    
+    @property
+    def default_sensitivity(self) -> float:
+        if self._default_sensitivity is not None:
+            return self._default_sensitivity
+        return current_settings().DEFAULT_SENSITIVITY
     
+    @property
+    def categories(self) -> Tuple[str, ...]:
+        return get_category_index().categories
+    
+    @tracer.traced("moderation_engine.moderate_content")
     async def moderate_content(self, 
                              content: str, 
-                             user_preferences: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+                             user_preferences: Optional[Dict[str, Any]] = None,
+                             user_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Moderate content based on user preferences or default settings.
         
         Args:
             content: The text content to moderate
             user_preferences: Optional custom user preferences
+            user_id: Requesting user, for analytics
             
         Returns:
             Dict containing moderation results, scores, and explanations
         """
+        try:
+            results = await self._score_content(content, user_preferences)
+            self._record_analytics(results, user_id)
+        
+            # In two-phase mode details are only requested once something is flagged
+            if self.two_phase_enabled and results["flagged"]:
+                await self._complete_details(results, self._analyze_details(content, user_preferences, results))
+            
+            return results
+            
+        except Exception as e:
+            logger.error(f"Moderation error: {str(e)}")
+            return self.error_result(e)
+    
+    @tracer.traced("moderation_engine.moderate_content_early")
+    async def moderate_content_early(self, 
+                                     content: str, 
+                                     user_preferences: Optional[Dict[str, Any]] = None,
+                                     user_id: Optional[str] = None) -> Tuple[Dict[str, Any], Optional[asyncio.Task]]:
+        """
+        Moderate content, returning the decision as soon as the category scores are parsed.
+        
+        In two-phase mode the result comes from the scoring call alone, and for flagged
+        content the returned task resolves once the details call has filled in details and
+        explanations. With streaming enabled, the completion is parsed as it arrives and the
+        task resolves once the rest of it has been generated. Otherwise (neither enabled,
+        cascade enabled for streaming, or responses being recorded) this is moderate_content
+        with no pending task.
+        
+        Args:
+            content: The text content to moderate
+            user_preferences: Optional custom user preferences
+            user_id: Requesting user, for analytics
+        
+        Returns:
+            Tuple of (moderation results, task resolving to the completed results or None)
+        """
+        if self.two_phase_enabled:
+            try:
+                results = await self._score_content(content, user_preferences)
+            except Exception as e:
+                logger.error(f"Moderation error: {str(e)}")
+                return self.error_result(e), None
+            
+            self._record_analytics(results, user_id)
+            if not results["flagged"]:
+                return results, None
+            
+            return results, asyncio.create_task(
+                self._complete_details(results, self._analyze_details(content, user_preferences, results))
+            )
+        
+        sensitivity, category_thresholds, category_weights = self._resolve_thresholds(user_preferences)
+        
+        if (not self.streaming_enabled or self.cascade_enabled or self.recorder is not None
+                or not self._active_categories(category_weights)):
+            return await self.moderate_content(content, user_preferences, user_id), None
+        
+        try:
+            scores, pending_details = await self._analyze_streaming(content, user_preferences)
+            
+            # Decide on the scores alone; details follow in the background
+            results = self._process_moderation_results(scores, {}, sensitivity, category_thresholds, category_weights)
+            results["model_tier"] = "expensive"
+        
+        except Exception as e:
+            logger.error(f"Moderation error: {str(e)}")
+            return self.error_result(e), None
+        
+        self._record_analytics(results, user_id)
+        
+        return results, asyncio.create_task(self._complete_details(results, pending_details))
+    
+    async def _score_content(self, 
+                             content: str,
+                             user_preferences: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Score content with the configured model(s) and apply the user's thresholds.
+        
+        Args:
+            content: The text content to moderate
+            user_preferences: Optional custom user preferences
+        
+        Returns:
+            Dict containing moderation results (without details in two-phase mode)
+        """
         # Apply user preferences if provided
+        sensitivity, category_thresholds, category_weights = self._resolve_thresholds(user_preferences)
+        
+        # Nothing to ask the model when every category is excluded or weighted 0
+        if not self._active_categories(category_weights):
+            return self._process_moderation_results({}, {}, sensitivity, category_thresholds, category_weights)
+        
+        # Call OpenAI for content analysis
+        scores, details, tier = await self._analyze(content, user_preferences, sensitivity, category_thresholds)
+        
+        # Process results based on sensitivity and preferences
+        results = self._process_moderation_results(scores, details, sensitivity, category_thresholds, category_weights)
+        results["model_tier"] = tier
+        
+        return results
+    
+    async def analyze_content(self, 
+                              content: str,
+                              user_preferences: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, float], Dict[str, Any], Optional[str]]:
+        """
+        Score content with the configured model(s) without deciding on it.
+        
+        Goes through the cascade and tier stats like moderate_content. Used to score parts
+        of a document (such as segments of a long post) that are then combined and decided
+        on with moderate_scored.
+        
+        Args:
+            content: The text content to analyze
+            user_preferences: Optional custom user preferences
+        
+        Returns:
+            Tuple of (category scores, detailed analysis, model tier or None if no category is active)
+        """
+        sensitivity, category_thresholds, category_weights = self._resolve_thresholds(user_preferences)
+        if not self._active_categories(category_weights):
+            return {}, {}, None
+        
+        return await self._analyze(content, user_preferences, sensitivity, category_thresholds)
+    
+    async def moderate_scored(self, 
+                              content: str,
+                              scores: Dict[str, float],
+                              details: Dict[str, Any],
+                              user_preferences: Optional[Dict[str, Any]] = None,
+                              user_id: Optional[str] = None,
+                              model_tier: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Decide on scores from analyze_content, as moderate_content does for its own.
+        
+        Args:
+            content: The text content the scores are for
+            scores: Category scores
+            details: Detailed analysis
+            user_preferences: Optional custom user preferences
+            user_id: Requesting user, for analytics
+            model_tier: Most expensive model tier that produced the scores
+        
+        Returns:
+            Dict containing moderation results, scores, and explanations
+        """
+        try:
+            sensitivity, category_thresholds, category_weights = self._resolve_thresholds(user_preferences)
+            results = self._process_moderation_results(scores, details, sensitivity, category_thresholds, category_weights)
+            results["model_tier"] = model_tier
+            self._record_analytics(results, user_id)
+            
+            # In two-phase mode the scores came without details
+            if self.two_phase_enabled and results["flagged"]:
+                await self._complete_details(results, self._analyze_details(content, user_preferences, results))
+            
+            return results
+        
+        except Exception as e:
+            logger.error(f"Moderation error: {str(e)}")
+            return self.error_result(e)
+    
+    async def _analyze(self, 
+                       content: str,
+                       user_preferences: Optional[Dict[str, Any]],
+                       sensitivity: float,
+                       category_thresholds: Dict[str, float]) -> Tuple[Dict[str, float], Dict[str, Any], str]:
+        """Analyze content with the cascade, or the expensive model alone when it is disabled"""
+        if self.cascade_enabled:
+            return await self._analyze_with_cascade(content, user_preferences, sensitivity, category_thresholds)
+        
+        scores, details = await self._analyze_with_tier("expensive", content, user_preferences, self.model)
+        return scores, details, "expensive"
+    
+    def error_result(self, error: Exception) -> Dict[str, Any]:
+        """Result returned when moderation fails"""
+        return {
+            "error": str(error),
+            "flagged": False,  # Default to not flagged on error
+            "scores": {},
+            "explanations": ["Error during moderation analysis."]
+        }
+    
+    async def _complete_details(self, 
+                                results: Dict[str, Any],
+                                pending_details: Awaitable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Fill in details and explanations once they have been generated"""
+        details = await pending_details
+        results["details"] = details
+        results["explanations"] = self._explanations(results, details)
+        
+        if self.analytics is not None:
+            self.analytics.record_details(details)
+        
+        return results
+    
+    def _record_analytics(self, results: Dict[str, Any], user_id: Optional[str]) -> None:
+        """Feed a decision into the streaming analytics (details arriving later are added separately)"""
+        if self.analytics is not None:
+            self.analytics.record(results, user_id)
+    
+    def _resolve_thresholds(self, 
+                            user_preferences: Optional[Dict[str, Any]]) -> Tuple[float, Dict[str, float], Dict[str, float]]:
+        """
+        Resolve the sensitivity, thresholds and weights to apply for a user.
+        
+        Args:
+            user_preferences: Optional custom user preferences
+            
+        Returns:
+            Tuple of (sensitivity, category thresholds, category weights); categories outside
+            the preferences' category subset ("categories") get weight 0
+        """
         sensitivity = user_preferences.get('sensitivity', self.default_sensitivity) if user_preferences else self.default_sensitivity
         
         # Get category-specific thresholds from user preferences or use default
@@ -55,41 +405,155 @@ class ModerationEngine:
         if user_preferences and 'category_weights' in user_preferences:
             category_weights = user_preferences['category_weights']
         
+        # A category subset excludes everything else, as if weighted 0
+        subset = user_preferences.get('categories') if user_preferences else None
+        if subset:
+            category_weights = {
+                category: category_weights.get(category, 1.0) if category in subset else 0.0
+                for category in self.categories
+            }
+        
+        return sensitivity, category_thresholds, category_weights
+    
+    def _active_categories(self, category_weights: Dict[str, float]) -> Tuple[str, ...]:
+        """Categories to score: every category without a weight of 0, in index order"""
+        return tuple(category for category in self.categories if category_weights.get(category, 1.0) != 0)
+    
+    def get_cascade_stats(self) -> Dict[str, Any]:
+        """
+        Report per-tier call counts and latencies.
+        
+        Returns:
+            Dict with cascade statistics
+        """
+        tiers = {}
+        for tier, stats in self.tier_stats.items():
+            tiers[tier] = {
+                "count": stats["count"],
+                "errors": stats["errors"],
+                "mean_latency": stats["total_latency"] / stats["count"] if stats["count"] else 0.0,
+                "max_latency": stats["max_latency"]
+            }
+        
+        fast_count = self.tier_stats["fast"]["count"]
+        
+        return {
+            "enabled": self.cascade_enabled,
+            "fast_model": self.fast_model,
+            "expensive_model": self.model,
+            "escalation_band": self.escalation_band,
+            "escalations": self.escalations,
+            "escalation_rate": self.escalations / fast_count if fast_count else 0.0,
+            "tiers": tiers
+        }
+    
+    async def _analyze_with_cascade(self, 
+                                    content: str,
+                                    user_preferences: Optional[Dict[str, Any]],
+                                    sensitivity: float,
+                                    category_thresholds: Dict[str, float]) -> Tuple[Dict[str, float], Dict[str, Any], str]:
+        """
+        Score with the fast model and escalate to the expensive model only for close calls.
+        
+        Args:
+            content: Content to analyze
+            user_preferences: User preferences to consider
+            sensitivity: Overall sensitivity threshold
+            category_thresholds: Category-specific thresholds
+        
+        Returns:
+            Tuple of (category scores, detailed analysis, model tier that produced them)
+        """
         try:
-            # Call OpenAI for content analysis
-            scores, details = await self._analyze_with_openai(content, user_preferences)
+            scores, details = await self._analyze_with_tier("fast", content, user_preferences, self.fast_model)
             
-            # Process results based on sensitivity and preferences
-            results = self._process_moderation_results(scores, details, sensitivity, category_thresholds, category_weights)
+            _, _, category_weights = self._resolve_thresholds(user_preferences)
+            if not self._needs_escalation(scores, sensitivity, category_thresholds, self._active_categories(category_weights)):
+                return scores, details, "fast"
+        except Exception as e:
+            logger.warning(f"Fast model failed, escalating: {str(e)}")
+        
+        self.escalations += 1
+        scores, details = await self._analyze_with_tier("expensive", content, user_preferences, self.model)
+        
+        return scores, details, "expensive"
+    
+    def _needs_escalation(self, 
+                          scores: Dict[str, float],
+                          sensitivity: float,
+                          category_thresholds: Dict[str, float],
+                          categories: Sequence[str]) -> bool:
+        """
+        Check whether any category score is too close to its threshold to trust the fast model.
+        
+        Args:
+            scores: Category scores from the fast model
+            sensitivity: Overall sensitivity threshold
+            category_thresholds: Category-specific thresholds
+            categories: Categories being scored
+        
+        Returns:
+            True if the expensive model should decide
+        """
+        for category in categories:
+            score = scores.get(category)
             
-            return results
+            # A category the fast model did not score cannot be trusted either
+            if not isinstance(score, (int, float)):
+                return True
             
-        except Exception as e:
-            logger.error(f"Moderation error: {str(e)}")
-            return {
-                "error": str(e),
-                "flagged": False,  # Default to not flagged on error
-                "scores": {},
-                "explanations": ["Error during moderation analysis."]
-            }
+            if abs(score - category_thresholds.get(category, sensitivity)) <= self.escalation_band:
+                return True
+        
+        return False
+    
+    async def _analyze_with_tier(self, 
+                                 tier: str,
+                                 content: str,
+                                 user_preferences: Optional[Dict[str, Any]],
+                                 model: str) -> Tuple[Dict[str, float], Dict[str, Any]]:
+        """Analyze content with a model, recording latency for its cascade tier"""
+        stats = self.tier_stats[tier]
+        start = time.perf_counter()
+        
+        # Two-phase mode asks each tier for scores only
+        instructions = self._create_scoring_instructions(user_preferences) if self.two_phase_enabled else None
+        
+        try:
+            return await self._analyze_with_openai(content, user_preferences, model=model, instructions=instructions)
+        except Exception:
+            stats["errors"] += 1
+            raise
+        finally:
+            latency = time.perf_counter() - start
+            stats["count"] += 1
+            stats["total_latency"] += latency
+            stats["max_latency"] = max(stats["max_latency"], latency)
     
-    async def _analyze_with_openai(self, content: str, user_preferences: Optional[Dict[str, Any]]) -> Tuple[Dict[str, float], Dict[str, Any]]:
+    @tracer.traced("moderation_engine.analyze")
+    async def _analyze_with_openai(self, 
+                                   content: str,
+                                   user_preferences: Optional[Dict[str, Any]],
+                                   model: Optional[str] = None,
+                                   instructions: Optional[str] = None) -> Tuple[Dict[str, float], Dict[str, Any]]:
         """
         Analyze content using OpenAI API.
         
         Args:
             content: Content to analyze
             user_preferences: User preferences to consider
+            model: Model to use (defaults to the engine's model)
+            instructions: Replacement for the standard moderation instructions
             
         Returns:
             Tuple of (category scores, detailed analysis)
         """
         # Create system prompt with instructions
-        system_prompt = self._create_moderation_prompt(user_preferences)
+        system_prompt = self._create_moderation_prompt(user_preferences, instructions)
         
         try:
-            response = await openai.ChatCompletion.acreate(
-                model=self.model,
+            completion = await self._chat_completion(
+                model=model or self.model,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": content}
@@ -101,7 +565,7 @@ class ModerationEngine:
             )
             
             # Extract and parse the JSON response
-            result_text = response.choices[0].message.content
+            result_text = completion["content"]
             result = json.loads(result_text)
             
             # Extract scores and details
@@ -114,29 +578,159 @@ class ModerationEngine:
             logger.error(f"OpenAI API error: {str(e)}")
             raise
     
-    def _create_moderation_prompt(self, user_preferences: Optional[Dict[str, Any]]) -> str:
-        """Create a system prompt based on user preferences"""
+    async def _chat_completion(self, **request: Any) -> Dict[str, Any]:
+        """
+        Run a chat completion, through the response recorder if one is attached.
         
-        base_prompt = f"""
-        You are an advanced content moderation AI. Analyze the following content and provide moderation scores 
-        across these categories: {', '.join(self.categories)}.
+        Args:
+            request: Completion request parameters
         
-        For each category, assign a score from 0.0 (completely safe) to 1.0 (clearly violates policy).
+        Returns:
+            Dict with the completion "content" and token "usage"
+        """
+        with tracer.span("openai.chat_completion", model=request.get("model")) as span:
+            if self.recorder is not None:
+                completion = await self.recorder.complete(request, self._call_openai)
+            else:
+                completion = await self._call_openai(request)
         
-        Include detailed reasoning for any score above 0.3, including specific phrases or elements that triggered concerns.
+            if span is not None:
+                span.attributes.update(completion["usage"])
+            
+            return completion
+    
+    async def _analyze_streaming(self, 
+                                 content: str,
+                                 user_preferences: Optional[Dict[str, Any]],
+                                 model: Optional[str] = None) -> Tuple[Dict[str, float], "asyncio.Task[Dict[str, Any]]"]:
+        """
+        Analyze content with a streamed completion, returning as soon as the scores are complete.
+        
+        The schema puts category_scores before details, so the scores usually arrive well
+        before the verbose reasoning has been generated.
+        
+        Args:
+            content: Content to analyze
+            user_preferences: User preferences to consider
+            model: Model to use (defaults to the engine's model)
+        
+        Returns:
+            Tuple of (category scores, task that consumes the rest of the stream and resolves to details)
+        """
+        system_prompt = self._create_moderation_prompt(user_preferences)
+        scanner = TopLevelFieldScanner(("category_scores", "details"))
+        
+        with tracer.span("openai.chat_completion", model=model or self.model, stream=True) as span:
+            stream = await openai.ChatCompletion.acreate(
+                model=model or self.model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": content}
+                ],
+                temperature=0.1,  # Low temperature for more consistent evaluation
+                max_tokens=1000,
+                n=1,
+                response_format={"type": "json_object"},
+                stream=True
+            )
+            
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.get("content")
+                if delta and "category_scores" in scanner.feed(delta):
+                    break
+            
+            scores = scanner.values.get("category_scores")
+            if scores is None:
+                # The stream ended without a separately parsable scores object
+                scores = json.loads(scanner.text).get("category_scores", {})
+            
+            if span is not None:
+                span.attributes["scores_chars"] = len(scanner.text)
+        
+        return scores, asyncio.create_task(self._collect_details(stream, scanner))
+    
+    @tracer.traced("openai.stream_details")
+    async def _collect_details(self, stream: Any, scanner: TopLevelFieldScanner) -> Dict[str, Any]:
+        """Consume the rest of a streamed completion and return its details"""
+        try:
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.get("content")
+                if delta:
+                    scanner.feed(delta)
+        except Exception as e:
+            logger.warning(f"Error collecting streamed details: {str(e)}")
+        
+        return scanner.values.get("details", {})
+    
+    async def _call_openai(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Call the OpenAI chat completion API"""
+        response = await openai.ChatCompletion.acreate(**request)
+        usage = response.get("usage") or {}
+        
+        return {
+            "content": response.choices[0].message.content,
+            "usage": {
+                "prompt_tokens": usage.get("prompt_tokens", 0),
+                "completion_tokens": usage.get("completion_tokens", 0)
+            }
+        }
+    
+    @tracer.traced("moderation_engine.analyze_details")
+    async def _analyze_details(self, 
+                               content: str,
+                               user_preferences: Optional[Dict[str, Any]],
+                               results: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Request the detailed analysis for already-flagged content (second phase).
+        
+        Args:
+            content: Content that was scored
+            user_preferences: User preferences to consider
+            results: Scored moderation results
+        
+        Returns:
+            Detailed analysis, or an empty dict if the call fails
+        """
+        instructions = self._create_details_instructions(results["flagged_categories"], results["scores"])
+        system_prompt = self._create_moderation_prompt(user_preferences, instructions)
+        model = self.fast_model if results.get("model_tier") == "fast" else self.model
+        
+        try:
+            completion = await self._chat_completion(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": content}
+                ],
+                temperature=0.1,
+                max_tokens=1000,
+                n=1,
+                response_format={"type": "json_object"}
+            )
+            result = json.loads(completion["content"])
+            return result.get("details", result)
+        
+        except Exception as e:
+            logger.warning(f"Error requesting moderation details: {str(e)}")
+            return {}
+    
+    def _create_scoring_instructions(self, user_preferences: Optional[Dict[str, Any]] = None) -> str:
+        """Moderation instructions for a scores-only response (first phase)"""
+        _, _, category_weights = self._resolve_thresholds(user_preferences)
+        return settings_reloader.get("prompt_prefixes").get("scoring", self._active_categories(category_weights))
+    
+    def _create_details_instructions(self, flagged_categories: List[str], scores: Dict[str, float]) -> str:
+        """Moderation instructions for the detailed analysis of flagged content (second phase)"""
+        flagged_scores = ", ".join(f"{category}: {scores[category]:.2f}" for category in flagged_categories)
+        
+        return f"""
+        You are an advanced content moderation AI. The following content has been flagged with these 
+        category scores: {flagged_scores}.
+        
+        Explain the flagged categories, including specific phrases or elements that triggered concerns.
         
         Return your analysis in the following JSON format:
         {{
-            "category_scores": {{
-                "hate": 0.0,
-                "harassment": 0.0,
-                "sexual": 0.0,
-                "self-harm": 0.0,
-                "violence": 0.0,
-                "graphic": 0.0,
-                "illegal-activity": 0.0,
-                "misinformation": 0.0
-            }},
             "details": {{
                 "flagged_phrases": ["phrase 1", "phrase 2"],
                 "contexts": {{"target_groups": [], "topics": []}},
@@ -144,6 +738,24 @@ class ModerationEngine:
             }}
         }}
         """
+    
+    def _create_moderation_prompt(self, 
+                                  user_preferences: Optional[Dict[str, Any]],
+                                  instructions: Optional[str] = None,
+                                  categories: Optional[Sequence[str]] = None) -> str:
+        """
+        Create a system prompt based on user preferences, optionally with replacement
+        instructions. Only the given categories (by default those the preferences leave
+        active) are requested.
+        """
+        
+        if instructions is not None:
+            base_prompt = instructions
+        else:
+            if categories is None:
+                _, _, category_weights = self._resolve_thresholds(user_preferences)
+                categories = self._active_categories(category_weights)
+            base_prompt = settings_reloader.get("prompt_prefixes").get("moderation", categories)
         
         # Add user preference context if available
         if user_preferences:
@@ -169,6 +781,7 @@ class ModerationEngine:
         
         return base_prompt
     
+    @tracer.traced("moderation_engine.process_results")
     def _process_moderation_results(self, 
                                    scores: Dict[str, float], 
                                    details: Dict[str, Any],
@@ -183,42 +796,43 @@ class ModerationEngine:
             details: Additional analysis details
             sensitivity: Overall sensitivity threshold
             category_thresholds: Category-specific thresholds
-            category_weights: Category importance weights
+            category_weights: Category importance weights; categories weighted 0 are dropped
             
         Returns:
-            Dict with processed moderation results
-        """
-        # Initialize results
-        is_flagged = False
-        flagged_categories = []
-        explanations = []
-        
-        # Check each category against thresholds
-        for category, score in scores.items():
-            # Get category-specific threshold or use default
-            threshold = category_thresholds.get(category, sensitivity)
-            
-            # Flag if score exceeds threshold
-            if score >= threshold:
-                is_flagged = True
-                flagged_categories.append(category)
-                
-                # Generate explanation
-                explanation = self._generate_explanation(category, score, details)
-                explanations.append(explanation)
+            Dict with processed moderation results, including the weighted risk_score
+        """
+        # Categories weighted 0 (or outside the subset) are neither flagged nor reported
+        active = set(self._active_categories(category_weights))
+        scores = {category: score for category, score in scores.items() if category in active}
         
-        return {
-            "flagged": is_flagged,
-            "flagged_categories": flagged_categories,
-            "scores": scores,
-            "explanations": explanations,
-            "details": details
-        }
+        # Compare scores and thresholds as float32 vectors indexed by category;
+        # categories outside MODERATION_CATEGORIES are ignored
+        category_index = get_category_index()
+        score_vector = CategoryVector.from_dict(category_index, scores)
+        threshold_vector = CategoryVector.from_dict(category_index, category_thresholds, sensitivity)
+        verdict = ModerationVerdict.evaluate(score_vector, threshold_vector)
+        
+        # Convert back to dicts at the boundary
+        results = verdict.to_dict(category_index)
+        results["risk_score"] = verdict.risk_score(CategoryVector.from_dict(category_index, category_weights, 1.0))
+            
+        # Generate explanations for flagged categories
+        results["explanations"] = self._explanations(results, details)
+        results["details"] = details
+        
+        return results
+    
+    def _explanations(self, results: Dict[str, Any], details: Dict[str, Any]) -> List[str]:
+        """Explanations for each flagged category"""
+        return [
+            self._generate_explanation(category, results["scores"][category], details)
+            for category in results["flagged_categories"]
+        ]
     
     def _generate_explanation(self, category: str, score: float, details: Dict[str, Any]) -> str:
         """Generate human-readable explanation for flagged content"""
         
-        template = settings.EXPLANATION_TEMPLATES.get(category, "This content was flagged in the {category} category.")
+        template = get_explanation_templates().get(category)
         
         # Extract relevant details for the explanation
         targets = []
@@ -235,11 +849,11 @@ class ModerationEngine:
             reasoning = details["reasoning"][category]
         
         # Format the template with available details
-        explanation = template.format(
+        explanation = template.render(
             category=category,
             score=f"{score:.2f}",
-            targets=", ".join(targets) if targets else "individuals",
-            topics=", ".join(topics) if topics else "various topics"
+            targets=", ".join(targets) if targets else DEFAULT_TARGETS,
+            topics=", ".join(topics) if topics else DEFAULT_TOPICS
         )
         
         # Add reasoning if available
@@ -250,4 +864,4 @@ class ModerationEngine:
 
 
 # Singleton instance for use throughout the application
-moderation_engine = ModerationEngine()
\ No newline at end of file
+moderation_engine = ModerationEngine(analytics=moderation_analytics)
\ No newline at end of file
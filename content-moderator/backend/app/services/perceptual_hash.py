@@ -0,0 +1,183 @@
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Set, Tuple
+import numpy as np
+from app.core.config import get_settings
+
+settings = get_settings()
+
+HASH_BITS = 64
+
+# Sizes of the grayscale images the hashes are computed from
+PHASH_SIZE = 32
+DHASH_SIZE = (9, 8)  # (width, height): 8 horizontal gradients per row
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """Orthonormal DCT-II basis, so dct(x) = C @ x"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0, :] = np.sqrt(1.0 / n)
+    return matrix
+
+
+_DCT = _dct_matrix(PHASH_SIZE)
+_BIT_WEIGHTS = 1 << np.arange(HASH_BITS - 1, -1, -1, dtype=np.uint64)
+
+
+def _pack_bits(bits: np.ndarray) -> int:
+    """Pack 64 booleans into an int, most significant bit first"""
+    return int(np.bitwise_or.reduce(_BIT_WEIGHTS[bits.ravel()], initial=np.uint64(0)))
+
+
+def phash(pixels: np.ndarray) -> int:
+    """
+    DCT-based perceptual hash.
+    
+    Args:
+        pixels: PHASH_SIZE x PHASH_SIZE grayscale image
+    
+    Returns:
+        64-bit hash: one bit per low-frequency coefficient, set when above the median
+    """
+    coefficients = _DCT @ pixels.astype(np.float64) @ _DCT.T
+    low = coefficients[:8, :8].ravel()
+    
+    # The DC term only reflects overall brightness, so it is left out of the median
+    return _pack_bits(low > np.median(low[1:]))
+
+
+def dhash(pixels: np.ndarray) -> int:
+    """
+    Gradient (difference) hash.
+    
+    Args:
+        pixels: 8 x 9 grayscale image (rows x columns)
+    
+    Returns:
+        64-bit hash: one bit per horizontally adjacent pixel pair, set when brightness increases
+    """
+    pixels = pixels.astype(np.int16)
+    return _pack_bits(pixels[:, 1:] > pixels[:, :-1])
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits"""
+    return (a ^ b).bit_count()
+
+
+class PerceptualHashIndex:
+    """
+    Bounded index of image hashes for near-duplicate lookup.
+    
+    The 64-bit pHash is split into max_distance + 1 bands. By the pigeonhole principle two
+    hashes within max_distance bits agree exactly on at least one band, so a lookup only
+    compares against entries sharing a band value instead of scanning the whole index.
+    Candidates must be within max_distance on both the pHash and the dHash.
+    """
+    
+    def __init__(self,
+                 capacity: int = settings.IMAGE_HASH_INDEX_SIZE,
+                 max_distance: int = settings.IMAGE_HASH_MAX_DISTANCE):
+        """
+        Initialize the index.
+        
+        Args:
+            capacity: Maximum number of images before the oldest is evicted
+            max_distance: Maximum Hamming distance for a near-duplicate
+        """
+        self.capacity = capacity
+        self.max_distance = max_distance
+        
+        band_count = max_distance + 1
+        base, extra = divmod(HASH_BITS, band_count)
+        widths = [base + (1 if band < extra else 0) for band in range(band_count)]
+        self._bands: List[Tuple[int, int]] = []
+        shift = HASH_BITS
+        for width in widths:
+            shift -= width
+            self._bands.append((shift, (1 << width) - 1))
+        
+        self._entries: "OrderedDict[str, Tuple[int, int, Any]]" = OrderedDict()
+        self._buckets: List[Dict[int, Set[str]]] = [{} for _ in self._bands]
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get_exact(self, key: str) -> Optional[Any]:
+        """Value stored for an exact (content hash) match"""
+        entry = self._entries.get(key)
+        return entry[2] if entry is not None else None
+    
+    def find(self, phash_value: int, dhash_value: int) -> Optional[Tuple[str, int, Any]]:
+        """
+        Find the closest near-duplicate.
+        
+        Args:
+            phash_value: pHash of the query image
+            dhash_value: dHash of the query image
+        
+        Returns:
+            Tuple of (key, pHash distance, value) for the closest match, or None
+        """
+        max_distance = self.max_distance
+        entries = self._entries
+        checked: Set[str] = set()
+        best = None
+        
+        for (shift, mask), buckets in zip(self._bands, self._buckets):
+            bucket = buckets.get((phash_value >> shift) & mask)
+            if not bucket:
+                continue
+            
+            for key in bucket:
+                if key in checked:
+                    continue
+                checked.add(key)
+                
+                entry_phash, entry_dhash, value = entries[key]
+                distance = (phash_value ^ entry_phash).bit_count()
+                if distance > max_distance or (dhash_value ^ entry_dhash).bit_count() > max_distance:
+                    continue
+                if best is None or distance < best[1]:
+                    best = (key, distance, value)
+                    if distance == 0:
+                        return best
+        
+        return best
+    
+    def add(self, key: str, phash_value: int, dhash_value: int, value: Any) -> None:
+        """
+        Index an image.
+        
+        Args:
+            key: Exact content key (e.g. SHA-256 of the file)
+            phash_value: pHash of the image
+            dhash_value: dHash of the image
+            value: Value to reuse for duplicates
+        """
+        if key in self._entries:
+            self._remove(key)
+        
+        self._entries[key] = (phash_value, dhash_value, value)
+        for (shift, mask), buckets in zip(self._bands, self._buckets):
+            buckets.setdefault((phash_value >> shift) & mask, set()).add(key)
+        
+        while len(self._entries) > self.capacity:
+            self._remove(next(iter(self._entries)))
+    
+    def clear(self) -> None:
+        """Remove every indexed image"""
+        self._entries.clear()
+        for buckets in self._buckets:
+            buckets.clear()
+    
+    def _remove(self, key: str) -> None:
+        phash_value, _, _ = self._entries.pop(key)
+        for (shift, mask), buckets in zip(self._bands, self._buckets):
+            band = (phash_value >> shift) & mask
+            bucket = buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del buckets[band]
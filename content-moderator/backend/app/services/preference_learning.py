@@ -1,54 +1,282 @@
-from typing import Dict, List, Any, Optional
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Any, Optional, Tuple
+import asyncio
+import copy
 import numpy as np
 import logging
+import random
+import zlib
+from app.core.cache import LRUCache
 from app.core.config import get_settings
+from app.core.reload import settings_reloader, current_settings, SettingsSnapshot
+from app.core.tracing import tracer
+from app.models.compact_models import CategoryIndex, CategoryVector, get_category_index
+from app.services.blob_store import blob_store
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+# Preference fields that can be set at the global, community and user layers
+LAYERED_FIELDS = ("sensitivity", "category_thresholds", "category_weights", "custom_rules", "categories")
+
+
+class PreferenceUpdateConflict(RuntimeError):
+    """Raised when a profile update keeps losing compare-and-swap races"""
+
+
+class ProfileStore(ABC):
+    """
+    Versioned storage for user preference profiles.
+    
+    Writes are compare-and-swap on the profile version. A store shared by several
+    workers (a database table with a version column) rejects an update computed from a
+    stale read instead of silently overwriting the other worker's change.
+    """
+    
+    @abstractmethod
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Latest profile this worker has seen, for request-path reads.
+        
+        Args:
+            user_id: User identifier
+        
+        Returns:
+            Profile (treat as read-only) or None
+        """
+    
+    @abstractmethod
+    async def load(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Read the stored profile before an update.
+        
+        Args:
+            user_id: User identifier
+        
+        Returns:
+            Stored profile (treat as read-only) or None
+        """
+    
+    @abstractmethod
+    async def compare_and_swap(self, user_id: str, expected_version: int, profile: Dict[str, Any]) -> bool:
+        """
+        Store a profile if the stored version is still expected_version.
+        
+        With a database this is an UPDATE ... WHERE version = expected_version (or an
+        INSERT for version 0) checking the affected row count.
+        
+        Args:
+            user_id: User identifier
+            expected_version: Version the update was computed from (0 for a new profile)
+            profile: New profile
+        
+        Returns:
+            True if the profile was stored
+        """
+
+
+class InMemoryProfileStore(ProfileStore):
+    """
+    Profiles in a dict, private to one worker (would be replaced with a database).
+    
+    Updates within a worker are serialized by its lock stripes, so this store only sees
+    conflicts when several systems share it.
+    """
+    
+    def __init__(self):
+        self.profiles: Dict[str, Dict[str, Any]] = {}
+    
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a user's profile.
+        
+        Args:
+            user_id: User identifier
+        
+        Returns:
+            Stored profile or None
+        """
+        return self.profiles.get(user_id)
+    
+    async def load(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Read a user's profile before an update (the same dict get returns).
+        
+        Args:
+            user_id: User identifier
+        
+        Returns:
+            Stored profile or None
+        """
+        return self.profiles.get(user_id)
+    
+    async def compare_and_swap(self, user_id: str, expected_version: int, profile: Dict[str, Any]) -> bool:
+        """
+        Replace a user's profile if its version is still expected_version.
+        
+        Args:
+            user_id: User identifier
+            expected_version: Version the update was computed from (0 for a new profile)
+            profile: New profile
+        
+        Returns:
+            True if the profile was stored
+        """
+        current = self.profiles.get(user_id)
+        if (current["version"] if current else 0) != expected_version:
+            return False
+        
+        self.profiles[user_id] = profile
+        return True
+
+
+class CompiledPolicy:
+    """
+    Effective moderation policy for a user, flattened from all preference layers.
+    
+    Thresholds and weights are stored as float32 vectors indexed by category so the
+    policy can be applied without walking nested dicts. The policy is keyed by the
+    versions of the layers it was compiled from and is recompiled when any of them change.
+    """
+    
+    __slots__ = ("key", "index", "sensitivity", "thresholds", "weights", "custom_rules", "categories")
+    
+    def __init__(self, key: Tuple, effective: Dict[str, Any]):
+        """
+        Compile an effective preference dict.
+        
+        Args:
+            key: Versions of the layers this policy was compiled from
+            effective: Preferences merged from all layers
+        """
+        self.key = key
+        self.index = get_category_index()
+        self.sensitivity = effective.get("sensitivity", current_settings().DEFAULT_SENSITIVITY)
+        self.thresholds = CategoryVector.from_dict(
+            self.index, effective.get("category_thresholds", {}), self.sensitivity
+        )
+        self.weights = CategoryVector.from_dict(self.index, effective.get("category_weights", {}), 1.0)
+        self.custom_rules = tuple(effective.get("custom_rules", []))
+        
+        # Category subset to moderate (None for all), kept in index order
+        subset = effective.get("categories")
+        self.categories = tuple(category for category in self.index.categories if category in subset) if subset else None
+        
+    @property
+    def preferences(self) -> Dict[str, Any]:
+        """
+        Preferences in the shape the moderation engine expects.
+        
+        Built on every access and not kept, so cached policies only hold the vectors; the
+        caller owns the returned dict.
+        """
+        preferences = {
+            "sensitivity": self.sensitivity,
+            "category_thresholds": self.thresholds.to_dict(self.index),
+            "category_weights": self.weights.to_dict(self.index)
+        }
+        if self.custom_rules:
+            preferences["custom_rules"] = list(self.custom_rules)
+        if self.categories:
+            preferences["categories"] = list(self.categories)
+        
+        return preferences
+
+
 class PreferenceLearningSystem:
     """
     System to learn and adapt content moderation preferences based on user feedback.
+    
+    Preferences are layered: global defaults, then an optional community profile, then
+    sparse per-user overrides. Users only store the values they set (or learned from
+    feedback), so a community policy change is a single write.
+    
+    User profile updates are read-copy-update: the profile is read with its version, the
+    change is applied to a copy, and the profile store keeps the copy only if the version
+    is unchanged (compare-and-swap), retrying a bounded number of times. Within a worker,
+    updates for the same user are serialized by a striped lock, so conflicts only come
+    from other workers sharing the store, while updates for different users proceed
+    concurrently.
     """
     
-    def __init__(self):
-        """Initialize the preference learning system"""
+    def __init__(self,
+                 lock_stripes: int = settings.PREFERENCE_LOCK_STRIPES,
+                 max_retries: int = settings.PREFERENCE_UPDATE_MAX_RETRIES,
+                 policy_cache_size: int = settings.PREFERENCE_POLICY_CACHE_SIZE,
+                 profile_store: Optional[ProfileStore] = None):
+        """
+        Initialize the preference learning system.
+        
+        Args:
+            lock_stripes: Number of per-user lock stripes
+            max_retries: Compare-and-swap attempts per update
+            policy_cache_size: Maximum number of compiled policies kept
+            profile_store: User profile store (an in-memory store if not given)
+        """
         self.categories = settings.MODERATION_CATEGORIES
         self.default_sensitivity = settings.DEFAULT_SENSITIVITY
+        self.max_retries = max_retries
+    
+        # Preference layers (in-memory stores would be replaced with database)
+        self.global_profile = {
+            "overrides": {
+                "sensitivity": self.default_sensitivity,
+                "category_thresholds": {category: self.default_sensitivity for category in self.categories},
+                "category_weights": {category: 1.0 for category in self.categories},
+                "custom_rules": []
+            },
+            "version": 1
+        }
+        self.community_profiles: Dict[str, Dict[str, Any]] = {}
+        self.profile_store = profile_store or InMemoryProfileStore()
+        
+        # Compiled policies by user ID (None for users without a profile); a recompile
+        # replaces the user's entry and inactive users are evicted
+        self._compiled_policies = LRUCache(policy_cache_size)
     
-    async def create_user_profile(self, user_id: str, initial_preferences: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        # Users hash onto a fixed set of locks, so memory does not grow with the user count
+        self._locks = [asyncio.Lock() for _ in range(lock_stripes)]
+        
+        self.update_stats = {"updates": 0, "cas_conflicts": 0, "rejected": 0}
+    
+    async def create_user_profile(self,
+                                  user_id: str,
+                                  initial_preferences: Optional[Dict[str, Any]] = None,
+                                  community_id: Optional[str] = None) -> Dict[str, Any]:
         """
-        Create a new user preference profile.
+        Create a new user preference profile, replacing any existing one.
         
         Args:
             user_id: Unique identifier for the user
             initial_preferences: Optional initial preferences
+            community_id: Optional community whose profile the user inherits
             
         Returns:
             New user preference profile
         """
-        # Create default profile
-        default_profile = {
-            "user_id": user_id,
-            "sensitivity": self.default_sensitivity,
-            "category_thresholds": {category: self.default_sensitivity for category in self.categories},
-            "category_weights": {category: 1.0 for category in self.categories},
-            "custom_rules": [],
-            "examples": {
-                "flagged": [],    # Examples of content that should be flagged
-                "approved": []    # Examples of content that should be approved
-            },
-            "version": 1
-        }
+        replaced_examples = []
+        
+        def reset(profile: Dict[str, Any]) -> None:
+            # Keep community membership; the version bump invalidates compiled policies
+            if community_id is not None:
+                profile["community_id"] = community_id
+            profile["overrides"] = {}
+            replaced_examples[:] = [example for examples in profile["examples"].values() for example in examples]
+            profile["examples"] = {"flagged": [], "approved": []}
         
-        # Override with initial preferences if provided
-        if initial_preferences:
-            self._merge_preferences(default_profile, initial_preferences)
+            # Override with initial preferences if provided
+            if initial_preferences:
+                self._apply_overrides(profile["overrides"], initial_preferences)
         
-        # TODO: Store in database
+        profile = await self._update_profile(user_id, reset)
         
-        return default_profile
+        # The cleared examples no longer reference their content
+        for example in replaced_examples:
+            blob_store.release(example["content_digest"])
+        
+        return self._materialize(profile)
     
+    @tracer.traced("preference_learning.update_preferences")
     async def update_preferences(self, 
                                user_id: str, 
                                preference_updates: Dict[str, Any]) -> Dict[str, Any]:
@@ -57,28 +285,21 @@ class PreferenceLearningSystem:
         
         Args:
             user_id: User identifier
-            preference_updates: New preference settings
+            preference_updates: New preference settings; a field set to None is removed,
+                so the user inherits it again
             
         Returns:
             Updated user preferences
         """
-        # TODO: Retrieve current preferences from database
-        current_preferences = await self._get_user_preferences(user_id)
-        
-        if not current_preferences:
-            # Create new profile if it doesn't exist
-            return await self.create_user_profile(user_id, preference_updates)
+        def apply(profile: Dict[str, Any]) -> None:
+            self._apply_overrides(profile["overrides"], preference_updates)
         
-        # Update preferences
-        self._merge_preferences(current_preferences, preference_updates)
+        # Creates the profile if it doesn't exist
+        profile = await self._update_profile(user_id, apply)
         
-        # Increment version
-        current_preferences["version"] += 1
-        
-        # TODO: Save updated preferences to database
-        
-        return current_preferences
+        return self._materialize(profile)
     
+    @tracer.traced("preference_learning.process_feedback")
     async def process_feedback(self, 
                              user_id: str, 
                              content: str, 
@@ -96,54 +317,305 @@ class PreferenceLearningSystem:
         Returns:
             Updated user preferences
         """
-        # Get current preferences
-        preferences = await self._get_user_preferences(user_id)
+        updated_preferences, _ = await self.process_feedback_batch(
+            user_id, [(content, moderation_result, user_feedback)]
+        )
+        
+        return updated_preferences
+    
+    @tracer.traced("preference_learning.process_feedback_batch")
+    async def process_feedback_batch(self,
+                                     user_id: str,
+                                     items: List[Tuple[str, Dict[str, Any], Dict[str, Any]]]
+                                     ) -> Tuple[Dict[str, Any], List[Dict[str, float]]]:
+        """
+        Process several feedback items from a user as a single profile update.
         
-        if not preferences:
-            preferences = await self.create_user_profile(user_id)
+        Threshold adjustments are applied in item order, with the same result as
+        submitting the items one by one, but each item updates every category at once
+        and the profile is written (and its version bumped) once for the whole batch.
         
-        # Extract feedback details
-        should_flag = user_feedback.get("should_flag", None)
-        feedback_categories = user_feedback.get("categories", {})
-        feedback_comment = user_feedback.get("comment", "")
+        Args:
+            user_id: User identifier
+            items: (content, moderation result, user feedback) tuples
         
-        # Update examples based on feedback
-        if should_flag is not None:
-            example = {
-                "content": content,
-                "original_result": moderation_result,
-                "feedback": user_feedback
-            }
+        Returns:
+            Tuple of (updated user preferences, threshold change per category for each item)
+        """
+        index = get_category_index()
+        scores, targets = self._feedback_matrices(index, items)
+        
+        # Examples reference their content by digest; one reference per example
+        digests = [
+            blob_store.put(content) if user_feedback.get("should_flag") is not None else None
+            for content, _, user_feedback in items
+        ]
+        
+        # Rows with category feedback on scored categories; others only add examples
+        active_rows = np.flatnonzero(~np.isnan(targets).all(axis=1))
+        touched = [index.categories[position] for position in np.flatnonzero(~np.isnan(targets).all(axis=0))]
+        drift = np.zeros_like(scores)
+        
+        def learn(profile: Dict[str, Any]) -> None:
+            # Update examples based on feedback
+            for digest, (_, moderation_result, user_feedback) in zip(digests, items):
+                should_flag = user_feedback.get("should_flag", None)
+                if should_flag is not None:
+                    example = {
+                        "content_digest": digest,
+                        "original_result": moderation_result,
+                        "feedback": user_feedback
+                    }
             
-            if should_flag:
-                preferences["examples"]["flagged"].append(example)
-            else:
-                preferences["examples"]["approved"].append(example)
+                    if should_flag:
+                        profile["examples"]["flagged"].append(example)
+                    else:
+                        profile["examples"]["approved"].append(example)
+            
+            if not touched:
+                return
         
-        # Adjust category thresholds based on feedback
-        if feedback_categories and moderation_result.get("scores"):
-            scores = moderation_result["scores"]
+            # Adjust category thresholds based on feedback, starting from the thresholds
+            # of the profile version being updated (not a possibly newer cached policy)
+            inherited = self._inherited_preferences(profile.get("community_id"))
+            effective = copy.deepcopy(inherited)
+            self._merge_preferences(effective, copy.deepcopy(profile["overrides"]))
+            effective_thresholds = effective.get("category_thresholds", {})
             
-            for category, should_flag_category in feedback_categories.items():
-                if category in scores:
-                    # Get current threshold
-                    current_threshold = preferences["category_thresholds"].get(category, self.default_sensitivity)
-                    score = scores[category]
-                    
-                    # Adjust threshold based on feedback
-                    new_threshold = self._adjust_threshold(
-                        current_threshold, score, should_flag_category
-                    )
+            thresholds = np.array(
+                [effective_thresholds.get(category, self.default_sensitivity) for category in index.categories],
+                dtype=np.float64
+            )
+            drift[:] = 0.0
+            for row in active_rows:
+                adjusted = self._adjust_thresholds(thresholds, scores[row], targets[row])
+                drift[row] = adjusted - thresholds
+                thresholds = adjusted
                     
-                    # Update threshold
-                    preferences["category_thresholds"][category] = new_threshold
+            threshold_updates = {category: float(thresholds[index.positions[category]]) for category in touched}
+            self._apply_overrides(profile["overrides"], {"category_thresholds": threshold_updates})
         
-        # Increment version
-        preferences["version"] += 1
+        try:
+            profile = await self._update_profile(user_id, learn)
+        except PreferenceUpdateConflict:
+            for digest in digests:
+                if digest is not None:
+                    blob_store.release(digest)
+            raise
         
-        # TODO: Save updated preferences to database
+        item_drift = [
+            {index.categories[position]: float(drift[row, position]) for position in np.flatnonzero(drift[row])}
+            for row in range(len(items))
+        ]
         
-        return preferences
+        return self._materialize(profile), item_drift
+        
+    async def set_community_preferences(self,
+                                        community_id: str,
+                                        preference_updates: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Update a community profile. Every member inherits the change without a rewrite.
+        
+        Args:
+            community_id: Community identifier
+            preference_updates: New preference settings for the community
+        
+        Returns:
+            Effective community preferences
+        """
+        community = self.community_profiles.setdefault(
+            community_id, {"community_id": community_id, "overrides": {}, "version": 0}
+        )
+        
+        self._apply_overrides(community["overrides"], preference_updates)
+        community["version"] += 1
+        
+        return self.get_community_preferences(community_id)
+    
+    def get_community_preferences(self, community_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the effective preferences of a community.
+        
+        Args:
+            community_id: Community identifier
+        
+        Returns:
+            Effective community preferences or None if the community does not exist
+        """
+        community = self.community_profiles.get(community_id)
+        if not community:
+            return None
+        
+        effective = self._inherited_preferences(community_id)
+        effective["community_id"] = community_id
+        effective["version"] = community["version"]
+        
+        return effective
+    
+    async def assign_community(self, user_id: str, community_id: Optional[str]) -> Dict[str, Any]:
+        """
+        Make a user inherit from a community profile.
+        
+        Args:
+            user_id: User identifier
+            community_id: Community identifier, or None to inherit global defaults only
+        
+        Returns:
+            Updated user preferences
+        """
+        def assign(profile: Dict[str, Any]) -> None:
+            profile["community_id"] = community_id
+        
+        profile = await self._update_profile(user_id, assign)
+        
+        return self._materialize(profile)
+    
+    def reload_defaults(self, old: SettingsSnapshot, new: SettingsSnapshot) -> None:
+        """
+        Rebase the global layer on reloaded default settings.
+        
+        Global values still at the old default sensitivity move to the new one and added
+        categories get defaults. The global version bump recompiles policies lazily.
+        
+        Args:
+            old: Snapshot before the reload
+            new: Snapshot after the reload
+        """
+        old_default = old.settings.DEFAULT_SENSITIVITY
+        new_default = new.settings.DEFAULT_SENSITIVITY
+        
+        overrides = copy.deepcopy(self.global_profile["overrides"])
+        if overrides.get("sensitivity") == old_default:
+            overrides["sensitivity"] = new_default
+        
+        thresholds = overrides.setdefault("category_thresholds", {})
+        weights = overrides.setdefault("category_weights", {})
+        for category in new.settings.MODERATION_CATEGORIES:
+            if thresholds.get(category, old_default) == old_default:
+                thresholds[category] = new_default
+            weights.setdefault(category, 1.0)
+        
+        self.categories = new.settings.MODERATION_CATEGORIES
+        self.default_sensitivity = new_default
+        
+        # Replace rather than mutate, so concurrent readers see either layer whole
+        self.global_profile = {"overrides": overrides, "version": self.global_profile["version"] + 1}
+    
+    def get_compiled_policy(self, user_id: str) -> CompiledPolicy:
+        """
+        Get the compiled effective policy for a user.
+        
+        The cached policy is reused until the version of the global, community or user
+        layer changes.
+        
+        Args:
+            user_id: User identifier
+        
+        Returns:
+            Compiled policy
+        """
+        profile = self.profile_store.get(user_id)
+        community_id = profile.get("community_id") if profile else None
+        community = self.community_profiles.get(community_id) if community_id else None
+        
+        key = (
+            self.global_profile["version"],
+            community_id,
+            community["version"] if community else 0,
+            profile["version"] if profile else 0
+        )
+        
+        cache_key = user_id if profile else None
+        policy = self._compiled_policies.get(cache_key)
+        if policy is not None and policy.key == key:
+            return policy
+        
+        effective = self._inherited_preferences(community_id)
+        if profile:
+            self._merge_preferences(effective, copy.deepcopy(profile["overrides"]))
+        
+        policy = CompiledPolicy(key, effective)
+        self._compiled_policies.put(cache_key, policy)
+        
+        return policy
+    
+    def get_update_stats(self) -> Dict[str, Any]:
+        """
+        Report profile update contention.
+        
+        Returns:
+            Dict with update, compare-and-swap conflict and rejection counts
+        """
+        return {
+            **self.update_stats,
+            "lock_stripes": len(self._locks),
+            "profile_store": type(self.profile_store).__name__
+        }
+    
+    async def _update_profile(self,
+                              user_id: str,
+                              mutate: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+        """
+        Apply a change to a user profile with compare-and-swap on its version.
+        
+        Args:
+            user_id: User identifier
+            mutate: Applies the change in place to a private copy of the profile
+                (a new empty profile if the user has none); may be called once per attempt
+        
+        Returns:
+            The stored profile
+        
+        Raises:
+            PreferenceUpdateConflict: If every attempt lost a race with another writer
+        """
+        async with self._user_lock(user_id):
+            for attempt in range(self.max_retries):
+                current = await self.profile_store.load(user_id)
+                expected_version = current["version"] if current else 0
+                
+                profile = self._copy_profile(current) if current else self._new_profile(user_id)
+                mutate(profile)
+                profile["version"] = expected_version + 1
+                
+                if await self.profile_store.compare_and_swap(user_id, expected_version, profile):
+                    self.update_stats["updates"] += 1
+                    return profile
+                
+                # Another writer (e.g. a different worker) got there first; back off and re-read
+                self.update_stats["cas_conflicts"] += 1
+                await asyncio.sleep(random.uniform(0, 0.001 * 2 ** attempt))
+        
+        self.update_stats["rejected"] += 1
+        raise PreferenceUpdateConflict(
+            f"Preferences for {user_id} changed concurrently {self.max_retries} times; update rejected"
+        )
+    
+    def _user_lock(self, user_id: str) -> asyncio.Lock:
+        """Lock stripe for a user (stable across restarts, unlike hash())"""
+        return self._locks[zlib.crc32(user_id.encode("utf-8")) % len(self._locks)]
+    
+    def _new_profile(self, user_id: str) -> Dict[str, Any]:
+        """Empty profile for a user without one"""
+        return {
+            "user_id": user_id,
+            "community_id": None,
+            "overrides": {},
+            "examples": {
+                "flagged": [],    # Examples of content that should be flagged
+                "approved": []    # Examples of content that should be approved
+            },
+            "version": 0
+        }
+    
+    def _copy_profile(self, profile: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy a profile so it can be changed without affecting readers of the stored one"""
+        return {
+            **profile,
+            "overrides": copy.deepcopy(profile["overrides"]),
+            # Examples are append-only, so copying the lists (not the examples) is enough
+            "examples": {kind: list(examples) for kind, examples in profile["examples"].items()}
+        }
     
     async def _get_user_preferences(self, user_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -155,9 +627,87 @@ class PreferenceLearningSystem:
         Returns:
             User preference profile or None if not found
         """
-        # TODO: Implement database retrieval
-        # For now, return None to simulate new user
-        return None
+        profile = self.profile_store.get(user_id)
+        if not profile:
+            return None
+        
+        return self._materialize(profile)
+    
+    def _materialize(self, profile: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Expand a sparse user profile into a full preference profile.
+        
+        Args:
+            profile: Stored user profile
+        
+        Returns:
+            Full user preference profile
+        """
+        policy = self.get_compiled_policy(profile["user_id"])
+        
+        return {
+            "user_id": profile["user_id"],
+            "community_id": profile.get("community_id"),
+            "sensitivity": policy.sensitivity,
+            "category_thresholds": policy.thresholds.to_dict(policy.index),
+            "category_weights": policy.weights.to_dict(policy.index),
+            "custom_rules": list(policy.custom_rules),
+            "categories": list(policy.categories) if policy.categories else None,
+            "examples": profile["examples"],
+            "version": profile["version"]
+        }
+    
+    def _inherited_preferences(self, community_id: Optional[str]) -> Dict[str, Any]:
+        """
+        Merge the global and community layers.
+        
+        Args:
+            community_id: Optional community identifier
+        
+        Returns:
+            Preferences a member of the community inherits
+        """
+        effective = copy.deepcopy(self.global_profile["overrides"])
+        
+        community = self.community_profiles.get(community_id) if community_id else None
+        if community:
+            self._merge_preferences(effective, copy.deepcopy(community["overrides"]))
+        
+        return effective
+    
+    def _apply_overrides(self, overrides: Dict[str, Any], updates: Dict[str, Any]) -> None:
+        """
+        Write updates into a layer's overrides.
+        
+        Every value written is kept, even one equal to what the layer inherits, so an
+        explicit setting survives later changes to the layers below. A value of None
+        removes the override (a whole field, or one key of a nested dict), and the layer
+        inherits it again. Values are copied, so the caller's dicts are never shared.
+        
+        Args:
+            overrides: Sparse overrides of the layer being updated
+            updates: New preferences to apply
+        """
+        for key, value in updates.items():
+            if key not in LAYERED_FIELDS:
+                continue
+            
+            if value is None:
+                overrides.pop(key, None)
+            elif isinstance(value, dict):
+                nested = overrides.get(key)
+                nested = nested if isinstance(nested, dict) else {}
+                for nested_key, nested_value in value.items():
+                    if nested_value is None:
+                        nested.pop(nested_key, None)
+                    else:
+                        nested[nested_key] = copy.deepcopy(nested_value)
+                if nested:
+                    overrides[key] = nested
+                else:
+                    overrides.pop(key, None)
+            else:
+                overrides[key] = copy.deepcopy(value)
     
     def _merge_preferences(self, base_preferences: Dict[str, Any], updates: Dict[str, Any]) -> None:
         """
@@ -179,34 +729,69 @@ class PreferenceLearningSystem:
                 # Add new key
                 base_preferences[key] = value
     
-    def _adjust_threshold(self, current_threshold: float, score: float, should_flag: bool) -> float:
+    def _feedback_matrices(self,
+                           index: CategoryIndex,
+                           items: List[Tuple[str, Dict[str, Any], Dict[str, Any]]]) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Adjust threshold based on feedback.
+        Lay out the scores and category feedback of a batch as item x category matrices.
         
         Args:
-            current_threshold: Current threshold value
-            score: Content score
-            should_flag: Whether content should be flagged
+            index: Category index defining the columns
+            items: (content, moderation result, user feedback) tuples
             
         Returns:
-            New threshold value
+            Tuple of (scores, targets): targets is 1.0 where the category should be flagged,
+            0.0 where it should not, and NaN where there is no feedback or no score
+        """
+        scores = np.full((len(items), len(index)), np.nan)
+        targets = np.full((len(items), len(index)), np.nan)
+        
+        for row, (_, moderation_result, user_feedback) in enumerate(items):
+            item_scores = moderation_result.get("scores")
+            if not item_scores:
+                continue
+            
+            for category, should_flag_category in user_feedback.get("categories", {}).items():
+                if category in item_scores and category in index:
+                    scores[row, index.positions[category]] = item_scores[category]
+                    targets[row, index.positions[category]] = 1.0 if should_flag_category else 0.0
+        
+        return scores, targets
+    
+    def _adjust_thresholds(self, thresholds: np.ndarray, scores: np.ndarray, targets: np.ndarray) -> np.ndarray:
+        """
+        Adjust thresholds for one feedback item across all categories.
+        
+        Args:
+            thresholds: Current threshold per category
+            scores: Content score per category
+            targets: 1.0 (should flag), 0.0 (should not) or NaN (no feedback) per category
+        
+        Returns:
+            New thresholds
         """
         # Learning rate
         alpha = 0.1
         
-        if should_flag and score < current_threshold:
-            # Content should be flagged but wasn't - lower threshold
-            new_threshold = current_threshold - alpha * (current_threshold - score)
-        elif not should_flag and score >= current_threshold:
-            # Content was flagged but shouldn't be - raise threshold
-            new_threshold = current_threshold + alpha * (score - current_threshold)
-        else:
-            # Correct decision, no change needed
-            new_threshold = current_threshold
-        
-        # Ensure threshold stays within valid range [0.1, 0.9]
-        return max(0.1, min(0.9, new_threshold))
+        should_flag = targets == 1.0
+        should_approve = targets == 0.0
+        
+        # Content should be flagged but wasn't - lower threshold;
+        # content was flagged but shouldn't be - raise threshold
+        adjusted = np.where(
+            should_flag & (scores < thresholds),
+            thresholds - alpha * (thresholds - scores),
+            np.where(should_approve & (scores >= thresholds), thresholds + alpha * (scores - thresholds), thresholds)
+        )
+        
+        # Categories with feedback stay within the valid range [0.1, 0.9]
+        return np.where(should_flag | should_approve, np.clip(adjusted, 0.1, 0.9), thresholds)
 
 
 # Singleton instance
-preference_learning_system = PreferenceLearningSystem()
\ No newline at end of file
+preference_learning_system = PreferenceLearningSystem()
+
+# Compiled policies are keyed by the global version, so rebasing the global layer invalidates them
+settings_reloader.on_change(
+    "compiled_policies", ("DEFAULT_SENSITIVITY", "MODERATION_CATEGORIES"), preference_learning_system.reload_defaults
+)
@@ -0,0 +1,196 @@
+from typing import Dict, List, Any, Optional
+from collections import deque
+import asyncio
+import logging
+import random
+import time
+from app.core.config import get_settings
+from app.services.moderation_engine import moderation_engine
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class ShadowEvaluator:
+    """
+    Replays a sample of live moderation requests against a candidate model or prompt.
+    
+    Shadow calls run as background tasks after the primary result is known, so they
+    never delay or alter the primary response. When the concurrency cap is reached,
+    samples are dropped rather than queued.
+    """
+    
+    def __init__(self,
+                 engine=moderation_engine,
+                 enabled: bool = settings.SHADOW_ENABLED,
+                 model: Optional[str] = settings.SHADOW_MODEL,
+                 instructions: Optional[str] = settings.SHADOW_PROMPT,
+                 sample_rate: float = settings.SHADOW_SAMPLE_RATE,
+                 max_concurrency: int = settings.SHADOW_MAX_CONCURRENCY,
+                 history_size: int = settings.SHADOW_HISTORY_SIZE):
+        """
+        Initialize the shadow evaluator.
+        
+        Args:
+            engine: Moderation engine used for the candidate call
+            enabled: Whether shadow evaluation is active
+            model: Candidate model (defaults to the engine's model)
+            instructions: Candidate moderation instructions (defaults to the standard prompt)
+            sample_rate: Fraction of requests to shadow (0-1)
+            max_concurrency: Maximum shadow calls in flight
+            history_size: Number of recent comparisons to keep
+        """
+        self.engine = engine
+        self.enabled = enabled
+        self.model = model or engine.model
+        self.instructions = instructions
+        self.sample_rate = sample_rate
+        self.max_concurrency = max_concurrency
+        
+        self.recent: deque = deque(maxlen=history_size)
+        self._tasks = set()
+        self._in_flight = 0
+        
+        # Running aggregates
+        self.sampled = 0
+        self.dropped = 0
+        self.errors = 0
+        self.completed = 0
+        self.flag_disagreements = 0
+        self.category_disagreements: Dict[str, int] = {}
+        self.total_abs_delta: Dict[str, float] = {}
+        self.total_primary_latency = 0.0
+        self.total_candidate_latency = 0.0
+    
+    def maybe_shadow(self,
+                     content: str,
+                     user_preferences: Optional[Dict[str, Any]],
+                     primary_result: Dict[str, Any],
+                     primary_latency: float) -> None:
+        """
+        Schedule a shadow evaluation for a sampled request. Returns immediately.
+        
+        Args:
+            content: Content that was moderated
+            user_preferences: Preferences the primary result was produced with
+            primary_result: Result from the primary model
+            primary_latency: Time the primary moderation took, in seconds
+        """
+        if not self.enabled or "error" in primary_result or random.random() >= self.sample_rate:
+            return
+        
+        self.sampled += 1
+        
+        if self._in_flight >= self.max_concurrency:
+            self.dropped += 1
+            return
+        
+        self._in_flight += 1
+        task = asyncio.create_task(
+            self._evaluate(content, user_preferences, primary_result, primary_latency)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _evaluate(self,
+                        content: str,
+                        user_preferences: Optional[Dict[str, Any]],
+                        primary_result: Dict[str, Any],
+                        primary_latency: float) -> None:
+        """Run the candidate and record how it compares with the primary result"""
+        try:
+            start = time.perf_counter()
+            scores, details = await self.engine._analyze_with_openai(
+                content, user_preferences, model=self.model, instructions=self.instructions
+            )
+            candidate_latency = time.perf_counter() - start
+            
+            sensitivity, category_thresholds, category_weights = self.engine._resolve_thresholds(user_preferences)
+            candidate_result = self.engine._process_moderation_results(
+                scores, details, sensitivity, category_thresholds, category_weights
+            )
+            
+            self._record(primary_result, candidate_result, primary_latency, candidate_latency)
+        
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Shadow evaluation error: {str(e)}")
+        finally:
+            self._in_flight -= 1
+    
+    def _record(self,
+                primary_result: Dict[str, Any],
+                candidate_result: Dict[str, Any],
+                primary_latency: float,
+                candidate_latency: float) -> None:
+        """Fold one comparison into the aggregates"""
+        primary_scores = primary_result.get("scores", {})
+        candidate_scores = candidate_result.get("scores", {})
+        
+        score_deltas = {
+            category: candidate_scores[category] - primary_scores[category]
+            for category in primary_scores
+            if category in candidate_scores
+        }
+        
+        primary_flagged = set(primary_result.get("flagged_categories", []))
+        candidate_flagged = set(candidate_result.get("flagged_categories", []))
+        disagreeing_categories = sorted(primary_flagged ^ candidate_flagged)
+        flag_disagreement = primary_result.get("flagged", False) != candidate_result.get("flagged", False)
+        
+        self.completed += 1
+        self.flag_disagreements += flag_disagreement
+        self.total_primary_latency += primary_latency
+        self.total_candidate_latency += candidate_latency
+        for category, delta in score_deltas.items():
+            self.total_abs_delta[category] = self.total_abs_delta.get(category, 0.0) + abs(delta)
+        for category in disagreeing_categories:
+            self.category_disagreements[category] = self.category_disagreements.get(category, 0) + 1
+        
+        self.recent.append({
+            "timestamp": time.time(),
+            "score_deltas": score_deltas,
+            "primary_flagged": primary_result.get("flagged", False),
+            "candidate_flagged": candidate_result.get("flagged", False),
+            "flag_disagreement": flag_disagreement,
+            "disagreeing_categories": disagreeing_categories,
+            "primary_latency": primary_latency,
+            "candidate_latency": candidate_latency
+        })
+    
+    def get_stats(self, recent: int = 20) -> Dict[str, Any]:
+        """
+        Summarize shadow results.
+        
+        Args:
+            recent: Number of most recent comparisons to include
+        
+        Returns:
+            Dict with shadow evaluation statistics
+        """
+        completed = self.completed
+        
+        return {
+            "enabled": self.enabled,
+            "primary_model": self.engine.model,
+            "candidate_model": self.model,
+            "candidate_prompt": self.instructions is not None,
+            "sample_rate": self.sample_rate,
+            "sampled": self.sampled,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "completed": completed,
+            "in_flight": self._in_flight,
+            "flag_agreement_rate": 1 - self.flag_disagreements / completed if completed else None,
+            "category_disagreements": self.category_disagreements,
+            "mean_abs_score_delta": {
+                category: total / completed for category, total in self.total_abs_delta.items()
+            } if completed else {},
+            "mean_primary_latency": self.total_primary_latency / completed if completed else None,
+            "mean_candidate_latency": self.total_candidate_latency / completed if completed else None,
+            "recent": list(self.recent)[-recent:] if recent > 0 else []
+        }
+
+
+# Singleton instance
+shadow_evaluator = ShadowEvaluator()
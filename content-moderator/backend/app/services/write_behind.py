@@ -0,0 +1,508 @@
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+import asyncio
+import base64
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from app.core.config import get_settings
+from app.services.blob_store import blob_store
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Column order of each persisted table
+TABLES: Dict[str, Tuple[str, ...]] = {
+    "moderation_records": (
+        "content_id", "user_id", "content_type", "content_digest", "flagged",
+        "flagged_categories", "scores", "details", "explanation", "created_at"
+    ),
+    "feedback_log": ("user_id", "content_id", "feedback", "created_at"),
+    "content_blobs": ("digest", "codec", "data", "created_at"),
+}
+
+# Tables written once per key; rows for keys that already exist are skipped
+IDEMPOTENT_TABLES = ("content_blobs",)
+
+# Keyed tables whose rows replace an existing row with the same key
+UPSERT_KEYS = {"moderation_records": "content_id"}
+
+_SQLITE_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS moderation_records (
+        content_id TEXT PRIMARY KEY, user_id TEXT, content_type TEXT, content_digest TEXT, flagged INTEGER,
+        flagged_categories TEXT, scores TEXT, details TEXT, explanation TEXT, created_at REAL)""",
+    """CREATE TABLE IF NOT EXISTS feedback_log (
+        user_id TEXT, content_id TEXT, feedback TEXT, created_at REAL)""",
+    """CREATE TABLE IF NOT EXISTS content_blobs (
+        digest TEXT PRIMARY KEY, codec TEXT, data BLOB, created_at REAL)""",
+]
+
+_POSTGRES_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS moderation_records (
+        content_id TEXT PRIMARY KEY, user_id TEXT, content_type TEXT, content_digest TEXT, flagged BOOLEAN,
+        flagged_categories JSONB, scores JSONB, details JSONB, explanation TEXT, created_at DOUBLE PRECISION)""",
+    """CREATE TABLE IF NOT EXISTS feedback_log (
+        user_id TEXT, content_id TEXT, feedback JSONB, created_at DOUBLE PRECISION)""",
+    """CREATE TABLE IF NOT EXISTS content_blobs (
+        digest TEXT PRIMARY KEY, codec TEXT, data BYTEA, created_at DOUBLE PRECISION)""",
+]
+
+
+def _encode_bytes(value: Any) -> Dict[str, str]:
+    """JSON encoding for bytes columns in the spill file"""
+    if isinstance(value, bytes):
+        return {"$bytes": base64.b64encode(value).decode("ascii")}
+    raise TypeError(f"Cannot spill value of type {type(value).__name__}")
+
+
+def _decode_bytes(value: Dict[str, Any]) -> Any:
+    """Inverse of _encode_bytes"""
+    if set(value) == {"$bytes"}:
+        return base64.b64decode(value["$bytes"])
+    return value
+
+
+class RecordSink(ABC):
+    """
+    Bulk destination for buffered records.
+    
+    A batch is written atomically: either every table's rows are stored or none are, so
+    a failed batch can be retried as a whole without duplicating rows.
+    """
+    
+    async def open(self) -> None:
+        pass
+    
+    @abstractmethod
+    async def write(self, batch: Dict[str, List[Sequence[Any]]]) -> None:
+        """
+        Store a batch in one transaction.
+        
+        Args:
+            batch: Rows per table, each in TABLES[table] column order
+        """
+    
+    async def close(self) -> None:
+        pass
+
+
+class SQLiteSink(RecordSink):
+    """Local stand-in: executemany into a SQLite file on a dedicated thread"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="write-behind-sqlite")
+        self._connection: Optional[sqlite3.Connection] = None
+    
+    async def open(self) -> None:
+        await self._run(self._open)
+    
+    async def write(self, batch: Dict[str, List[Sequence[Any]]]) -> None:
+        await self._run(self._write, batch)
+    
+    async def close(self) -> None:
+        if self._connection is not None:
+            await self._run(self._connection.close)
+            self._connection = None
+    
+    async def _run(self, func, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+    
+    def _open(self) -> None:
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        for statement in _SQLITE_SCHEMA:
+            self._connection.execute(statement)
+        self._connection.commit()
+    
+    def _write(self, batch: Dict[str, List[Sequence[Any]]]) -> None:
+        with self._connection:
+            for table, rows in batch.items():
+                columns = TABLES[table]
+                placeholders = ", ".join("?" for _ in columns)
+                conflict = "IGNORE" if table in IDEMPOTENT_TABLES else "REPLACE"
+                self._connection.executemany(
+                    f"INSERT OR {conflict} INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows
+                )
+
+
+class PostgresSink(RecordSink):
+    """Bulk loads into PostgreSQL with COPY through an asyncpg pool"""
+    
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self._pool = None
+    
+    async def open(self) -> None:
+        import asyncpg  # Only needed when persisting to PostgreSQL
+        
+        self._pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=2)
+        async with self._pool.acquire() as connection:
+            for statement in _POSTGRES_SCHEMA:
+                await connection.execute(statement)
+    
+    async def write(self, batch: Dict[str, List[Sequence[Any]]]) -> None:
+        async with self._pool.acquire() as connection:
+            async with connection.transaction():
+                for table, rows in batch.items():
+                    await self._write_table(connection, table, rows)
+    
+    async def _write_table(self, connection, table: str, rows: List[Sequence[Any]]) -> None:
+        columns = TABLES[table]
+        column_list = ", ".join(columns)
+        if table in IDEMPOTENT_TABLES:
+            # COPY cannot skip existing keys (another worker may have stored the same blob)
+            placeholders = ", ".join(f"${position}" for position in range(1, len(columns) + 1))
+            await connection.executemany(
+                f"INSERT INTO {table} ({column_list}) VALUES ({placeholders}) ON CONFLICT DO NOTHING", rows
+            )
+        elif table in UPSERT_KEYS:
+            # COPY into a staging table, then upsert, so a record written again (a replayed
+            # spill, or a retry after an unacknowledged commit) replaces the stored one
+            key = UPSERT_KEYS[table]
+            updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns if column != key)
+            staging = f"{table}_staging"
+            await connection.execute(
+                f"CREATE TEMP TABLE IF NOT EXISTS {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+            )
+            await connection.copy_records_to_table(staging, records=rows, columns=list(columns))
+            await connection.execute(
+                f"INSERT INTO {table} ({column_list}) SELECT DISTINCT ON ({key}) {column_list} FROM {staging} "
+                f"ORDER BY {key}, created_at DESC ON CONFLICT ({key}) DO UPDATE SET {updates}"
+            )
+        else:
+            await connection.copy_records_to_table(table, records=rows, columns=list(columns))
+    
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+
+def create_sink(database_url: str) -> RecordSink:
+    """
+    Create the sink for a database URL.
+    
+    Args:
+        database_url: postgresql://... (asyncpg) or sqlite:///path
+    
+    Returns:
+        Record sink
+    """
+    scheme, _, rest = database_url.partition("://")
+    if scheme.startswith("postgres"):
+        return PostgresSink("postgresql://" + rest)  # Drop driver suffixes such as +asyncpg
+    if scheme.startswith("sqlite"):
+        # sqlite:///relative.db and sqlite:////absolute.db, as in SQLAlchemy URLs
+        path = rest[1:] if rest.startswith("/") else rest
+        return SQLiteSink(path or ":memory:")
+    raise ValueError(f"Unsupported database URL for write-behind persistence: {database_url}")
+
+
+class WriteBehindBuffer:
+    """
+    Buffers records in memory and writes them to the database in bulk.
+    
+    Submitting is an in-memory append, so database round trips stay off the request path.
+    A background task flushes when a batch fills up or the flush interval passes. The
+    buffer is bounded: once max_pending records are waiting (because the database is
+    lagging or down), submitters wait until a flush frees space. Failed writes are retried
+    with backoff up to max_retries times; a batch that still fails is dead-lettered to a
+    separate file so it cannot stall the flusher, and is left there for an operator rather
+    than retried automatically. On shutdown everything is flushed; records that still
+    cannot be written are spilled, and the spill file is replayed on the next start. It is
+    deleted only once every replayed record has been written (or spilled again).
+    """
+    
+    def __init__(self,
+                 enabled: bool = settings.WRITE_BEHIND_ENABLED,
+                 database_url: str = settings.DATABASE_URL,
+                 batch_size: int = settings.WRITE_BEHIND_BATCH_SIZE,
+                 flush_interval: float = settings.WRITE_BEHIND_FLUSH_INTERVAL,
+                 max_pending: int = settings.WRITE_BEHIND_MAX_PENDING,
+                 spill_path: Optional[str] = settings.WRITE_BEHIND_SPILL_PATH,
+                 max_retries: int = settings.WRITE_BEHIND_MAX_RETRIES,
+                 dead_letter_path: Optional[str] = settings.WRITE_BEHIND_DEAD_LETTER_PATH):
+        """
+        Initialize the buffer.
+        
+        Args:
+            enabled: Whether records are persisted at all
+            database_url: Database to write to
+            batch_size: Records per bulk write
+            flush_interval: Maximum seconds a record waits before being flushed
+            max_pending: Buffered records before submitters wait
+            spill_path: JSONL file for records that could not be written at shutdown
+            max_retries: Failed attempts before a batch is dead-lettered
+            dead_letter_path: JSONL file for dead-lettered batches (never replayed)
+        """
+        self.enabled = enabled
+        self.database_url = database_url
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.spill_path = spill_path
+        self.max_retries = max_retries
+        self.dead_letter_path = dead_letter_path
+        
+        self.sink: Optional[RecordSink] = None
+        self._pending: deque = deque()
+        self._batch_ready = asyncio.Event()
+        self._space_available = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        
+        # Replayed spill records still at the front of the queue; the replay file is
+        # deleted once they have all left it
+        self._replaying = 0
+        
+        self.stats = {
+            "submitted": 0,
+            "written": 0,
+            "batches": 0,
+            "write_errors": 0,
+            "backpressure_waits": 0,
+            "spilled": 0,
+            "dead_lettered": 0,
+            "last_flush_seconds": 0.0
+        }
+    
+    async def start(self) -> None:
+        """Open the sink, replay spilled records and start the flusher"""
+        if not self.enabled or self._task is not None:
+            return
+        
+        self.sink = create_sink(self.database_url)
+        await self.sink.open()
+        self._replay_spill()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """Flush everything that is buffered and close the sink"""
+        if self._task is None:
+            return
+        
+        self._stopping = True
+        self._batch_ready.set()
+        await self._task
+        self._task = None
+        
+        await self.sink.close()
+    
+    async def submit(self, table: str, row: Sequence[Any]) -> None:
+        """
+        Buffer a record for the next bulk write.
+        
+        Args:
+            table: Table name (a key of TABLES)
+            row: Values in TABLES[table] column order
+        """
+        if self._task is None:
+            return
+        
+        # Backpressure: wait for the flusher to catch up instead of growing without bound
+        while len(self._pending) >= self.max_pending:
+            self.stats["backpressure_waits"] += 1
+            self._space_available.clear()
+            await self._space_available.wait()
+        
+        self._pending.append((table, row))
+        self.stats["submitted"] += 1
+        if len(self._pending) >= self.batch_size:
+            self._batch_ready.set()
+    
+    async def submit_moderation(self, content_id: str, record: Dict[str, Any], result: Dict[str, Any]) -> None:
+        """
+        Buffer a moderation history record, and its content the first time it is seen.
+        
+        Args:
+            content_id: Content ID
+            record: History record
+            result: Moderation result the record was built from
+        """
+        digest = record["content_digest"]
+        if self._task is not None:
+            blob = blob_store.take_unpersisted(digest)
+            if blob is not None:
+                codec, data = blob
+                await self.submit("content_blobs", (digest, codec, data, time.time()))
+        
+        await self.submit("moderation_records", (
+            content_id,
+            record["user_id"],
+            record.get("content_type", "text"),
+            digest,
+            bool(result.get("flagged", False)),
+            json.dumps(result.get("flagged_categories", [])),
+            json.dumps(result.get("scores", {})),
+            json.dumps(record.get("details", {})),
+            record.get("explanation", ""),
+            time.time()
+        ))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Report buffer depth and write throughput.
+        
+        Returns:
+            Dict with write-behind statistics
+        """
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "running": self._task is not None,
+            "pending": len(self._pending),
+            "max_pending": self.max_pending
+        }
+    
+    async def _run(self) -> None:
+        """Flusher loop"""
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            
+            while self._pending and not self._stopping:
+                await self._flush_batch(retry=True)
+                if len(self._pending) < self.batch_size:
+                    break
+        
+        # Final flush on shutdown: a few attempts, then spill what is left
+        while self._pending:
+            if not await self._flush_batch(retry=False):
+                self._spill(len(self._pending))
+                break
+    
+    async def _flush_batch(self, retry: bool) -> bool:
+        """
+        Write up to batch_size pending records, grouped by table.
+        
+        Args:
+            retry: Retry with backoff up to max_retries times, then dead-letter the batch to
+                the spill file (stops retrying without dead-lettering once shutdown starts)
+        
+        Returns:
+            True if the batch was written
+        """
+        count = min(self.batch_size, len(self._pending))
+        batch = [self._pending[i] for i in range(count)]
+        
+        by_table: Dict[str, List[Sequence[Any]]] = {}
+        for table, row in batch:
+            by_table.setdefault(table, []).append(row)
+        
+        delay = 0.1
+        attempts = 0
+        while True:
+            attempts += 1
+            start = time.perf_counter()
+            try:
+                await self.sink.write(by_table)
+                break
+            except Exception as e:
+                self.stats["write_errors"] += 1
+                logger.error(f"Write-behind flush of {count} records failed: {str(e)}")
+                if (not retry and attempts >= 3) or (retry and self._stopping):
+                    return False
+                if attempts > self.max_retries:
+                    # Poison batch: set it aside rather than blocking every later record
+                    logger.error(f"Dead-lettering {count} records after {attempts} failed attempts")
+                    self._spill(count, dead_letter=True)
+                    self._space_available.set()
+                    return False
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 10.0)
+        
+        for _ in range(count):
+            self._pending.popleft()
+        self._released(count)
+        
+        self.stats["written"] += count
+        self.stats["batches"] += 1
+        self.stats["last_flush_seconds"] = time.perf_counter() - start
+        self._space_available.set()
+        
+        return True
+    
+    def _spill(self, count: int, dead_letter: bool = False) -> None:
+        """
+        Move the oldest unwritten records to the spill or dead-letter file.
+        
+        Args:
+            count: Number of pending records to spill
+            dead_letter: Write to the dead-letter file, which is not replayed on start
+        """
+        path = self.dead_letter_path if dead_letter else self.spill_path
+        stat = "dead_lettered" if dead_letter else "spilled"
+        
+        if not path:
+            logger.error(f"Dropping {count} unwritten records (no {'dead-letter' if dead_letter else 'spill'} path)")
+            for _ in range(count):
+                self._pending.popleft()
+            self._released(count)
+            return
+        
+        with open(path, "a") as f:
+            for _ in range(count):
+                table, row = self._pending.popleft()
+                f.write(json.dumps({"table": table, "row": list(row)}, default=_encode_bytes) + "\n")
+                self.stats[stat] += 1
+        self._released(count)
+        
+        logger.warning(f"Moved {count} unwritten records to {path}")
+    
+    def _replay_spill(self) -> None:
+        """
+        Queue records spilled by a previous shutdown.
+        
+        The spill file is moved aside first, so records spilled during this run start a
+        new file. The moved file is kept until every record from it has been written
+        (see _released), so a crash mid-replay replays them again on the next start.
+        """
+        if not self.spill_path:
+            return
+        
+        replay_path = self.spill_path + ".replay"
+        if os.path.exists(self.spill_path):
+            # Append rather than rename: an earlier replay may not have finished
+            with open(self.spill_path) as source, open(replay_path, "a") as target:
+                shutil.copyfileobj(source, target)
+            os.remove(self.spill_path)
+        
+        if not os.path.exists(replay_path):
+            return
+        
+        with open(replay_path) as f:
+            for line in f:
+                if line.strip():
+                    spilled = json.loads(line, object_hook=_decode_bytes)
+                    self._pending.append((spilled["table"], tuple(spilled["row"])))
+        
+        self._replaying = len(self._pending)
+        logger.info(f"Replaying {self._replaying} spilled records")
+        self._released(0)
+    
+    def _released(self, count: int) -> None:
+        """
+        Note that the oldest count records have left the queue (written, spilled or
+        dead-lettered), and delete the replay file once none of its records remain.
+        
+        Args:
+            count: Number of records removed from the front of the queue
+        """
+        self._replaying = max(self._replaying - count, 0)
+        replay_path = self.spill_path + ".replay" if self.spill_path else None
+        if self._replaying == 0 and replay_path and os.path.exists(replay_path):
+            os.remove(replay_path)
+
+
+# Singleton instance
+write_behind = WriteBehindBuffer()
@@ -0,0 +1,145 @@
+"""
+Measure the resident memory of preference profiles and cached verdicts.
+
+Compares the nested-dict representation against the compact float32 vectors in
+app.models.compact_models. Compiled policies have their preferences read once after
+being built, as every moderation request does, so anything that access retains is
+counted. Each measurement runs in a fresh interpreter so RSS deltas are not polluted
+by earlier allocations.
+
+Usage (from the backend directory, with the usual .env in place):
+    python -m benchmarks.memory_footprint --profiles 1000000 --verdicts 10000000
+"""
+import argparse
+import gc
+import os
+import random
+import subprocess
+import sys
+
+MEASUREMENTS = [
+    ("profiles", "dict"),
+    ("profiles", "compact"),
+    ("verdicts", "dict"),
+    ("verdicts", "compact"),
+]
+
+
+def _rss_bytes() -> int:
+    """Current resident set size of this process"""
+    with open("/proc/self/statm") as f:
+        resident_pages = int(f.read().split()[1])
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def _build_profiles(representation: str, count: int) -> list:
+    from app.core.config import get_settings
+    from app.services.preference_learning import CompiledPolicy
+    
+    categories = get_settings().MODERATION_CATEGORIES
+    profiles = []
+    
+    for i in range(count):
+        profile = {
+            "sensitivity": random.random(),
+            "category_thresholds": {category: random.random() for category in categories},
+            "category_weights": {category: random.random() for category in categories},
+            "custom_rules": [],
+            "version": 1
+        }
+        if representation == "compact":
+            profile = CompiledPolicy((1, None, 0, 1), profile)
+            profile.preferences  # As a moderation request would
+        profiles.append(profile)
+    
+    return profiles
+
+
+def _build_verdicts(representation: str, count: int) -> list:
+    from app.models.compact_models import CategoryVector, ModerationVerdict, get_category_index
+    
+    category_index = get_category_index()
+    
+    verdicts = []
+    
+    for i in range(count):
+        scores = {category: random.random() for category in category_index.categories}
+        flagged_categories = [category for category, score in scores.items() if score >= 0.7]
+        
+        if representation == "compact":
+            verdict = ModerationVerdict(CategoryVector.from_dict(category_index, scores))
+            for category in flagged_categories:
+                verdict.flag_mask |= 1 << category_index.positions[category]
+        else:
+            verdict = {
+                "flagged": bool(flagged_categories),
+                "flagged_categories": flagged_categories,
+                "scores": scores
+            }
+        verdicts.append(verdict)
+    
+    return verdicts
+
+
+def _worker(kind: str, representation: str, count: int) -> None:
+    """Build the objects and print the RSS delta in bytes"""
+    # Import application modules before the baseline so they are not counted
+    import app.services.preference_learning  # noqa: F401
+    
+    gc.collect()
+    before = _rss_bytes()
+    
+    builder = _build_profiles if kind == "profiles" else _build_verdicts
+    objects = builder(representation, count)
+    
+    gc.collect()
+    after = _rss_bytes()
+    
+    print(after - before)
+    del objects
+
+
+def _measure(kind: str, representation: str, count: int) -> int:
+    """Run one measurement in a fresh interpreter"""
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.memory_footprint", "--worker", kind, representation, str(count)],
+        check=True,
+        capture_output=True,
+        text=True
+    ).stdout
+    return int(output.strip().splitlines()[-1])
+
+
+def main(args: argparse.Namespace) -> None:
+    counts = {"profiles": args.profiles, "verdicts": args.verdicts}
+    results = {}
+    
+    print(f"{'kind':<10} {'representation':<15} {'count':>12} {'RSS (MB)':>10} {'bytes/item':>11}")
+    for kind, representation in MEASUREMENTS:
+        count = counts[kind]
+        rss = _measure(kind, representation, count)
+        results[(kind, representation)] = rss
+        print(f"{kind:<10} {representation:<15} {count:>12} {rss / 2**20:>10.1f} {rss / count:>11.1f}")
+    
+    for kind in counts:
+        compact = results[(kind, "compact")]
+        if compact > 0:
+            print(f"{kind}: dict representation uses {results[(kind, 'dict')] / compact:.1f}x the memory of compact")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measure profile and verdict memory footprint")
+    parser.add_argument("--profiles", type=int, default=1_000_000, help="Number of profiles")
+    parser.add_argument("--verdicts", type=int, default=10_000_000, help="Number of cached verdicts")
+    parser.add_argument("--worker", nargs=3, metavar=("KIND", "REPRESENTATION", "COUNT"),
+                        help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.worker:
+        kind, representation, count = args.worker
+        _worker(kind, representation, int(count))
+    else:
+        main(args)
@@ -0,0 +1,304 @@
+"""
+Microbenchmarks for the CPU-bound service functions run on every request or feedback event.
+
+Each benchmark is timed at several input sizes (flagged phrases and reasoning in the LLM
+details, custom rules in the preferences, examples in a profile, items in a feedback
+batch) and reported as the best per-call time over several repeats. A benchmark that
+mutates its input returns a (setup, run) pair instead of a callable: every call gets a
+fresh input from setup, and only the call itself is timed. Times are divided
+by a fixed pure-Python calibration loop, so a baseline recorded on one machine stays
+meaningful on another.
+
+A run is compared against the stored baseline and fails if any benchmark got slower
+than --threshold times its baseline (1.5 by default, which absorbs run-to-run noise on
+shared machines; tighten it on a quiet one). Record a new baseline after an intended
+change with --save-baseline and commit it alongside the change.
+
+Threshold adjustment is benchmarked as the vectorized _adjust_thresholds over the rows
+of a feedback batch (with _feedback_matrices), which replaced the per-category
+_adjust_threshold.
+
+Usage (from the backend directory, with the usual .env in place):
+    python -m benchmarks.microbenchmarks
+    python -m benchmarks.microbenchmarks --filter explanation --sizes 10 1000
+    python -m benchmarks.microbenchmarks --save-baseline
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import sys
+import time
+import timeit
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "microbenchmarks_baseline.json")
+
+
+def _calibrate() -> int:
+    """Reference workload the benchmark times are expressed in"""
+    total = 0
+    for i in range(1000):
+        total += i * i
+    return total
+
+
+def _details(size: int) -> dict:
+    """LLM analysis details with size phrases, groups and topics and reasoning for every category"""
+    from app.models.compact_models import get_category_index
+    
+    categories = get_category_index().categories
+    return {
+        "flagged_phrases": [f"flagged phrase number {i}" for i in range(size)],
+        "contexts": {
+            "target_groups": [f"group {i}" for i in range(size)],
+            "topics": [f"topic {i}" for i in range(size)]
+        },
+        "reasoning": {
+            category: " ".join(f"reason {i} for {category}." for i in range(size))
+            for category in categories
+        }
+    }
+
+
+def _preferences(size: int) -> dict:
+    """User preferences with per-category thresholds and preferences and size custom rules"""
+    from app.models.compact_models import get_category_index
+    
+    categories = get_category_index().categories
+    return {
+        "sensitivity": 0.6,
+        "category_thresholds": {category: 0.5 for category in categories},
+        "category_preferences": {category: f"be strict about {category}" for category in categories},
+        "custom_rules": [f"custom rule number {i}" for i in range(size)]
+    }
+
+
+def _feedback_items(size: int) -> list:
+    """(content, moderation result, feedback) tuples touching every category"""
+    from app.models.compact_models import get_category_index
+    
+    categories = get_category_index().categories
+    rng = random.Random(size)
+    items = []
+    for i in range(size):
+        scores = {category: rng.random() for category in categories}
+        items.append((
+            f"content {i}",
+            {"flagged": True, "scores": scores},
+            {"should_flag": bool(i % 2), "categories": {category: rng.random() < 0.5 for category in categories}}
+        ))
+    return items
+
+
+def bench_create_moderation_prompt(size: int):
+    from app.services.moderation_engine import moderation_engine
+    
+    preferences = _preferences(size)
+    return lambda: moderation_engine._create_moderation_prompt(preferences)
+
+
+def bench_process_moderation_results(size: int):
+    from app.services.moderation_engine import moderation_engine
+    
+    details = _details(size)
+    preferences = _preferences(size)
+    sensitivity, thresholds, weights = moderation_engine._resolve_thresholds(preferences)
+    # Every category flagged, so an explanation is generated for each
+    scores = {category: 0.95 for category in thresholds}
+    return lambda: moderation_engine._process_moderation_results(scores, details, sensitivity, thresholds, weights)
+
+
+def bench_generate_explanation(size: int):
+    from app.services.moderation_engine import moderation_engine
+    
+    details = _details(size)
+    return lambda: moderation_engine._generate_explanation("harassment", 0.87, details)
+
+
+def bench_format_details(size: int):
+    from app.services.explanation_generator import explanation_generator
+    
+    details = _details(size)
+    return lambda: explanation_generator._format_details(details)
+
+
+def bench_merge_preferences(size: int):
+    from app.services.preference_learning import preference_learning_system
+    
+    # Nested per-example feedback, so the recursive merge walks size entries
+    categories = preference_learning_system.categories
+    base = _preferences(size)
+    base["examples"] = {
+        f"content {i}": {"should_flag": False, "categories": {category: False for category in categories}}
+        for i in range(size)
+    }
+    updates = _preferences(size)
+    updates["sensitivity"] = 0.4
+    updates["category_thresholds"] = {category: 0.3 for category in updates["category_thresholds"]}
+    updates["examples"] = {
+        f"content {i}": {"should_flag": True, "categories": {category: True for category in categories}}
+        for i in range(size)
+    }
+    
+    # The merge mutates its base, so every call merges into a fresh copy
+    return (lambda: copy.deepcopy(base),
+            lambda fresh: preference_learning_system._merge_preferences(fresh, updates))
+
+
+def bench_copy_profile(size: int):
+    from app.services.preference_learning import preference_learning_system
+    
+    profile = preference_learning_system._new_profile("user-bench")
+    profile["overrides"] = _preferences(size)
+    for content, moderation_result, feedback in _feedback_items(size):
+        kind = "flagged" if feedback["should_flag"] else "approved"
+        profile["examples"][kind].append(
+            {"content_digest": content, "original_result": moderation_result, "feedback": feedback}
+        )
+    return lambda: preference_learning_system._copy_profile(profile)
+
+
+def bench_adjust_thresholds(size: int):
+    import numpy as np
+    from app.models.compact_models import get_category_index
+    from app.services.preference_learning import preference_learning_system
+    
+    index = get_category_index()
+    items = _feedback_items(size)
+    initial = np.full(len(index), 0.5)
+    
+    def run():
+        scores, targets = preference_learning_system._feedback_matrices(index, items)
+        thresholds = initial
+        for row in range(len(items)):
+            thresholds = preference_learning_system._adjust_thresholds(thresholds, scores[row], targets[row])
+        return thresholds
+    return run
+
+
+def bench_validate_feedback(size: int):
+    from app.services.feedback_processor import feedback_processor
+    
+    categories = feedback_processor.categories
+    feedback = {
+        "should_flag": True,
+        "categories": {category: i % 2 == 0 for i, category in enumerate(categories)},
+        "comment": "x" * size
+    }
+    return lambda: feedback_processor._validate_feedback(feedback)
+
+
+BENCHMARKS = {
+    "create_moderation_prompt": bench_create_moderation_prompt,
+    "process_moderation_results": bench_process_moderation_results,
+    "generate_explanation": bench_generate_explanation,
+    "format_details": bench_format_details,
+    "merge_preferences": bench_merge_preferences,
+    "copy_profile": bench_copy_profile,
+    "adjust_thresholds": bench_adjust_thresholds,
+    "validate_feedback": bench_validate_feedback
+}
+
+
+def _time(benchmark, repeat: int) -> float:
+    """
+    Best seconds per call over repeat runs of at least 0.2 s each.
+    
+    benchmark is a callable, or a (setup, run) pair where run is called with a fresh
+    setup() result each time and the setup is left out of the timing.
+    """
+    if callable(benchmark):
+        timer = timeit.Timer(benchmark)
+        number, _ = timer.autorange()
+        return min(timer.repeat(repeat=repeat, number=number)) / number
+    
+    setup, func = benchmark
+    
+    def run(number: int) -> float:
+        elapsed = 0.0
+        for _ in range(number):
+            fresh = setup()
+            start = time.perf_counter()
+            func(fresh)
+            elapsed += time.perf_counter() - start
+        return elapsed
+    
+    number = 1
+    while run(number) < 0.2:
+        number *= 2
+    return min(run(number) for _ in range(repeat)) / number
+
+
+def _load_baseline(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)["relative"]
+
+
+def main(args: argparse.Namespace) -> int:
+    baseline = {} if args.save_baseline else _load_baseline(args.baseline)
+    
+    # Calibrate on both sides of the run and keep the faster, so frequency scaling and
+    # noisy neighbours during one calibration don't skew every ratio
+    calibration = _time(_calibrate, args.repeat)
+    timings = {}
+    for name, make in BENCHMARKS.items():
+        if args.filter and args.filter not in name:
+            continue
+        for size in args.sizes:
+            timings[f"{name}[{size}]"] = _time(make(size), args.repeat)
+    calibration = min(calibration, _time(_calibrate, args.repeat))
+    
+    print(f"calibration: {calibration * 1e6:.1f} us")
+    print(f"{'benchmark':<36} {'us/call':>11} {'relative':>10} {'baseline':>10} {'ratio':>7}")
+    
+    relative = {}
+    regressions = []
+    for key, seconds in timings.items():
+        relative[key] = seconds / calibration
+        
+        expected = baseline.get(key)
+        if expected is None:
+            print(f"{key:<36} {seconds * 1e6:>11.2f} {relative[key]:>10.3f} {'-':>10} {'-':>7}")
+            continue
+        
+        ratio = relative[key] / expected
+        marker = " REGRESSION" if ratio > args.threshold else ""
+        print(f"{key:<36} {seconds * 1e6:>11.2f} {relative[key]:>10.3f} {expected:>10.3f} {ratio:>7.2f}{marker}")
+        if ratio > args.threshold:
+            regressions.append(key)
+    
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"calibration_us": calibration * 1e6, "relative": relative}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    
+    if not baseline:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+    if regressions:
+        print(f"FAIL: {len(regressions)} benchmark(s) slower than {args.threshold}x baseline: {', '.join(regressions)}")
+        return 1
+    
+    return 0
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Microbenchmark the CPU-bound service hot paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000],
+                        help="Input sizes (phrases, rules, examples or batch items) to run each benchmark at")
+    parser.add_argument("--filter", default=None, help="Only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs per benchmark; the best is kept")
+    parser.add_argument("--threshold", type=float, default=1.5,
+                        help="Fail when a benchmark is slower than this multiple of its baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline file")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Record this run as the baseline instead of comparing against it")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main(parse_args()))
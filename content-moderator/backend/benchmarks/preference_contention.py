@@ -0,0 +1,128 @@
+"""
+Stress concurrent preference updates.
+
+Fires a burst of feedback events at PreferenceLearningSystem.process_feedback, spread
+over a varying number of distinct users, and checks that no update is lost: every
+accepted event must show up as a stored example and a version bump. Profile reads and
+compare-and-swap writes go through a profile store with a simulated database round
+trip, shared by several "workers" (system instances with their own lock stripes) so
+compare-and-swap conflicts actually happen, as they would with a shared database.
+
+Throughput should grow with the number of distinct users (updates for different users
+run concurrently) and stay flat with a single lock stripe (a global lock), which is
+run alongside for comparison.
+
+Usage (from the backend directory, with the usual .env in place):
+    python -m benchmarks.preference_contention --events 4000 --users 1 4 16 64 256 --workers 2
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+
+def _make_store(latency: float):
+    from app.services.preference_learning import InMemoryProfileStore
+    
+    class SimulatedDatabaseStore(InMemoryProfileStore):
+        """Adds a database round trip to profile reads and compare-and-swap writes"""
+        
+        async def load(self, user_id):
+            await asyncio.sleep(latency)
+            return await super().load(user_id)
+        
+        async def compare_and_swap(self, user_id, expected_version, profile):
+            await asyncio.sleep(latency)
+            return await super().compare_and_swap(user_id, expected_version, profile)
+    
+    return SimulatedDatabaseStore()
+
+
+async def _run(events: int, users: int, workers: int, lock_stripes: int, max_retries: int, latency: float) -> dict:
+    from app.services.preference_learning import PreferenceLearningSystem, PreferenceUpdateConflict
+    
+    store = _make_store(latency)
+    systems = [
+        PreferenceLearningSystem(lock_stripes=lock_stripes, max_retries=max_retries, profile_store=store)
+        for _ in range(workers)
+    ]
+    accepted = {f"user-{i}": 0 for i in range(users)}
+    rejected = 0
+    
+    async def feedback(i: int) -> None:
+        nonlocal rejected
+        user_id = f"user-{i % users}"
+        system = systems[random.randrange(workers)]
+        try:
+            await system.process_feedback(
+                user_id,
+                f"content {i}",
+                {"flagged": True, "scores": {"harassment": random.random()}},
+                {"should_flag": bool(i % 2), "categories": {"harassment": bool(i % 2)}}
+            )
+            accepted[user_id] += 1
+        except PreferenceUpdateConflict:
+            rejected += 1
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(feedback(i) for i in range(events)))
+    elapsed = time.perf_counter() - start
+    
+    lost = 0
+    for user_id, count in accepted.items():
+        profile = store.profiles.get(user_id)
+        stored_examples = sum(len(examples) for examples in profile["examples"].values()) if profile else 0
+        stored_version = profile["version"] if profile else 0
+        lost += max(count - stored_examples, count - stored_version, 0)
+    
+    return {
+        "throughput": events / elapsed,
+        "lost": lost,
+        "rejected": rejected,
+        "conflicts": sum(system.update_stats["cas_conflicts"] for system in systems)
+    }
+
+
+def main(args: argparse.Namespace) -> int:
+    print(f"{'stripes':>8} {'users':>6} {'updates/s':>10} {'conflicts':>10} {'rejected':>9} {'lost':>5}")
+    
+    failed = False
+    throughput = {}
+    for lock_stripes in (args.stripes, 1):
+        for users in args.users:
+            result = asyncio.run(_run(args.events, users, args.workers, lock_stripes, args.max_retries, args.latency))
+            throughput[(lock_stripes, users)] = result["throughput"]
+            failed = failed or result["lost"] > 0
+            print(f"{lock_stripes:>8} {users:>6} {result['throughput']:>10.0f} "
+                  f"{result['conflicts']:>10} {result['rejected']:>9} {result['lost']:>5}")
+    
+    fewest, most = min(args.users), max(args.users)
+    speedup = throughput[(args.stripes, most)] / throughput[(args.stripes, fewest)]
+    print(f"{args.stripes} stripes: {speedup:.1f}x throughput with {most} users vs {fewest}")
+    
+    if failed:
+        print("FAIL: updates were lost")
+    if most > fewest and speedup < args.min_speedup:
+        print(f"FAIL: throughput did not scale with distinct users (expected >= {args.min_speedup}x)")
+        failed = True
+    
+    return 1 if failed else 0
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Stress concurrent preference updates")
+    parser.add_argument("--events", type=int, default=4000, help="Feedback events per run")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 4, 16, 64, 256],
+                        help="Distinct user counts to run")
+    parser.add_argument("--workers", type=int, default=2, help="System instances sharing one store")
+    parser.add_argument("--stripes", type=int, default=256, help="Lock stripes per worker")
+    parser.add_argument("--max-retries", type=int, default=20, help="Compare-and-swap attempts per update")
+    parser.add_argument("--latency", type=float, default=0.001, help="Simulated store round trip (seconds)")
+    parser.add_argument("--min-speedup", type=float, default=4.0,
+                        help="Required throughput ratio between the most and fewest users")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main(parse_args()))